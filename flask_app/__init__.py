@@ -17,6 +17,11 @@ from flask_app.services.menu_config import MenuConfig
 from flask_app.services.login_manager import init_login_manager
 from flask_app.models.ldap_config_manager import LDAPConfigManager
 from flask_app.services.role_config_service import RoleConfigService
+from flask_app.services.dashboard_cache import DashboardStatsCache
+from flask_app.services.directory_index_service import DirectoryIndexService
+from flask_app.services.job_runner import JobRunner
+from flask_app.services.session_store import SQLiteSessionInterface
+from flask_app.services.template_catalog import TemplateCatalogService
 
 # Initialize services
 menu_config = MenuConfig()
@@ -37,6 +42,26 @@ def create_app():
     role_config = RoleConfigService()
     role_config.init_app(app)
     
+    # Initialize dashboard statistics cache
+    dashboard_cache = DashboardStatsCache()
+    dashboard_cache.init_app(app)
+    
+    # Start in-memory directory indexes (fullName autocomplete, ...)
+    directory_indexes = DirectoryIndexService()
+    directory_indexes.init_app(app)
+    
+    # Load user creation templates in memory (creation form, preview, bulk onboarding)
+    template_catalog = TemplateCatalogService()
+    template_catalog.init_app(app)
+    
+    # Initialize background job runner (CSV validation and imports)
+    job_runner = JobRunner()
+    job_runner.init_app(app)
+    
+    # Server-side sessions (the cookie only carries the session id)
+    session_store = SQLiteSessionInterface()
+    session_store.init_app(app)
+    
     # Initialize login manager
     init_login_manager(app)
     
@@ -1,49 +1,64 @@
 # flask_app/models/ldap/autocomplete.py
 from .base import LDAPBase
-from ldap3 import Connection
+from .indexes import FullNameIndex
 
 class LDAPAutocompleteMixin(LDAPBase):
-    def autocomplete(self, search_type, search_term):
+    def autocomplete(self, search_type, search_term, return_complete=False):
+        """
+        Avec return_complete=True, retourne (résultats, complet): complet est False si une
+        base n'a pas répondu (groupes, rôles) ou si la liste a été tronquée (services),
+        None quand il n'est pas déterminé (la limite du type s'applique, voir le cache).
+        """
         # Validation initiale
         if not search_term or not search_type:
-            return []
+            return ([], None) if return_complete else []
                 
         # Ne pas effectuer de recherche si le terme est trop court (uniquement pour fullName)
         if search_type == 'fullName' and len(search_term) < 3:
-            return []
+            return ([], None) if return_complete else []
         
         # Utiliser les fonctions dédiées pour les cas spéciaux
         if search_type == 'roles' or search_type == 'role':
-            return self.autocomplete_role(search_term)
+            return self.autocomplete_role(search_term, return_complete=return_complete)
         elif search_type == 'services':
-            return self.autocomplete_services(search_term)
+            return self.autocomplete_services(search_term, return_complete=return_complete)
+
+        incomplete = set()
+        results = self._autocomplete(search_type, search_term, incomplete)
+        return (results, False if incomplete else None) if return_complete else results
+
+    def _autocomplete(self, search_type, search_term, incomplete):
+        # fullName: répondre depuis l'index en mémoire quand il est chargé
+        if search_type == 'fullName':
+            index = FullNameIndex.get(getattr(self, 'source', None))
+            if index is not None:
+                return index.search(search_term, limit=20)
         
         # Échapper les caractères spéciaux pour LDAP si nécessaire
         search_term_escaped = self._escape_ldap_filter(search_term) if hasattr(self, '_escape_ldap_filter') else search_term
         
+        # Groupes: bases interrogées en parallèle, chacune sur sa connexion
+        if search_type == 'group':
+            results = []
+            entries = self._search_bases([self.base_dn, self.app_base_dn],
+                                         f'(&(cn=*{search_term_escaped}*)(objectClass=groupOfNames))', ['cn'],
+                                         incomplete=incomplete)
+            for entry in entries:
+                if 'cn=UserApplication,cn=DS4,ou=SYSTEM,o=COPY' not in entry['dn']:
+                    results.append({
+                        'label': f"{self._attr(entry, 'cn')} ({entry['dn']})",
+                        'value': self._attr(entry, 'cn')
+                    })
+            return results
+        
         try:
-            # Obtenir une connexion LDAP
-            if hasattr(self, '_get_connection'):
-                conn = self._get_connection()
-            else:
-                conn = Connection(self.ldap_server, user=self.bind_dn, password=self.password, auto_bind=True)
+            # Obtenir une connexion LDAP (empruntée au pool)
+            conn = self._get_connection()
             
             results = []
             
             # Configuration spécifique selon le type de recherche
-            if search_type == 'group':
-                for base_dn in [self.base_dn, self.app_base_dn]:
-                    conn.search(base_dn, f'(&(cn=*{search_term_escaped}*)(objectClass=groupOfNames))', 
-                            search_scope='SUBTREE', attributes=['cn'])
-                    
-                    for entry in conn.entries:
-                        if ('cn=UserApplication,cn=DS4,ou=SYSTEM,o=COPY' not in entry.entry_dn):
-                            results.append({
-                                'label': f"{entry.cn.value} ({entry.entry_dn})",
-                                'value': entry.cn.value
-                            })
-                            
-            elif search_type == 'fullName':
+            if search_type == 'fullName':
                 ldap_filter = f'(&(objectClass=Person)(fullName=*{search_term_escaped}*))'
                 attributes = ['cn', 'fullName']
                 
@@ -85,6 +100,7 @@ class LDAPAutocompleteMixin(LDAPBase):
             
             else:
                 # Type de recherche non reconnu
+                conn.unbind()
                 return []
                     
             # Fermer la connexion
@@ -95,107 +111,75 @@ class LDAPAutocompleteMixin(LDAPBase):
             print(f"Erreur lors de l'autocomplétion ({search_type}): {str(e)}")
             return []
             
-    def autocomplete_role(self, search_term):
+    def autocomplete_role(self, search_term, return_complete=False):
         """
         Fonction d'autocomplétion spécifique pour les rôles, avec validation des DNs.
+
+        Avec return_complete=True, retourne (rôles, complet): complet est False si une
+        base de rôles n'a pas répondu.
         """
+        incomplete = set()
         try:
-            conn = Connection(self.ldap_server, user=self.bind_dn, 
-                            password=self.password, auto_bind=True)
-            
             roles = []
             
             # Vérifier que role_base_dn est bien une liste
             base_dns = self.role_base_dn if isinstance(self.role_base_dn, list) else [self.role_base_dn]
             
-            # Exécuter la recherche pour chaque base_dn valide
-            for base_dn in base_dns:
-                # Vérifier que le base_dn est valide
-                if not base_dn or not isinstance(base_dn, str) or '=' not in base_dn:
-                    print(f"Base DN invalide ignoré: {base_dn}")
-                    continue
-                    
-                try:
-                    print(f"Recherche de rôles dans {base_dn} avec filtre: (cn=*{search_term}*)")
-                    conn.search(base_dn, f'(cn=*{search_term}*)', 
-                            search_scope='SUBTREE', 
-                            attributes=['cn'])
-                    
-                    # Traiter les entrées trouvées dans ce base_dn
-                    for entry in conn.entries:
-                        if hasattr(entry, 'cn') and entry.cn:
-                            label = f"{entry.cn.value}" if hasattr(entry.cn, 'value') else "Unknown"
-                            if hasattr(entry, 'entry_dn'):
-                                label += f" ({entry.entry_dn})"
-                            
-                            roles.append({
-                                'label': label,
-                                'value': entry.cn.value if hasattr(entry.cn, 'value') else entry.entry_dn
-                            })
-                except Exception as e:
-                    print(f"Erreur lors de la recherche dans {base_dn}: {str(e)}")
-                    # Continuer avec le prochain base_dn en cas d'erreur
-                    continue
+            mirror = self._directory_mirror('roles', base_dns)
+            if mirror is not None:
+                entries = mirror.iter_entries('roles', base=base_dns, contains={'cn': search_term})
+            else:
+                # Rechercher dans toutes les bases valides en parallèle
+                print(f"Recherche de rôles dans {base_dns} avec filtre: (cn=*{search_term}*)")
+                entries = self._search_bases(base_dns, f'(cn=*{search_term}*)', ['cn'], incomplete=incomplete)
+            for entry in entries:
+                cn = self._attr(entry, 'cn')
+                if cn:
+                    roles.append({
+                        'label': f"{cn} ({entry['dn']})",
+                        'value': cn
+                    })
             
             print(f"Nombre total de rôles trouvés: {len(roles)}")
-            
-            conn.unbind()
-            return roles
+            return (roles, not incomplete) if return_complete else roles
             
         except Exception as e:
             import traceback
             print(f"Erreur lors de l'autocomplétion des rôles: {str(e)}")
             print(traceback.format_exc())
-            return []
+            return ([], False) if return_complete else []
         
-    def autocomplete_services(self, search_term):
+    def autocomplete_services(self, search_term, return_complete=False):
+        """
+        Services (valeurs de ou) contenant le terme, 20 au plus.
+
+        Avec return_complete=True, retourne (services, complet): complet est False si
+        une base a atteint sa limite de taille ou n'a pas répondu, ou si la liste a été
+        tronquée. Un résultat incomplet ne doit pas servir à filtrer un terme plus long.
+        """
+        incomplete = set()
         try:
-            conn = Connection(self.ldap_server, user=self.bind_dn, password=self.password, auto_bind=True)
-            
             # Échapper le terme de recherche
             search_term_escaped = self._escape_ldap_filter(search_term) if hasattr(self, '_escape_ldap_filter') else search_term
             
             # Dictionnaire pour éliminer les doublons (clé = valeur du service en minuscules)
             unique_services = {}
             
-            # Bases DN à rechercher
-            base_dns = [self.app_base_dn, self.base_dn]
-            
-            # Parcourir toutes les bases DN
-            for base_dn in base_dns:
-                # Vérifier que le base_dn est valide
-                if not base_dn or not isinstance(base_dn, str) or '=' not in base_dn:
-                    print(f"Base DN invalide ignoré dans autocomplete_services: {base_dn}")
-                    continue
-                    
-                try:
-                    # Limiter la recherche pour de meilleures performances
-                    conn.search(
-                        base_dn, 
-                        f'(ou=*{search_term_escaped}*)', 
-                        search_scope='SUBTREE', 
-                        attributes=['ou'],
-                        size_limit=50,  # Limiter le nombre de résultats
-                        time_limit=5     # Limiter le temps de recherche en secondes
-                    )
-                    
-                    # Ajouter chaque service unique au dictionnaire
-                    for entry in conn.entries:
-                        if hasattr(entry, 'ou') and entry.ou and entry.ou.value:
-                            # Utiliser la valeur en minuscules comme clé pour éviter les doublons
-                            service_value = entry.ou.value
-                            service_key = service_value.lower()
-                            
-                            # Ajouter seulement si ce service n'existe pas déjà
-                            if service_key not in unique_services:
-                                unique_services[service_key] = {
-                                    'label': service_value,
-                                    'value': service_value
-                                }
-                except Exception as e:
-                    print(f"Erreur lors de la recherche dans {base_dn}: {str(e)}")
-                    # Continuer avec le prochain base_dn en cas d'erreur
-                    continue
+            # Rechercher dans les bases en parallèle, en limitant chaque recherche pour de meilleures performances
+            entries = self._search_bases([self.app_base_dn, self.base_dn], f'(ou=*{search_term_escaped}*)', ['ou'],
+                                         size_limit=50, timeout=5, incomplete=incomplete)
+            
+            # Ajouter chaque service unique au dictionnaire
+            for entry in entries:
+                service_value = self._attr(entry, 'ou')
+                if service_value:
+                    # Utiliser la valeur en minuscules comme clé pour éviter les doublons
+                    service_key = service_value.lower()
+                    if service_key not in unique_services:
+                        unique_services[service_key] = {
+                            'label': service_value,
+                            'value': service_value
+                        }
             
             # Convertir le dictionnaire en liste pour le retour
             services = list(unique_services.values())
@@ -204,16 +188,12 @@ class LDAPAutocompleteMixin(LDAPBase):
             services.sort(key=lambda x: x['label'])
             
             # Limiter le nombre de résultats retournés
+            complete = not incomplete and len(services) <= 20
             services = services[:20]
-            
-            # Fermer la connexion
-            conn.unbind()
-            return services
+            return (services, complete) if return_complete else services
                 
         except Exception as e:
             import traceback
             print(f"Erreur lors de l'autocomplétion des services: {str(e)}")
             print(traceback.format_exc())
-            if 'conn' in locals() and conn:
-                conn.unbind()
-            return []
\ No newline at end of file
+            return ([], False) if return_complete else []
\ No newline at end of file
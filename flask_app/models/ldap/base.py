@@ -1,8 +1,53 @@
 # flask_app/models/ldap/base.py
-from ldap3 import Server, Connection, ALL
+import heapq
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from ldap3 import Server, ALL, NO_ATTRIBUTES
+from ldap3.core.exceptions import LDAPException, LDAPOperationResult
+from .pool import LDAPConnectionPoolManager
+from .search_executor import LDAPSearchExecutor
+from .mirror import DirectoryMirror
+from .controls import SORT_REQUEST_OID, VLV_REQUEST_OID, sort_control, vlv_control, decode_vlv_response
+from flask_app.utils.cache_utils import TTLCache
 
 
 class LDAPBase:
+    # Attributs d'affichage conservés par le cache DN -> attributs
+    DN_CACHE_ATTRIBUTES = ['cn', 'fullName', 'nrfRoleCategoryKey', 'objectClass']
+    # Caches DN -> attributs, un par source (partagés par toutes les instances)
+    dn_caches = {}
+    # Contrôles annoncés par le root DSE de chaque source (supportedControl)
+    supported_controls = {}
+    # Sources dont le serveur a refusé le tri serveur + VLV: la liste est triée localement
+    vlv_disabled = set()
+    # Listes triées localement, pour les pages suivantes: {(source, bases, filtre, attribut): [(clé, DN)]}
+    sorted_search_cache = TTLCache(max_size=20, default_ttl=120)
+    # Codes de résultat indiquant que le serveur ne sait pas servir la liste triée / virtuelle
+    VLV_UNSUPPORTED_CODES = {12, 18, 53, 60, 76}
+    # Rôles applicatifs (voir config/role_user_types.json) et attribut contenant le DN de leur groupe
+    ROLE_GROUPS = [
+        ('admin', 'admin_group_dn'),
+        ('reader', 'reader_group_dn'),
+        ('OCI-admin', 'oci_admin_group_dn'),
+        ('OCI-reader', 'oci_reader_group_dn'),
+        ('Business-admin', 'Business_admin_group_dn'),
+        ('Business-reader', 'Business_reader_group_dn'),
+        ('BMO_CDM-admin', 'BMO_CDM_admin_group_dn'),
+        ('BMO_CDM-reader', 'BMO_CDM_reader_group_dn'),
+        ('DERDEN-admin', 'Derden_admin_group_dn'),
+        ('DERDEN-reader', 'Derden_reader_group_dn'),
+        ('Dev-admin', 'Dev_admin_group_dn'),
+        ('Dev-reader', 'Dev_reader_group_dn'),
+        ('FirstLine-admin', 'FirstLine_admin_group_dn'),
+        ('FirstLine-reader', 'FirstLine_reader_group_dn'),
+        ('Infra-admin', 'Infra_admin_group_dn'),
+        ('Infra-reader', 'Infra_reader_group_dn'),
+        ('LabExt-admin', 'LabExt_admin_group_dn'),
+        ('LabExt-reader', 'LabExt_reader_group_dn'),
+        ('P&O-admin', 'PO_admin_group_dn'),
+        ('P&O-reader', 'PO_reader_group_dn')
+    ]
+
     def __init__(self, config):
         self.ldap_server = config['ldap_server']
         self.bind_dn = config['bind_dn']
@@ -37,18 +82,58 @@ class LDAPBase:
         self.resource_base_dn = config['resource_base_dn']
         self.app_base_dn = config['app_base_dn']
         self.toprocess_users_dn = config['toprocess_users_dn']
+        # Nombre de valeurs par filtre OR pour les lectures groupées
+        self.batch_chunk_size = config.get('batch_chunk_size', 200)
+        # Taille de page pour les recherches paginées
+        self.paged_size = config.get('paged_size', 1000)
+        # Cache DN -> attributs d'affichage: durée de vie (secondes) et nombre d'entrées
+        self.dn_cache_ttl = config.get('dn_cache_ttl', 600)
+        self.dn_cache_size = config.get('dn_cache_size', 20000)
+        # Recherches multi-bases en parallèle: nombre de threads et délai par base (secondes)
+        self.search_workers = config.get('search_workers', 8)
+        self.search_timeout = config.get('search_timeout', 10)
+        # Résultats de recherche triés et paginés: 'auto' (tri serveur + VLV si annoncés), 'local'
+        self.sorted_search_mode = config.get('sorted_search', 'auto')
+        self.sorted_search_cache_ttl = config.get('sorted_search_cache_ttl', 120)
+        # Rôles au login: 'member' (recherche des groupes de rôles) ou 'groupMembership' (attribut de l'utilisateur)
+        self.login_role_check = config.get('login_role_check', 'member')
+        # Options du pool de connexions (voir pool.py)
+        self.pool_options = {
+            key: value for key, value in config.items() if key.startswith('pool_')
+        }
     
-    def _get_connection(self):
+    def _role_group_dns(self):
         """
-        Obtenir une connexion LDAP déjà établie pour réutilisation.
+        {rôle: DN du groupe} pour les groupes de rôles configurés pour la source.
+        """
+        return {
+            role: getattr(self, attribute, '')
+            for role, attribute in self.ROLE_GROUPS
+            if getattr(self, attribute, '')
+        }
+
+    def _pool_key(self):
         """
-        return Connection(
+        Clé du pool: la source LDAPConfigManager si connue, sinon serveur + compte de service.
+        """
+        return getattr(self, 'source', None) or f"{self.ldap_server}|{self.bind_dn}"
+
+    def _get_pool(self):
+        return LDAPConnectionPoolManager.get_pool(
+            self._pool_key(),
             self.ldap_server,
-            user=self.bind_dn,
-            password=self.password,
-            auto_bind=True
+            self.bind_dn,
+            self.password,
+            self.pool_options
         )
 
+    def _get_connection(self):
+        """
+        Obtenir une connexion LDAP déjà établie pour réutilisation.
+        La connexion provient du pool de la source; unbind() la rend au pool.
+        """
+        return self._get_pool().acquire()
+
     def _escape_ldap_filter(self, input_string):
         """
         Échapper les caractères spéciaux dans un filtre LDAP.
@@ -69,4 +154,550 @@ class LDAPBase:
         for char, replacement in special_chars.items():
             result = result.replace(char, replacement)
         
-        return result
\ No newline at end of file
+        return result
+
+    def _chunks(self, items, size=None):
+        """
+        Découper une liste en lots de taille fixe.
+        """
+        size = size or self.batch_chunk_size
+        for index in range(0, len(items), size):
+            yield items[index:index + size]
+
+    def _unescape_dn_value(self, value):
+        """
+        Retirer les échappements d'une valeur de RDN (RFC 4514), ex: 'Dupont\\, Jean'.
+        """
+        if '\\' not in value:
+            return value
+        result = []
+        index = 0
+        while index < len(value):
+            char = value[index]
+            if char == '\\' and index + 1 < len(value):
+                pair = value[index + 1:index + 3]
+                if len(pair) == 2 and all(c in '0123456789abcdefABCDEF' for c in pair):
+                    result.append(chr(int(pair, 16)))
+                    index += 3
+                    continue
+                result.append(value[index + 1])
+                index += 2
+                continue
+            result.append(char)
+            index += 1
+        return ''.join(result)
+
+    def _split_dn(self, dn):
+        """
+        Découper un DN en (attribut du RDN, valeur du RDN, DN parent).
+        """
+        escaped = False
+        rdn, parent = dn, ''
+        for index, char in enumerate(dn):
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == ',':
+                rdn, parent = dn[:index], dn[index + 1:]
+                break
+        attr, _, value = rdn.partition('=')
+        return attr.strip(), self._unescape_dn_value(value.strip()), parent.strip()
+
+    def _normalize_dn(self, dn):
+        """
+        Forme canonique d'un DN pour les comparaisons (casse et espaces ignorés).
+        """
+        parts = []
+        while dn:
+            attr, value, dn = self._split_dn(dn)
+            parts.append(f"{attr.lower()}={value.lower()}")
+        return ','.join(parts)
+
+    def _attr_raw(self, entry, name):
+        try:
+            return entry['attributes'][name]
+        except KeyError:
+            return None
+
+    def _attr(self, entry, name, default=None):
+        """
+        Première valeur d'un attribut d'une entrée brute ({'dn', 'attributes'}).
+        """
+        value = self._attr_raw(entry, name)
+        if isinstance(value, (list, tuple)):
+            value = value[0] if value else None
+        return default if value is None or value == '' else value
+
+    def _attr_values(self, entry, name):
+        """
+        Toutes les valeurs d'un attribut d'une entrée brute, sous forme de liste.
+        """
+        value = self._attr_raw(entry, name)
+        if value is None:
+            return []
+        return list(value) if isinstance(value, (list, tuple)) else [value]
+
+    def _resolve_dns(self, conn, dns, attributes, search_filter=None, chunk_size=None, failed=None):
+        """
+        Lire plusieurs entrées connues par leur DN en quelques recherches.
+
+        Les DNs sont regroupés par conteneur parent, puis lus par lots avec un
+        filtre OR sur leur RDN (scope LEVEL), au lieu d'une recherche par DN.
+
+        Une lecture en échec (erreur, code résultat autre que succès ou noSuchObject)
+        n'est pas confondue avec une absence: elle lève une exception, ou, si `failed`
+        est fourni, ses DNs y sont ajoutés et les autres lots sont lus.
+
+        Args:
+            conn: Connexion LDAP liée
+            dns (list): DNs à lire
+            attributes (list): Attributs à retourner
+            search_filter (str, optional): Filtre supplémentaire, ex: '(objectClass=groupOfNames)'
+            chunk_size (int, optional): Nombre de DNs par recherche (batch_chunk_size par défaut)
+            failed (set, optional): reçoit les DNs dont la lecture a échoué
+
+        Returns:
+            dict: {DN normalisé: {'dn': DN, 'attributes': {...}}} pour les entrées trouvées
+        """
+        by_parent = {}
+        for dn in dns:
+            if not dn:
+                continue
+            attr, value, parent = self._split_dn(dn)
+            if not parent or not value:
+                continue
+            by_parent.setdefault((parent, attr.lower()), {}).setdefault(value, []).append(dn)
+
+        found = {}
+        for (parent, attr), values in by_parent.items():
+            for chunk in self._chunks(sorted(values), chunk_size):
+                or_filter = ''.join(f'({attr}={self._escape_ldap_filter(value)})' for value in chunk)
+                ldap_filter = f'(|{or_filter})'
+                if search_filter:
+                    ldap_filter = f'(&{search_filter}{ldap_filter})'
+                try:
+                    conn.search(parent, ldap_filter, search_scope='LEVEL', attributes=attributes)
+                    # 32 = noSuchObject: le conteneur n'existe pas, ses entrées non plus
+                    if conn.result.get('result') not in (0, 32):
+                        raise LDAPOperationResult(result=conn.result.get('result'),
+                                                  description=conn.result.get('description'),
+                                                  dn=parent, message=conn.result.get('message'))
+                except Exception as e:
+                    if failed is None:
+                        raise
+                    print(f"Erreur lors de la lecture groupée dans {parent}: {str(e)}")
+                    failed.update(dn for value in chunk for dn in values[value])
+                    continue
+                for item in conn.response or []:
+                    if item.get('type') != 'searchResEntry':
+                        continue
+                    found[self._normalize_dn(item['dn'])] = {
+                        'dn': item['dn'],
+                        'attributes': item['attributes']
+                    }
+        return found
+
+    def _directory_mirror(self, kind, bases):
+        """
+        Miroir local de la source s'il est prêt et copie tous les conteneurs demandés, sinon None
+        (l'appelant interroge alors LDAP). Voir DirectoryMirror.
+        """
+        mirror = DirectoryMirror.get(getattr(self, 'source', None))
+        if mirror is None:
+            return None
+        try:
+            return mirror if mirror.covers(kind, bases) else None
+        except Exception as e:
+            print(f"Miroir de l'annuaire indisponible: {str(e)}")
+            return None
+
+    def _find_mirrored_dn(self, kind, bases, cn, object_class):
+        """
+        DN d'une entrée par son CN, trouvé dans le miroir puis confirmé par une lecture
+        BASE dans LDAP: une entrée supprimée, renommée ou déplacée depuis la dernière
+        synchronisation du miroir n'est pas retournée. None si le miroir ne peut pas répondre.
+        """
+        mirror = self._directory_mirror(kind, bases)
+        if mirror is None:
+            return None
+        entry = mirror.find_first(kind, bases, {'cn': cn})
+        if entry is None:
+            return None
+        conn = self._get_connection()
+        try:
+            conn.search(entry['dn'], f'(&(objectClass={object_class})(cn={self._escape_ldap_filter(cn)}))',
+                        search_scope='BASE', attributes=[NO_ATTRIBUTES])
+            found = any(item.get('type') == 'searchResEntry' for item in conn.response or [])
+        except Exception:
+            # noSuchObject: l'entrée n'existe plus à ce DN
+            found = False
+        finally:
+            conn.unbind()
+        return entry['dn'] if found else None
+
+    def _mirrored_dns(self, conn, dns, attributes, chunk_size=None):
+        """
+        Comme _resolve_dns pour des utilisateurs: les entrées présentes dans le miroir
+        y sont lues, les autres dans LDAP.
+        """
+        mirror = DirectoryMirror.get(getattr(self, 'source', None))
+        found = {}
+        if mirror is not None:
+            try:
+                found = mirror.get_entries('users', dns)
+            except Exception as e:
+                print(f"Miroir de l'annuaire indisponible: {str(e)}")
+        missing = [dn for dn in dns if dn and self._normalize_dn(dn) not in found]
+        if missing:
+            found.update(self._resolve_dns(conn, missing, attributes, chunk_size=chunk_size))
+        return found
+
+    def _dn_cache(self):
+        key = self._pool_key()
+        cache = LDAPBase.dn_caches.get(key)
+        if cache is None:
+            cache = LDAPBase.dn_caches.setdefault(key, TTLCache(max_size=self.dn_cache_size,
+                                                                default_ttl=self.dn_cache_ttl))
+        return cache
+
+    def _lookup_dns(self, conn, dns):
+        """
+        Attributs d'affichage (DN_CACHE_ATTRIBUTES) de plusieurs DNs, via le cache de la source.
+
+        Seuls les DNs absents du cache sont lus, en lectures groupées (_resolve_dns).
+        Les DNs introuvables sont aussi mis en cache, pour une durée plus courte. Si une
+        lecture échoue, les entrées lues sont mises en cache puis l'erreur est levée:
+        un DN non lu n'est jamais mis en cache comme introuvable.
+
+        Returns:
+            dict: {DN normalisé: entrée brute} pour les DNs trouvés
+        """
+        cache = self._dn_cache()
+        found = {}
+        missing = []
+        for dn in dns:
+            if not dn:
+                continue
+            key = self._normalize_dn(dn)
+            if key in found:
+                continue
+            entry = cache.get(key, default=False)
+            if entry is False:
+                missing.append(dn)
+            elif entry is not None:
+                found[key] = entry
+
+        if missing:
+            failed = set()
+            entries = self._resolve_dns(conn, missing, self.DN_CACHE_ATTRIBUTES, failed=failed)
+            for dn in missing:
+                key = self._normalize_dn(dn)
+                entry = entries.get(key)
+                if entry is not None:
+                    cache.set(key, entry)
+                    found[key] = entry
+                elif dn not in failed:
+                    cache.set(key, None, ttl=min(60, self.dn_cache_ttl))
+            if failed:
+                raise LDAPException(f"{len(failed)} referenced DN(s) could not be read from LDAP")
+        return found
+
+    def _invalidate_dns(self, *dns):
+        cache = self._dn_cache()
+        for dn in dns:
+            if dn:
+                cache.delete(self._normalize_dn(dn))
+
+    def _has_object_class(self, entry, object_class):
+        return object_class.lower() in (str(value).lower() for value in self._attr_values(entry, 'objectClass'))
+
+    def _paged_search(self, conn, search_base, search_filter, attributes, search_scope='SUBTREE', paged_size=None,
+                      size_limit=0, time_limit=0):
+        """
+        Recherche paginée (contrôle Simple Paged Results) renvoyant les entrées une à une.
+
+        Seule la page courante est gardée en mémoire, ce qui évite les limites de
+        taille du serveur et l'accumulation de toutes les entrées dans conn.entries.
+        La page et son cookie sont lus avant de rendre la première entrée: l'appelant
+        peut utiliser la même connexion pendant l'itération.
+
+        Args:
+            paged_size (int, optional): Entrées par page (paged_size de la configuration par défaut)
+            size_limit (int): Nombre maximal d'entrées (0 = pas de limite)
+            time_limit (int): Délai maximal côté serveur par page, en secondes (0 = pas de limite)
+
+        Yields:
+            dict: entrée brute {'dn': ..., 'attributes': {...}}
+        """
+        if isinstance(attributes, str):
+            attributes = [attributes]
+        cookie = None
+        returned = 0
+        while True:
+            conn.search(search_base=search_base,
+                        search_filter=search_filter,
+                        search_scope=search_scope,
+                        attributes=attributes,
+                        paged_size=paged_size or self.paged_size,
+                        paged_cookie=cookie,
+                        size_limit=size_limit,
+                        time_limit=time_limit)
+            page = [
+                {'dn': item['dn'], 'attributes': item['attributes']}
+                for item in conn.response or []
+                if item.get('type') == 'searchResEntry'
+            ]
+            cookie = conn.result.get('controls', {}).get('1.2.840.113556.1.4.319', {}).get('value', {}).get('cookie')
+            for entry in page:
+                yield entry
+                returned += 1
+                if size_limit and returned >= size_limit:
+                    return
+            if not cookie:
+                break
+
+    def _iter_search(self, search_bases, search_filter, attributes, search_scope='SUBTREE', paged_size=None):
+        """
+        Recherche paginée sur une ou plusieurs bases (l'une après l'autre), avec sa propre
+        connexion du pool, rendue quand le générateur est épuisé ou fermé.
+
+        À utiliser pour toute requête qui renvoie une liste: les entrées arrivent page
+        par page au lieu d'être accumulées dans conn.entries.
+
+        Yields:
+            dict: entrée brute {'dn': ..., 'attributes': {...}}
+        """
+        if isinstance(search_bases, str):
+            search_bases = [search_bases]
+        conn = self._get_connection()
+        try:
+            for search_base in search_bases:
+                if not search_base:
+                    continue
+                yield from self._paged_search(conn, search_base, search_filter, attributes,
+                                              search_scope=search_scope, paged_size=paged_size)
+        finally:
+            conn.unbind()
+
+    def _count_entries(self, search_base, search_filter, search_scope='SUBTREE'):
+        """
+        Compter les entrées d'une recherche paginée sans lire leurs attributs.
+        """
+        return sum(1 for _ in self._iter_search(search_base, search_filter, [NO_ATTRIBUTES],
+                                                search_scope=search_scope))
+
+    def _entry_value(self, entry, name):
+        """
+        Valeur d'un attribut d'une entrée brute au format de ldap3 Entry.value:
+        la valeur seule si elle est unique, la liste sinon, '' si absente.
+        """
+        value = self._attr_raw(entry, name)
+        if isinstance(value, (list, tuple)):
+            if not value:
+                return ''
+            return value[0] if len(value) == 1 else list(value)
+        return '' if value is None else value
+
+    def _supported_controls(self):
+        """
+        OIDs des contrôles annoncés par le serveur (lu une fois par source dans le root DSE).
+        """
+        key = self._pool_key()
+        controls = LDAPBase.supported_controls.get(key)
+        if controls is not None:
+            return controls
+        controls = set()
+        conn = self._get_connection()
+        try:
+            conn.search('', '(objectClass=*)', search_scope='BASE', attributes=['supportedControl'])
+            for item in conn.response or []:
+                if item.get('type') == 'searchResEntry':
+                    controls = {str(value) for value in self._attr_values(item, 'supportedControl')}
+        except Exception as e:
+            print(f"Impossible de lire les contrôles supportés: {str(e)}")
+        finally:
+            conn.unbind()
+        LDAPBase.supported_controls[key] = controls
+        return controls
+
+    def _can_use_vlv(self):
+        if self.sorted_search_mode != 'auto' or self._pool_key() in LDAPBase.vlv_disabled:
+            return False
+        controls = self._supported_controls()
+        return SORT_REQUEST_OID in controls and VLV_REQUEST_OID in controls
+
+    def _vlv_page(self, search_base, search_filter, attributes, sort_attribute, offset, page_size):
+        """
+        Une page de résultats triés par le serveur (tri serveur + VLV).
+
+        Returns:
+            dict ou None: {'entries', 'total'}, ou None si le serveur n'a pas servi la liste
+        """
+        conn = self._get_connection()
+        try:
+            conn.search(search_base, search_filter, search_scope='SUBTREE', attributes=attributes,
+                        controls=[sort_control([sort_attribute]),
+                                  vlv_control(offset + 1, before_count=0, after_count=page_size - 1)])
+            code = conn.result.get('result')
+            vlv = decode_vlv_response(conn.result.get('controls'))
+            if code != 0 or not vlv or vlv['result'] != 0:
+                reason = vlv['result'] if vlv else code
+                print(f"Tri serveur / VLV refusé (code {reason}), tri local utilisé")
+                if not vlv or reason in self.VLV_UNSUPPORTED_CODES:
+                    LDAPBase.vlv_disabled.add(self._pool_key())
+                return None
+            entries = [
+                {'dn': item['dn'], 'attributes': item['attributes']}
+                for item in conn.response or []
+                if item.get('type') == 'searchResEntry'
+            ]
+            return {'entries': entries[:page_size], 'total': vlv['content_count']}
+        except Exception as e:
+            print(f"Erreur de recherche VLV, tri local utilisé: {str(e)}")
+            return None
+        finally:
+            conn.unbind()
+
+    def _sorted_keys(self, conn, search_bases, search_filter, sort_attribute):
+        """
+        Liste triée (clé de tri, DN) de toutes les entrées, fusionnée entre les bases.
+
+        Chaque base est lue par recherche paginée (seul l'attribut de tri est demandé)
+        puis triée; les listes par base sont fusionnées (heapq.merge) sans doublons.
+        Le résultat est gardé quelques minutes pour servir les pages suivantes.
+        """
+        cache_key = (self._pool_key(), tuple(search_bases), search_filter, sort_attribute.lower())
+        keys = LDAPBase.sorted_search_cache.get(cache_key)
+        if keys is not None:
+            return keys
+        streams = []
+        for search_base in search_bases:
+            streams.append(sorted(
+                (str(self._attr(entry, sort_attribute, '')).casefold(), entry['dn'])
+                for entry in self._paged_search(conn, search_base, search_filter, [sort_attribute])
+            ))
+        keys = []
+        seen = set()
+        for key, dn in heapq.merge(*streams):
+            normalized = self._normalize_dn(dn)
+            if normalized not in seen:
+                seen.add(normalized)
+                keys.append((key, dn))
+        LDAPBase.sorted_search_cache.set(cache_key, keys, ttl=self.sorted_search_cache_ttl)
+        return keys
+
+    def _sorted_search_page(self, search_bases, search_filter, attributes, sort_attribute='cn',
+                            offset=0, page_size=50):
+        """
+        Une page de résultats de recherche triés, sans charger toute la liste.
+
+        - une seule base et tri serveur + VLV annoncés: la page est demandée au serveur
+        - sinon: liste triée localement (voir _sorted_keys), puis lecture groupée
+          des attributs des seules entrées de la page
+
+        Args:
+            offset (int): Position de la première entrée (0 = début)
+            page_size (int): Nombre d'entrées par page
+
+        Returns:
+            dict: {'entries', 'total', 'offset', 'page_size', 'next_offset', 'prev_offset', 'mode'}
+                  next_offset / prev_offset valent None en fin / début de liste
+        """
+        if isinstance(search_bases, str):
+            search_bases = [search_bases]
+        search_bases = [base for base in search_bases if base]
+        offset = max(0, int(offset or 0))
+        page_size = max(1, int(page_size or 50))
+
+        page = None
+        if len(search_bases) == 1 and self._can_use_vlv():
+            page = self._vlv_page(search_bases[0], search_filter, attributes, sort_attribute, offset, page_size)
+            if page is not None:
+                page['mode'] = 'server'
+        if page is None:
+            conn = self._get_connection()
+            try:
+                keys = self._sorted_keys(conn, search_bases, search_filter, sort_attribute)
+                window = keys[offset:offset + page_size]
+                found = self._resolve_dns(conn, [dn for _, dn in window], attributes)
+            finally:
+                conn.unbind()
+            entries = [found[self._normalize_dn(dn)] for _, dn in window if self._normalize_dn(dn) in found]
+            page = {'entries': entries, 'total': len(keys), 'mode': 'local'}
+
+        page['offset'] = offset
+        page['page_size'] = page_size
+        page['next_offset'] = offset + page_size if offset + page_size < page['total'] else None
+        page['prev_offset'] = max(0, offset - page_size) if offset > 0 else None
+        return page
+
+    def _search_bases(self, base_dns, search_filter, attributes, search_scope='SUBTREE',
+                      size_limit=0, timeout=None, incomplete=None):
+        """
+        Exécuter la même recherche sur plusieurs bases en parallèle.
+
+        Chaque base est interrogée sur sa propre connexion du pool; la latence est
+        celle de la base la plus lente et non la somme. Une base en erreur ou qui
+        dépasse `timeout` secondes est ignorée (avec un message) sans bloquer les autres.
+
+        Args:
+            incomplete (set, optional): reçoit les bases dont le résultat est partiel
+                (coupé par size_limit ou sizeLimitExceeded, erreur, délai dépassé)
+
+        Returns:
+            list: entrées brutes {'dn', 'attributes'} dans l'ordre des bases,
+                  sans doublons (une même entrée peut être sous deux bases imbriquées)
+        """
+        timeout = timeout or self.search_timeout
+        valid_bases = []
+        for base_dn in base_dns:
+            if not base_dn or not isinstance(base_dn, str) or '=' not in base_dn:
+                print(f"Base DN invalide ignoré: {base_dn}")
+                continue
+            if base_dn not in valid_bases:
+                valid_bases.append(base_dn)
+
+        def run(base_dn):
+            conn = self._get_connection()
+            try:
+                entries = list(self._paged_search(conn, base_dn, search_filter, attributes,
+                                                  search_scope=search_scope, size_limit=size_limit,
+                                                  time_limit=int(timeout)))
+                # 4 = sizeLimitExceeded, 3 = timeLimitExceeded
+                if conn.result.get('result') in (3, 4) or (size_limit and len(entries) >= size_limit):
+                    if incomplete is not None:
+                        incomplete.add(base_dn)
+                return entries
+            finally:
+                conn.unbind()
+
+        results = {}
+        if len(valid_bases) == 1:
+            try:
+                results[valid_bases[0]] = run(valid_bases[0])
+            except Exception as e:
+                print(f"Erreur lors de la recherche dans {valid_bases[0]}: {str(e)}")
+        elif valid_bases:
+            executor = LDAPSearchExecutor.get(self.search_workers)
+            futures = [(base_dn, executor.submit(run, base_dn)) for base_dn in valid_bases]
+            deadline = time.monotonic() + timeout
+            for base_dn, future in futures:
+                try:
+                    results[base_dn] = future.result(timeout=max(0, deadline - time.monotonic()))
+                except FuturesTimeoutError:
+                    print(f"Délai dépassé ({timeout}s) pour la recherche dans {base_dn}")
+                except Exception as e:
+                    print(f"Erreur lors de la recherche dans {base_dn}: {str(e)}")
+        if incomplete is not None:
+            incomplete.update(base_dn for base_dn in valid_bases if base_dn not in results)
+
+        merged = []
+        seen = set()
+        for base_dn in valid_bases:
+            for entry in results.get(base_dn, []):
+                key = self._normalize_dn(entry['dn'])
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(entry)
+        return merged
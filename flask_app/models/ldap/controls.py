@@ -0,0 +1,118 @@
+# flask_app/models/ldap/controls.py
+"""
+Contrôles LDAP de tri côté serveur (RFC 2891) et de liste virtuelle (VLV,
+draft-ietf-ldapext-ldapv3-vlv), absents de ldap3.
+
+Les valeurs sont encodées avec pyasn1 (déjà requis par ldap3); les fonctions
+renvoient des Control ldap3 à passer à conn.search(controls=[...]).
+"""
+from ldap3.protocol.controls import build_control
+from pyasn1.codec.ber import decoder, encoder
+from pyasn1.type import namedtype, tag, univ
+
+SORT_REQUEST_OID = '1.2.840.113556.1.4.473'
+SORT_RESPONSE_OID = '1.2.840.113556.1.4.474'
+VLV_REQUEST_OID = '2.16.840.1.113730.3.4.9'
+VLV_RESPONSE_OID = '2.16.840.1.113730.3.4.10'
+
+
+class SortKey(univ.Sequence):
+    componentType = namedtype.NamedTypes(
+        namedtype.NamedType('attributeType', univ.OctetString()),
+        namedtype.OptionalNamedType('orderingRule', univ.OctetString().subtype(
+            implicitTag=tag.Tag(tag.tagClassContext, tag.tagFormatSimple, 0))),
+        namedtype.DefaultedNamedType('reverseOrder', univ.Boolean(False).subtype(
+            implicitTag=tag.Tag(tag.tagClassContext, tag.tagFormatSimple, 1)))
+    )
+
+
+class SortKeyList(univ.SequenceOf):
+    componentType = SortKey()
+
+
+class ByOffset(univ.Sequence):
+    tagSet = univ.Sequence.tagSet.tagImplicitly(tag.Tag(tag.tagClassContext, tag.tagFormatConstructed, 0))
+    componentType = namedtype.NamedTypes(
+        namedtype.NamedType('offset', univ.Integer()),
+        namedtype.NamedType('contentCount', univ.Integer())
+    )
+
+
+class VLVTarget(univ.Choice):
+    componentType = namedtype.NamedTypes(
+        namedtype.NamedType('byOffset', ByOffset()),
+        namedtype.NamedType('greaterThanOrEqual', univ.OctetString().subtype(
+            implicitTag=tag.Tag(tag.tagClassContext, tag.tagFormatSimple, 1)))
+    )
+
+
+class VirtualListViewRequest(univ.Sequence):
+    componentType = namedtype.NamedTypes(
+        namedtype.NamedType('beforeCount', univ.Integer()),
+        namedtype.NamedType('afterCount', univ.Integer()),
+        namedtype.NamedType('target', VLVTarget()),
+        namedtype.OptionalNamedType('contextID', univ.OctetString())
+    )
+
+
+class VirtualListViewResponse(univ.Sequence):
+    componentType = namedtype.NamedTypes(
+        namedtype.NamedType('targetPosition', univ.Integer()),
+        namedtype.NamedType('contentCount', univ.Integer()),
+        namedtype.NamedType('virtualListViewResult', univ.Enumerated()),
+        namedtype.OptionalNamedType('contextID', univ.OctetString())
+    )
+
+
+def sort_control(attributes, reverse=False, criticality=True):
+    """
+    Contrôle de tri côté serveur sur un ou plusieurs attributs.
+    """
+    keys = SortKeyList()
+    for index, attribute in enumerate(attributes):
+        key = SortKey()
+        key['attributeType'] = attribute
+        if reverse:
+            key['reverseOrder'] = True
+        keys.setComponentByPosition(index, key)
+    return build_control(SORT_REQUEST_OID, criticality, encoder.encode(keys), encode_control_value=False)
+
+
+def vlv_control(offset, before_count=0, after_count=0, content_count=0, context_id=None, criticality=True):
+    """
+    Contrôle VLV ciblant une position (1 = première entrée de la liste triée).
+
+    content_count=0 indique au serveur d'utiliser son propre décompte.
+    """
+    request = VirtualListViewRequest()
+    request['beforeCount'] = before_count
+    request['afterCount'] = after_count
+    target = request['target']
+    target['byOffset']['offset'] = offset
+    target['byOffset']['contentCount'] = content_count
+    if context_id:
+        request['contextID'] = context_id
+    return build_control(VLV_REQUEST_OID, criticality, encoder.encode(request), encode_control_value=False)
+
+
+def decode_vlv_response(controls):
+    """
+    Lire le contrôle de réponse VLV depuis conn.result['controls'].
+
+    Returns:
+        dict ou None: {'target_position', 'content_count', 'result', 'context_id'}
+    """
+    control = (controls or {}).get(VLV_RESPONSE_OID)
+    if not control:
+        return None
+    value = control.get('value')
+    if isinstance(value, dict):
+        return value
+    response, _ = decoder.decode(value, asn1Spec=VirtualListViewResponse())
+    context_id = response['contextID']
+    return {
+        'target_position': int(response['targetPosition']),
+        'content_count': int(response['contentCount']),
+        'result': int(response['virtualListViewResult']),
+        'context_id': bytes(context_id) if context_id.isValue else None
+    }
@@ -1,71 +1,103 @@
 # flask_app/models/ldap/dashboard.py
 from .base import LDAPBase
-from ldap3 import Connection
-from datetime import datetime, timedelta
-from flask_app.models.ldap.users.user_crud import LDAPUserCRUD
+from datetime import datetime, timedelta, timezone
+from ldap3.core.exceptions import LDAPOperationResult
 
 class LDAPDashboardMixin(LDAPBase):
-    def _get_user_crud(self):
-        config = {
-        'ldap_server': self.ldap_server,
-        'bind_dn': self.bind_dn,
-        'bind_password': self.password,
-        'base_dn': self.base_dn,
-        'actif_users_dn': self.actif_users_dn,
-        'out_users_dn': self.out_users_dn,
-        'all_users_dn': self.all_users_dn,
-        'template_dn': self.template_dn,
-        'usercreation_dn': self.usercreation_dn,
-        'admin_group_dn': self.admin_group_dn,
-        'reader_group_dn': self.reader_group_dn,
-        'oci_admin_group_dn': self.oci_admin_group_dn,
-        'oci_reader_group_dn': self.oci_reader_group_dn,
-        'role_base_dn': self.role_base_dn,
-        'resource_base_dn': self.resource_base_dn,
-        'app_base_dn': self.app_base_dn,
-        'toprocess_users_dn': self.toprocess_users_dn
+    def get_dashboard_stats(self, inactive_months=3, disabled_user_type=None, recent_days=7):
+        """
+        Calcule tous les compteurs du tableau de bord en un seul parcours paginé
+        de actif_users_dn (au lieu d'une recherche complète par compteur), ou du
+        miroir local de l'annuaire s'il est actif.
+
+        Les erreurs LDAP sont propagées: l'appelant ne reçoit jamais de compteurs partiels.
+        """
+        now = datetime.now(timezone.utc)
+        recent_limit = now - timedelta(days=recent_days)
+        inactive_limit = now - timedelta(days=30*inactive_months)
+        
+        attributes = ['loginTime', 'loginDisabled', 'passwordExpirationTime']
+        if disabled_user_type == 'DMO':
+            attributes.append('FavvEmployeeType')
+        
+        stats = {
+            'total_users': 0,
+            'recent_logins': 0,
+            'disabled_accounts': 0,
+            'inactive_users': 0,
+            'expired_password_users': 0,
+            'never_logged_in_users': 0
         }
-        return LDAPUserCRUD(config)
+        
+        # Miroir local s'il est actif, sinon un parcours paginé dans LDAP
+        mirror = self._directory_mirror('users', self.actif_users_dn)
+        conn = None
+        try:
+            if mirror is not None:
+                entries = mirror.iter_entries('users', base=self.actif_users_dn)
+            else:
+                conn = self._get_connection()
+                entries = self._paged_search(conn, self.actif_users_dn, '(objectClass=Person)', attributes)
+            for entry in entries:
+                login_time = self._to_datetime(self._attr(entry, 'loginTime'))
+                password_expiration = self._to_datetime(self._attr(entry, 'passwordExpirationTime'))
+                login_disabled = self._to_bool(self._attr(entry, 'loginDisabled'))
+                
+                stats['total_users'] += 1
+                
+                if login_time and login_time >= recent_limit:
+                    stats['recent_logins'] += 1
+                
+                if login_disabled is True:
+                    if disabled_user_type != 'DMO' or self._attr(entry, 'FavvEmployeeType') == 'CWK - DMO':
+                        stats['disabled_accounts'] += 1
+                
+                # Comme les filtres (loginDisabled=FALSE), les comptes sans attribut loginDisabled sont ignorés
+                if login_disabled is False:
+                    if login_time is None:
+                        stats['never_logged_in_users'] += 1
+                    elif login_time <= inactive_limit:
+                        stats['inactive_users'] += 1
+                    if password_expiration and password_expiration <= now:
+                        stats['expired_password_users'] += 1
+
+            # Un parcours interrompu (limite de temps, serveur occupé...) donnerait des compteurs partiels
+            if conn is not None and conn.result.get('result') != 0:
+                raise LDAPOperationResult(result=conn.result.get('result'),
+                                          description=conn.result.get('description'),
+                                          message=conn.result.get('message'))
+        finally:
+            if conn is not None:
+                conn.unbind()
+        
+        return stats
     
+    def _to_datetime(self, value):
+        """
+        Convertit une valeur GeneralizedTime (datetime ldap3 ou chaîne '20240131120000Z') en datetime UTC.
+        """
+        if not value:
+            return None
+        if isinstance(value, datetime):
+            return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        try:
+            return datetime.strptime(str(value)[:14], "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc)
+        except ValueError:
+            return None
     
-    def get_dashboard_stats(self, inactive_months=3, disabled_user_type=None):
-        return {
-            'total_users': self.get_total_users_count(),
-            'recent_logins': self.get_recent_logins_count(),
-            'disabled_accounts': self.get_disabled_accounts_count(user_type=disabled_user_type),
-            'inactive_users': self.get_inactive_users_count(months=inactive_months),
-            'expired_password_users': self.get_expired_password_users_count(),
-            'never_logged_in_users': self.get_never_logged_in_users_count()
-        }
+    def _to_bool(self, value):
+        """
+        Convertit un booléen LDAP (True/'TRUE'/'FALSE') en bool, ou None si absent.
+        """
+        if value is None:
+            return None
+        if isinstance(value, bool):
+            return value
+        return str(value).upper() == 'TRUE'
         
     def get_total_users_count(self):
         try:
-            conn = Connection(self.ldap_server, user=self.bind_dn, password=self.password, auto_bind=True)
-            search_base = self.actif_users_dn
-            search_filter = '(objectClass=Person)'
-            
-            conn.search(search_base=search_base,
-                        search_filter=search_filter,
-                        search_scope='SUBTREE',
-                        attributes=['cn'],
-                        paged_size=1000)
-                        
-            total_entries = len(conn.entries)
-            
-            # Si la recherche est paginée, récupérer toutes les pages
-            cookie = conn.result.get('controls', {}).get('1.2.840.113556.1.4.319', {}).get('value', {}).get('cookie')
-            while cookie:
-                conn.search(search_base=search_base,
-                            search_filter=search_filter,
-                            search_scope='SUBTREE',
-                            attributes=['cn'],
-                            paged_size=1000,
-                            paged_cookie=cookie)
-                total_entries += len(conn.entries)
-                cookie = conn.result.get('controls', {}).get('1.2.840.113556.1.4.319', {}).get('value', {}).get('cookie')
-            
-            conn.unbind()
-            return total_entries
+            return self._count_entries(self.actif_users_dn, '(objectClass=Person)')
             
         except Exception as e:
             print(f"Erreur lors du comptage des utilisateurs: {str(e)}")
@@ -73,26 +105,15 @@ class LDAPDashboardMixin(LDAPBase):
         
     def get_recent_logins_count(self, days=7):
         try:
-            user_crud = self._get_user_crud()
-            
             # Calculer la date limite (timestamp en format GeneralizedTime)
             limit_date = datetime.now() - timedelta(days=days)
             limit_timestamp = limit_date.strftime("%Y%m%d%H%M%SZ")
             
             # Définir le filtre LDAP pour les connexions récentes
             search_filter = f'(&(objectClass=Person)(loginTime>={limit_timestamp}))'
-           
-            options = {
-                'container': 'active',
-                'return_list': True,
-                'attributes': ['cn', 'loginTime']
-            }
-            
-            # Obtenir les utilisateurs avec une connexion récente
-            recent_users = user_crud.get_user(search_filter, options)
             
-            # Retourner le nombre d'utilisateurs trouvés
-            return len(recent_users)
+            # Compter les utilisateurs avec une connexion récente (recherche paginée)
+            return self._count_entries(self.actif_users_dn, search_filter)
             
         except Exception as e:
             print(f"Erreur lors du comptage des connexions récentes: {str(e)}")
@@ -112,11 +133,15 @@ class LDAPDashboardMixin(LDAPBase):
             int or list: Nombre ou liste des comptes désactivés selon return_count
         """
         try:
-            user_crud = self._get_user_crud()
-            
             # Filtre de base pour les comptes désactivés
             search_filter = '(&(objectClass=Person)(loginDisabled=TRUE))'
             
+            if return_count:
+                if user_type == 'DMO':
+                    search_filter = '(&(objectClass=Person)(loginDisabled=TRUE)(FavvEmployeeType=CWK - DMO))'
+                return self._count_entries(self.actif_users_dn, search_filter)
+            
+            # get_user vient de LDAPUserCRUD, combiné avec ce mixin dans LDAPModel
             options = {
                 'container': 'active',
                 'return_list': True,
@@ -127,61 +152,35 @@ class LDAPDashboardMixin(LDAPBase):
             if user_type == 'DMO':
                 options['filter_attributes'] = {'FavvEmployeeType': 'CWK - DMO'}
             
-            disabled_accounts = user_crud.get_user(search_filter, options)
-            
-            if return_count:
-                return len(disabled_accounts)
-            else:
-                return disabled_accounts
+            return self.get_user(search_filter, options)
         except Exception as e:
             print(f"Erreur lors de la récupération des comptes désactivés: {str(e)}")
             return 0 if return_count else []
         
     def get_inactive_users_count(self, months=3):
         try:
-            user_crud = self._get_user_crud()
             # Calculer la date limite (timestamp en format GeneralizedTime)
             limit_date = datetime.now() - timedelta(days=30*months)
             limit_timestamp = limit_date.strftime("%Y%m%d%H%M%SZ")
             search_filter = f'(&(objectClass=Person)(loginDisabled=FALSE)(loginTime<={limit_timestamp}))'
-            options = {
-                'container': 'active',
-                'return_list': True,
-                'attributes': ['cn', 'loginTime']
-            }
-            inactive_users = user_crud.get_user(search_filter, options)
-            return len(inactive_users)
+            return self._count_entries(self.actif_users_dn, search_filter)
         except Exception as e:
             print(f"Erreur lors du comptage des utilisateurs inactifs: {str(e)}")
             return 0
     
     def get_expired_password_users_count(self):
         try:
-            user_crud = self._get_user_crud()
             current_date = datetime.now().strftime("%Y%m%d%H%M%SZ")
             search_filter = f'(&(objectClass=Person)(loginDisabled=FALSE)(passwordExpirationTime<={current_date}))'
-            options = {
-                'container': 'active',
-                'return_list': True,
-                'attributes': ['cn', 'passwordExpirationTime']
-            }
-            expired_password_users = user_crud.get_user(search_filter, options)
-            return len(expired_password_users)
+            return self._count_entries(self.actif_users_dn, search_filter)
         except Exception as e:
             print(f"Erreur lors du comptage des utilisateurs avec mot de passe expiré: {str(e)}")
             return 0
         
     def get_never_logged_in_users_count(self):
         try:
-            user_crud = self._get_user_crud()
             search_filter = '(&(objectClass=Person)(loginDisabled=FALSE)(!(loginTime=*)))'
-            options = {
-                'container': 'active',
-                'return_list': True,
-                'attributes': 'cn'
-            }
-            never_logged_in = user_crud.get_user(search_filter, options)
-            return len(never_logged_in)
+            return self._count_entries(self.actif_users_dn, search_filter)
         except Exception as e:
             print(f"Erreur lors du comptage des utilisateurs n'ayant jamais effectué de connexion: {str(e)}")
             return 0
@@ -1,6 +1,6 @@
 # flask_app/models/ldap/groups.py
 from .base import LDAPBase
-from ldap3 import Connection, MODIFY_ADD, MODIFY_DELETE
+from ldap3 import MODIFY_ADD, MODIFY_DELETE
 from flask import flash
 
 class LDAPGroupMixin(LDAPBase):
@@ -15,39 +15,90 @@ class LDAPGroupMixin(LDAPBase):
         pass
     
     
+    def _get_members_details(self, conn, member_dns, chunk_size=None):
+        """
+        Récupérer cn/fullName/title/ou de tous les membres d'un groupe.
+
+        Les membres sont lus dans le miroir local s'il est actif, sinon par lots
+        (voir LDAPBase._resolve_dns): le coût dépend du nombre de lots et non du
+        nombre de membres. L'ordre des membres est conservé.
+        """
+        entries = self._mirrored_dns(conn, member_dns, ['cn', 'fullName', 'title', 'ou'],
+                                    chunk_size=chunk_size)
+        users = []
+        for member_dn in member_dns:
+            user = entries.get(self._normalize_dn(member_dn))
+            if not user:
+                print(f"User not found for DN: {member_dn}")
+                continue
+            users.append({
+                'CN': self._attr(user, 'cn', 'Unknown'),
+                'fullName': self._attr(user, 'fullName', 'Unknown'),
+                'title': self._attr(user, 'title', 'N/A'),
+                'service': self._attr(user, 'ou', 'N/A')
+            })
+        return users
+
+    def iter_group_users(self, group_dn, chunk_size=None):
+        """
+        Générateur des membres d'un groupe (mêmes champs que get_group_users), lot par lot.
+
+        Chaque lot est lu puis rendu avant de lire le suivant: un export peut envoyer
+        ses premières lignes sans attendre la lecture de tout le groupe. La connexion
+        est rendue au pool quand le générateur est épuisé ou fermé.
+        """
+        conn = self._get_connection()
+        try:
+            conn.search(group_dn, '(objectClass=groupOfNames)', search_scope='BASE', attributes=['member'])
+            members = []
+            for item in conn.response or []:
+                if item.get('type') == 'searchResEntry':
+                    members = self._attr_values(item, 'member')
+            for chunk in self._chunks(members, chunk_size):
+                yield from self._get_members_details(conn, chunk, chunk_size)
+        finally:
+            conn.unbind()
+
+    def _group_search_bases(self):
+        """
+        Conteneurs de groupes, par ordre de priorité.
+        """
+        return ['ou=Groups,ou=IAM-Security,o=COPY', self.app_base_dn, 'ou=GROUPS,ou=SYNC,o=COPY']
+
+    def _find_group_dn(self, group_name):
+        """
+        Trouver le DN d'un groupe par son CN. Les conteneurs sont interrogés en parallèle;
+        le premier conteneur (par ordre de priorité) qui contient le groupe l'emporte.
+        """
+        bases = self._group_search_bases()
+        group_dn = self._find_mirrored_dn('groups', bases, group_name, 'groupOfNames')
+        if group_dn:
+            return group_dn
+        entries = self._search_bases(bases, f'(cn={self._escape_ldap_filter(group_name)})', ['cn'])
+        return entries[0]['dn'] if entries else None
+
     def get_group_users(self, group_name):
-        conn = Connection(self.ldap_server, user=self.bind_dn, password=self.password, auto_bind=True) 
-        group_dn = None
-        for base_dn in ['ou=Groups,ou=IAM-Security,o=COPY', self.app_base_dn, 'ou=GROUPS,ou=SYNC,o=COPY']:
-            conn.search(base_dn, f'(cn={group_name})', search_scope='SUBTREE', attributes=['cn'])
-            if conn.entries:
-                group_dn = conn.entries[0].entry_dn
-                break
+        group_dn = self._find_group_dn(group_name)
+        conn = self._get_connection()
 
         if group_dn:
             # Fetch the group's members
             conn.search(group_dn, '(objectClass=groupOfNames)', attributes=['member'])
             if conn.entries and conn.entries[0].member:
                 members = conn.entries[0].member.values
-                users = []
-                # Fetch details for each member
-                for member_dn in members:
-                    conn.search(member_dn, '(objectClass=*)', attributes=['cn', 'fullName', 'title', 'ou'])
-                    if conn.entries:
-                        user = conn.entries[0]
-                        users.append({
-                            'CN': user.cn.value,
-                            'fullName': user.fullName.value,
-                            'title': user.title.value if user.title else 'N/A',
-                            'service': user.ou.value if user.ou else 'N/A'
-                        })
-                    else:
-                        print(f"User not found for DN: {member_dn}")
-                result = {
-                    'group_name': group_name,
-                    'group_dn': group_dn,
-                    'users': users
-                }
+                # Fetch details for all members in batched searches
+                try:
+                    users = self._get_members_details(conn, members)
+                    result = {
+                        'group_name': group_name,
+                        'group_dn': group_dn,
+                        'users': users
+                    }
+                except Exception as e:
+                    # Liste partielle: ne pas l'afficher comme complète
+                    print(f"Error reading members of {group_dn}: {str(e)}")
+                    result = None
+                    flash(f'Error reading group members: {str(e)}', 'danger')
             else:
                 result = {
                     'group_name': group_name,
@@ -65,8 +116,11 @@ class LDAPGroupMixin(LDAPBase):
         
     def get_group_users_by_dn(self, group_dn, group_name=None):
         try:
-            conn = Connection(self.ldap_server, user=self.bind_dn, password=self.password, auto_bind=True)
-            
+            conn = self._get_connection()
+        except Exception as e:
+            print(f"Error in get_group_users_by_dn: {str(e)}")
+            return None
+        try:
             # Vérifier si le groupe existe
             conn.search(group_dn, '(objectClass=groupOfNames)', search_scope='BASE', attributes=['cn'])
             
@@ -85,43 +139,28 @@ class LDAPGroupMixin(LDAPBase):
             if conn.entries and hasattr(conn.entries[0], 'member') and conn.entries[0].member:
                 members = conn.entries[0].member.values
                 
-                # Récupérer les détails de chaque membre
-                for member_dn in members:
-                    try:
-                        conn.search(member_dn, '(objectClass=*)', attributes=['cn', 'fullName', 'title', 'ou'])
-                        if conn.entries:
-                            user = conn.entries[0]
-                            users.append({
-                                'CN': user.cn.value if hasattr(user, 'cn') else 'Unknown',
-                                'fullName': user.fullName.value if hasattr(user, 'fullName') else 'Unknown',
-                                'title': user.title.value if hasattr(user, 'title') else 'N/A',
-                                'service': user.ou.value if hasattr(user, 'ou') else 'N/A'
-                            })
-                    except Exception as e:
-                        print(f"Error fetching user details for {member_dn}: {str(e)}")
+                # Récupérer les détails des membres par lots
+                users = self._get_members_details(conn, members)
             
             # Créer le résultat
-            result = {
+            return {
                 'group_name': group_name,
                 'group_dn': group_dn,
                 'users': users
             }
             
-            conn.unbind()
-            return result
-            
         except Exception as e:
             import traceback
             print(f"Error in get_group_users_by_dn: {str(e)}")
             print(traceback.format_exc())
-            if 'conn' in locals() and conn:
-                conn.unbind()
             return None
+        finally:
+            conn.unbind()
         
     def add_user_to_group(self, user_dn, group_dn):
         try:
             # Établir une connexion au serveur LDAP
-            conn = Connection(self.ldap_server, user=self.bind_dn, password=self.password, auto_bind=True)
+            conn = self._get_connection()
             
             # 1. Ajouter le DN du groupe à l'attribut groupMembership de l'utilisateur
             user_modify = conn.modify(
@@ -163,7 +202,7 @@ class LDAPGroupMixin(LDAPBase):
     def remove_user_from_group(self, user_dn, group_dn):
         try:
             # Établir une connexion au serveur LDAP
-            conn = Connection(self.ldap_server, user=self.bind_dn, password=self.password, auto_bind=True)
+            conn = self._get_connection()
             
             # 1. Supprimer le DN du groupe de l'attribut groupMembership de l'utilisateur
             conn.modify(
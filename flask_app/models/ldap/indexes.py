@@ -0,0 +1,406 @@
+# flask_app/models/ldap/indexes.py
+import bisect
+import threading
+import time
+from datetime import datetime, timezone
+
+
+def normalize_text(value):
+    """
+    Forme de comparaison insensible à la casse et aux espaces multiples,
+    proche de la règle caseIgnore utilisée par l'annuaire.
+    """
+    return ' '.join(str(value).split()).casefold() if value else ''
+
+
+def generalized_time(value):
+    """
+    Convertit une valeur modifyTimestamp (datetime ou chaîne) en GeneralizedTime 'YYYYmmddHHMMSSZ'.
+    """
+    if not value:
+        return None
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+        if not value:
+            return None
+    if isinstance(value, datetime):
+        if value.tzinfo:
+            value = value.astimezone(timezone.utc)
+        return value.strftime('%Y%m%d%H%M%SZ')
+    return str(value)[:14] + 'Z'
+
+
+class SyncedDirectoryIndex:
+    """
+    Index en mémoire d'une partie de l'annuaire, par source LDAP.
+
+    Le contenu est chargé par un parcours paginé complet, puis tenu à jour par
+    des recherches incrémentales sur modifyTimestamp toutes les `sync_interval`
+    secondes. Les suppressions et déplacements n'étant pas visibles par ces
+    recherches, l'index est entièrement reconstruit toutes les
+    `full_rebuild_interval` secondes.
+
+    Les sous-classes définissent `attributes`, `config_flag` et les méthodes
+    _reset / _index_entry / _unindex_entry.
+    """
+    attributes = []
+    search_filter = '(objectClass=Person)'
+    config_flag = None
+    registry = None
+
+    def __init__(self, source, sync_interval=60, full_rebuild_interval=21600):
+        self.source = source
+        self.sync_interval = sync_interval
+        self.full_rebuild_interval = full_rebuild_interval
+        self.ready = False
+        self.last_full_load = 0
+        self.last_sync = 0
+        self._watermark = None
+        self._lock = threading.RLock()
+        self._thread = None
+        self._reset()
+
+    # --- Registre par source ---
+
+    @classmethod
+    def get(cls, source):
+        """
+        Index prêt pour la source, ou None (l'appelant interroge alors LDAP).
+        """
+        if not source or cls.registry is None:
+            return None
+        index = cls.registry.get(source)
+        return index if index is not None and index.ready else None
+
+    @classmethod
+    def start(cls, source, **options):
+        """
+        Créer l'index d'une source et lancer son chargement et sa synchronisation en arrière-plan.
+        """
+        if cls.registry is None:
+            cls.registry = {}
+        index = cls.registry.get(source)
+        if index is None:
+            index = cls(source, **options)
+            cls.registry[source] = index
+        index._start_thread()
+        return index
+
+    # --- Chargement et synchronisation ---
+
+    def _get_model(self):
+        # Import local pour éviter l'import circulaire avec ldap_model
+        from flask_app.models.ldap_model import get_ldap_model
+        return get_ldap_model(self.source)
+
+    def _search_base(self, ldap_model):
+        return ldap_model.all_users_dn
+
+    def _fetch(self, extra_filter=None):
+        ldap_model = self._get_model()
+        search_filter = self.search_filter
+        if extra_filter:
+            search_filter = f'(&{search_filter}{extra_filter})'
+        conn = ldap_model._get_connection()
+        try:
+            for entry in ldap_model._paged_search(conn, self._search_base(ldap_model), search_filter,
+                                                  self.attributes + ['modifyTimestamp']):
+                yield ldap_model, entry
+        finally:
+            conn.unbind()
+
+    def _advance_watermark(self, entry):
+        timestamp = generalized_time(entry['attributes'].get('modifyTimestamp'))
+        if timestamp and (self._watermark is None or timestamp > self._watermark):
+            self._watermark = timestamp
+
+    def load(self):
+        """
+        Chargement complet: le nouvel état est construit à part puis remplace l'ancien.
+        """
+        started = time.time()
+        staging = self.__class__.__new__(self.__class__)
+        staging._reset()
+        watermark = None
+        count = 0
+        for ldap_model, entry in self._fetch():
+            key = ldap_model._normalize_dn(entry['dn'])
+            staging._index_entry(key, entry)
+            timestamp = generalized_time(entry['attributes'].get('modifyTimestamp'))
+            if timestamp and (watermark is None or timestamp > watermark):
+                watermark = timestamp
+            count += 1
+        with self._lock:
+            self._swap(staging)
+            self._watermark = watermark
+            self.ready = True
+            self.last_full_load = self.last_sync = time.time()
+        print(f"{self.__class__.__name__} ({self.source}): {count} entrées chargées en {time.time() - started:.1f}s")
+
+    def sync(self):
+        """
+        Appliquer les entrées modifiées depuis le dernier modifyTimestamp connu.
+        """
+        if not self._watermark:
+            return self.load()
+        count = 0
+        for ldap_model, entry in self._fetch(f'(modifyTimestamp>={self._watermark})'):
+            key = ldap_model._normalize_dn(entry['dn'])
+            with self._lock:
+                self._unindex_entry(key)
+                self._index_entry(key, entry)
+                self._advance_watermark(entry)
+            count += 1
+        self.last_sync = time.time()
+        return count
+
+    def _start_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name=f'{self.__class__.__name__}-{self.source}',
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                if not self.ready or time.time() - self.last_full_load >= self.full_rebuild_interval:
+                    self.load()
+                else:
+                    self.sync()
+            except Exception as e:
+                print(f"Erreur de synchronisation de {self.__class__.__name__} ({self.source}): {str(e)}")
+            time.sleep(self.sync_interval)
+
+    # --- À définir par les sous-classes ---
+
+    def _reset(self):
+        raise NotImplementedError
+
+    def _swap(self, staging):
+        raise NotImplementedError
+
+    def _index_entry(self, key, entry):
+        raise NotImplementedError
+
+    def _unindex_entry(self, key):
+        raise NotImplementedError
+
+
+class FullNameIndex(SyncedDirectoryIndex):
+    """
+    Index fullName/cn des utilisateurs de all_users_dn pour l'autocomplétion.
+
+    - un tableau trié des noms normalisés sert les recherches par préfixe;
+    - des listes de trigrammes servent les recherches par sous-chaîne,
+      équivalentes au filtre (fullName=*terme*).
+    """
+    attributes = ['cn', 'fullName']
+    config_flag = 'fullname_index_enabled'
+    registry = {}
+
+    def _reset(self):
+        self._entries = {}
+        self._sorted = []
+        self._postings = {}
+        # Chargement complet: les noms sont ajoutés en vrac puis triés une seule fois dans _swap
+        self._bulk_loading = True
+
+    def _swap(self, staging):
+        staging._sorted.sort()
+        self._entries = staging._entries
+        self._sorted = staging._sorted
+        self._postings = staging._postings
+        self._bulk_loading = False
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def _index_entry(self, key, entry):
+        full_name = entry['attributes'].get('fullName')
+        if isinstance(full_name, (list, tuple)):
+            full_name = full_name[0] if full_name else None
+        if not full_name:
+            return
+        cn = entry['attributes'].get('cn')
+        if isinstance(cn, (list, tuple)):
+            cn = cn[0] if cn else None
+        name = normalize_text(full_name)
+        self._entries[key] = (name, full_name, cn, entry['dn'])
+        if self._bulk_loading:
+            self._sorted.append((name, key))
+        else:
+            bisect.insort(self._sorted, (name, key))
+        for trigram in self._trigrams(name):
+            self._postings.setdefault(trigram, set()).add(key)
+
+    def _unindex_entry(self, key):
+        previous = self._entries.pop(key, None)
+        if not previous:
+            return
+        name = previous[0]
+        position = bisect.bisect_left(self._sorted, (name, key))
+        if position < len(self._sorted) and self._sorted[position] == (name, key):
+            del self._sorted[position]
+        for trigram in self._trigrams(name):
+            keys = self._postings.get(trigram)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[trigram]
+
+    def prefix(self, term, limit=20):
+        """
+        Entrées dont le fullName commence par le terme, dans l'ordre alphabétique.
+        """
+        term = normalize_text(term)
+        with self._lock:
+            position = bisect.bisect_left(self._sorted, (term, ''))
+            keys = []
+            while position < len(self._sorted) and len(keys) < limit:
+                name, key = self._sorted[position]
+                if not name.startswith(term):
+                    break
+                keys.append(key)
+                position += 1
+            return [self._entries[key] for key in keys]
+
+    def search(self, term, limit=20):
+        """
+        Entrées dont le fullName contient le terme (3 caractères minimum).
+        Les correspondances par préfixe sont placées en tête.
+
+        Returns:
+            list: [{'label': fullName, 'value': fullName}] comme LDAPAutocompleteMixin.autocomplete
+        """
+        term = normalize_text(term)
+        if len(term) < 3:
+            return []
+        with self._lock:
+            results = self.prefix(term, limit)
+            seen = {entry[3] for entry in results}
+            if len(results) < limit:
+                postings = sorted((self._postings.get(trigram, set()) for trigram in self._trigrams(term)), key=len)
+                candidates = set.intersection(*postings) if postings and postings[0] else set()
+                matches = sorted(
+                    self._entries[key] for key in candidates
+                    if term in self._entries[key][0] and self._entries[key][3] not in seen
+                )
+                results.extend(matches[:limit - len(results)])
+        return [{'label': full_name, 'value': full_name} for _, full_name, _, _ in results]
+
+
+def normalize_favvnatnr(value):
+    """
+    Numéro de registre national sans espaces ni tirets, comme à l'enregistrement.
+    """
+    return str(value).replace(' ', '').replace('-', '') if value else ''
+
+
+class DuplicateIndex(SyncedDirectoryIndex):
+    """
+    Index des couples (prénom, nom) et des FavvNatNr des utilisateurs de all_users_dn,
+    pour les contrôles de doublons à la création (formulaire, AJAX et import en masse).
+
+    Les clés sont normalisées comme la règle caseIgnore de l'annuaire. Une entrée
+    supprimée reste dans l'index jusqu'à la reconstruction suivante: l'appelant
+    vérifie donc les correspondances dans LDAP (voir LDAPUserUtils).
+    """
+    attributes = ['givenName', 'sn', 'FavvNatNr', 'fullName']
+    config_flag = 'duplicate_index_enabled'
+    registry = {}
+
+    def _reset(self):
+        self._entries = {}
+        self._names = {}
+        self._natnrs = {}
+
+    def _swap(self, staging):
+        self._entries = staging._entries
+        self._names = staging._names
+        self._natnrs = staging._natnrs
+
+    @staticmethod
+    def _values(entry, name):
+        value = entry['attributes'].get(name)
+        if value is None:
+            return []
+        return list(value) if isinstance(value, (list, tuple)) else [value]
+
+    @staticmethod
+    def name_key(given_name, sn):
+        return normalize_text(given_name), normalize_text(sn)
+
+    def _index_entry(self, key, entry):
+        names = {self.name_key(given_name, sn)
+                 for given_name in self._values(entry, 'givenName')
+                 for sn in self._values(entry, 'sn')
+                 if given_name and sn}
+        natnrs = {normalize_favvnatnr(value) for value in self._values(entry, 'FavvNatNr') if value}
+        if not names and not natnrs:
+            return
+        full_name = next(iter(self._values(entry, 'fullName')), None)
+        self._entries[key] = (names, natnrs, entry['dn'], full_name)
+        for name in names:
+            self._names.setdefault(name, set()).add(key)
+        for natnr in natnrs:
+            self._natnrs.setdefault(natnr, set()).add(key)
+
+    def _unindex_entry(self, key):
+        previous = self._entries.pop(key, None)
+        if not previous:
+            return
+        names, natnrs = previous[0], previous[1]
+        for lookup, values in ((self._names, names), (self._natnrs, natnrs)):
+            for value in values:
+                keys = lookup.get(value)
+                if keys:
+                    keys.discard(key)
+                    if not keys:
+                        del lookup[value]
+
+    def add_entry(self, dn, attributes):
+        """
+        Indexer tout de suite un utilisateur créé par l'application, sans attendre la synchronisation.
+        """
+        key = self._get_model()._normalize_dn(dn)
+        entry = {'dn': dn, 'attributes': attributes}
+        with self._lock:
+            self._unindex_entry(key)
+            self._index_entry(key, entry)
+
+    def remove_entry(self, dn):
+        with self._lock:
+            self._unindex_entry(self._get_model()._normalize_dn(dn))
+
+    def find_names(self, names):
+        """
+        Args:
+            names (list): tuples (prénom, nom)
+
+        Returns:
+            dict: {(prénom, nom) normalisés: [DNs]} pour les couples présents
+        """
+        found = {}
+        with self._lock:
+            for given_name, sn in names:
+                key = self.name_key(given_name, sn)
+                keys = self._names.get(key)
+                if keys:
+                    found[key] = [self._entries[item][2] for item in sorted(keys)]
+        return found
+
+    def find_favvnatnrs(self, values):
+        """
+        Returns:
+            dict: {FavvNatNr normalisé: [(DN, fullName)]} pour les numéros présents
+        """
+        found = {}
+        with self._lock:
+            for value in values:
+                natnr = normalize_favvnatnr(value)
+                keys = self._natnrs.get(natnr)
+                if keys:
+                    found[natnr] = [(self._entries[item][2], self._entries[item][3]) for item in sorted(keys)]
+        return found
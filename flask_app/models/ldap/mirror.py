@@ -0,0 +1,357 @@
+# flask_app/models/ldap/mirror.py
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from ldap3 import NO_ATTRIBUTES
+from ldap3.core.exceptions import LDAPOperationResult
+from .indexes import SyncedDirectoryIndex, generalized_time, normalize_text
+
+
+class DirectoryMirror(SyncedDirectoryIndex):
+    """
+    Copie locale (SQLite, un fichier par source) des utilisateurs, groupes et rôles
+    d'une source, pour les vues en lecture seule.
+
+    - chargement complet par des recherches paginées, puis toutes les `sync_interval`
+      secondes une recherche des seules entrées créées ou modifiées depuis le dernier
+      createTimestamp/modifyTimestamp connu
+    - à chaque synchronisation, un parcours des seuls DNs de chaque type retire les
+      entrées supprimées, déplacées ou renommées et lit celles qui manquent
+    - reconstruction complète toutes les `full_rebuild_interval` secondes; au
+      redémarrage, une copie existante est réutilisée et seulement mise à jour
+    - les mixins interrogent le miroir quand il est prêt et couvre les conteneurs
+      demandés (voir LDAPBase._directory_mirror), LDAP sinon
+    """
+    config_flag = 'directory_mirror_enabled'
+    registry = {}
+    # Dossier des fichiers du miroir (DIRECTORY_MIRROR_DIR, défini par DirectoryIndexService)
+    db_dir = os.path.join('instance', 'mirror')
+
+    # Par type d'entrée: filtre, attributs copiés et attributs interrogeables (equals / contains)
+    KINDS = {
+        'users': {
+            'filter': '(objectClass=Person)',
+            'attributes': ['cn', 'fullName', 'givenName', 'sn', 'title', 'ou', 'mail', 'loginTime',
+                           'loginDisabled', 'passwordExpirationTime', 'FavvEmployeeType', 'FavvDienstHoofd'],
+            'indexed': ['cn', 'ou', 'FavvEmployeeType', 'FavvDienstHoofd']
+        },
+        'groups': {
+            'filter': '(objectClass=groupOfNames)',
+            'attributes': ['cn', 'description'],
+            'indexed': ['cn']
+        },
+        'roles': {
+            'filter': '(objectClass=nrfRole)',
+            'attributes': ['cn', 'description'],
+            'indexed': ['cn']
+        }
+    }
+
+    def __init__(self, source, sync_interval=60, full_rebuild_interval=21600):
+        super().__init__(source, sync_interval=sync_interval, full_rebuild_interval=full_rebuild_interval)
+        os.makedirs(self.db_dir, exist_ok=True)
+        self.db_path = os.path.join(self.db_dir, f'{source}.sqlite3')
+        self._init_db()
+
+    # --- Stockage ---
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS entries (
+                    kind TEXT NOT NULL,
+                    dn_key TEXT NOT NULL,
+                    dn TEXT NOT NULL,
+                    attributes TEXT NOT NULL,
+                    PRIMARY KEY (kind, dn_key)
+                ) WITHOUT ROWID
+            ''')
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS entry_values (
+                    kind TEXT NOT NULL,
+                    attr TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    dn_key TEXT NOT NULL,
+                    PRIMARY KEY (kind, attr, value, dn_key)
+                ) WITHOUT ROWID
+            ''')
+            db.execute('CREATE INDEX IF NOT EXISTS idx_entry_values_dn ON entry_values (kind, dn_key)')
+            db.execute('CREATE TABLE IF NOT EXISTS mirror_state (name TEXT PRIMARY KEY, value TEXT)')
+            state = dict(db.execute('SELECT name, value FROM mirror_state').fetchall())
+
+        # Copie d'une exécution précédente: utilisable tout de suite, la synchronisation la met à jour
+        if state.get('watermark') and state.get('bases'):
+            self._watermark = state['watermark']
+            self._bases = json.loads(state['bases'])
+            self.last_full_load = float(state.get('last_full_load') or 0)
+            self.ready = True
+
+    def _reset(self):
+        # Conteneurs copiés par type (DNs normalisés), connus après un chargement
+        self._bases = {}
+
+    def _swap(self, staging):
+        self._bases = staging._bases
+
+    @staticmethod
+    def _json_default(value):
+        if isinstance(value, datetime):
+            return generalized_time(value)
+        if isinstance(value, bytes):
+            return value.decode('utf-8', errors='replace')
+        return str(value)
+
+    def _store(self, db, ldap_model, kind, entry):
+        key = ldap_model._normalize_dn(entry['dn'])
+        attributes = {
+            name: value for name, value in entry['attributes'].items()
+            if name not in ('modifyTimestamp', 'createTimestamp')
+        }
+        db.execute('DELETE FROM entry_values WHERE kind = ? AND dn_key = ?', (kind, key))
+        db.execute('INSERT OR REPLACE INTO entries (kind, dn_key, dn, attributes) VALUES (?, ?, ?, ?)',
+                   (kind, key, entry['dn'], json.dumps(attributes, default=self._json_default)))
+        values = set()
+        for name in self.KINDS[kind]['indexed']:
+            for value in ldap_model._attr_values(entry, name):
+                if value not in (None, ''):
+                    values.add((kind, name.lower(), normalize_text(value), key))
+        db.executemany('INSERT OR IGNORE INTO entry_values (kind, attr, value, dn_key) VALUES (?, ?, ?, ?)',
+                       values)
+
+    def _save_state(self, db):
+        state = {
+            'watermark': self._watermark or '',
+            'bases': json.dumps(self._bases),
+            'last_full_load': str(self.last_full_load)
+        }
+        db.executemany('INSERT OR REPLACE INTO mirror_state (name, value) VALUES (?, ?)', state.items())
+
+    # --- Chargement et synchronisation ---
+
+    def _kind_bases(self, ldap_model, kind):
+        if kind == 'users':
+            bases = [ldap_model.all_users_dn]
+        elif kind == 'groups':
+            bases = ldap_model._group_search_bases()
+        else:
+            bases = ldap_model.role_base_dn if isinstance(ldap_model.role_base_dn, list) else [ldap_model.role_base_dn]
+        return [base for base in bases if base and isinstance(base, str) and '=' in base]
+
+    def _fetch_kind(self, ldap_model, kind, bases, extra_filter=None):
+        search_filter = self.KINDS[kind]['filter']
+        if extra_filter:
+            search_filter = f'(&{search_filter}{extra_filter})'
+        attributes = self.KINDS[kind]['attributes'] + ['modifyTimestamp', 'createTimestamp']
+        return ldap_model._iter_search(bases, search_filter, attributes)
+
+    def _entry_timestamp(self, entry):
+        timestamps = [generalized_time(entry['attributes'].get(name)) for name in ('modifyTimestamp', 'createTimestamp')]
+        timestamps = [timestamp for timestamp in timestamps if timestamp]
+        return max(timestamps) if timestamps else None
+
+    def load(self):
+        """
+        Copie complète. Tout est écrit dans une seule transaction: les lectures
+        continuent sur l'ancienne copie jusqu'à la fin du chargement.
+        """
+        started = time.time()
+        ldap_model = self._get_model()
+        bases = {}
+        watermark = None
+        count = 0
+        with self._connect() as db:
+            db.execute('DELETE FROM entry_values')
+            db.execute('DELETE FROM entries')
+            for kind in self.KINDS:
+                kind_bases = self._kind_bases(ldap_model, kind)
+                bases[kind] = [ldap_model._normalize_dn(base) for base in kind_bases]
+                seen = set()
+                for entry in self._fetch_kind(ldap_model, kind, kind_bases):
+                    key = ldap_model._normalize_dn(entry['dn'])
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    self._store(db, ldap_model, kind, entry)
+                    timestamp = self._entry_timestamp(entry)
+                    if timestamp and (watermark is None or timestamp > watermark):
+                        watermark = timestamp
+                    count += 1
+            with self._lock:
+                self._bases = bases
+                self._watermark = watermark
+                self.last_full_load = self.last_sync = time.time()
+                self._save_state(db)
+        self.ready = True
+        print(f"{self.__class__.__name__} ({self.source}): {count} entrées copiées en {time.time() - started:.1f}s")
+
+    def _ldap_keys(self, ldap_model, kind, bases):
+        """
+        DNs présents dans LDAP pour ce type ({DN normalisé: DN}), sans lire leurs attributs.
+        Un parcours interrompu lève une exception: il ne doit rien retirer du miroir.
+        """
+        keys = {}
+        conn = ldap_model._get_connection()
+        try:
+            for base in bases:
+                for entry in ldap_model._paged_search(conn, base, self.KINDS[kind]['filter'], [NO_ATTRIBUTES]):
+                    keys[ldap_model._normalize_dn(entry['dn'])] = entry['dn']
+                # 32 = noSuchObject: le conteneur n'existe pas, ses entrées non plus
+                if conn.result.get('result') not in (0, 32):
+                    raise LDAPOperationResult(result=conn.result.get('result'),
+                                              description=conn.result.get('description'),
+                                              dn=base, message=conn.result.get('message'))
+        finally:
+            conn.unbind()
+        return keys
+
+    def _reconcile(self, db, ldap_model, kind, bases):
+        """
+        Retirer du miroir les DNs absents de LDAP (suppressions, ancien DN d'une entrée
+        déplacée ou renommée) et y lire les DNs présents dans LDAP mais pas dans le miroir.
+        """
+        present = self._ldap_keys(ldap_model, kind, bases)
+        mirrored = {key for (key,) in db.execute('SELECT dn_key FROM entries WHERE kind = ?', (kind,))}
+        stale = [(kind, key) for key in mirrored - present.keys()]
+        db.executemany('DELETE FROM entry_values WHERE kind = ? AND dn_key = ?', stale)
+        db.executemany('DELETE FROM entries WHERE kind = ? AND dn_key = ?', stale)
+        missing = [present[key] for key in present.keys() - mirrored]
+        found = {}
+        if missing:
+            conn = ldap_model._get_connection()
+            try:
+                found = ldap_model._resolve_dns(conn, missing, self.KINDS[kind]['attributes'],
+                                                search_filter=self.KINDS[kind]['filter'])
+            finally:
+                conn.unbind()
+            for entry in found.values():
+                self._store(db, ldap_model, kind, entry)
+        return len(stale) + len(found)
+
+    def sync(self):
+        """
+        Appliquer les entrées créées ou modifiées depuis la dernière synchronisation,
+        puis les suppressions et déplacements (voir _reconcile). Tout est écrit dans une
+        seule transaction: en cas d'erreur, rien n'est appliqué et le repère est conservé.
+        """
+        if not self._watermark:
+            return self.load()
+        ldap_model = self._get_model()
+        watermark = self._watermark
+        changes = f'(|(modifyTimestamp>={watermark})(createTimestamp>={watermark}))'
+        count = 0
+        with self._connect() as db:
+            for kind in self.KINDS:
+                kind_bases = self._kind_bases(ldap_model, kind)
+                for entry in self._fetch_kind(ldap_model, kind, kind_bases, changes):
+                    self._store(db, ldap_model, kind, entry)
+                    timestamp = self._entry_timestamp(entry)
+                    if timestamp and timestamp > watermark:
+                        watermark = timestamp
+                    count += 1
+                count += self._reconcile(db, ldap_model, kind, kind_bases)
+            with self._lock:
+                self._watermark = watermark
+                self.last_sync = time.time()
+                self._save_state(db)
+        return count
+
+    # --- Requêtes ---
+
+    def covers(self, kind, bases):
+        """
+        True si tous les conteneurs demandés sont dans les conteneurs copiés pour ce type.
+        """
+        mirrored = self._bases.get(kind)
+        if not mirrored:
+            return False
+        ldap_model = self._get_model()
+        for base in bases if isinstance(bases, list) else [bases]:
+            key = ldap_model._normalize_dn(base)
+            if not any(key == root or key.endswith(',' + root) for root in mirrored):
+                return False
+        return True
+
+    def _where(self, kind, base=None, equals=None, contains=None):
+        clauses = ['e.kind = ?']
+        params = [kind]
+        if base:
+            ldap_model = self._get_model()
+            base_clauses = []
+            for base_dn in base if isinstance(base, list) else [base]:
+                key = ldap_model._normalize_dn(base_dn)
+                base_clauses.append('(e.dn_key = ? OR substr(e.dn_key, -?) = ?)')
+                params.extend([key, len(key) + 1, ',' + key])
+            clauses.append(f"({' OR '.join(base_clauses)})")
+        conditions = [(name, normalize_text(value), 'value = ?') for name, value in (equals or {}).items()]
+        for name, value in (contains or {}).items():
+            value = normalize_text(value).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            conditions.append((name, f'%{value}%', "value LIKE ? ESCAPE '\\'"))
+        for name, value, value_clause in conditions:
+            if name not in self.KINDS[kind]['indexed']:
+                raise ValueError(f"Attribut non interrogeable dans le miroir ({kind}): {name}")
+            clauses.append(f"e.dn_key IN (SELECT dn_key FROM entry_values WHERE kind = ? AND attr = ? AND {value_clause})")
+            params.extend([kind, name.lower(), value])
+        return ' AND '.join(clauses), params
+
+    def iter_entries(self, kind, base=None, equals=None, contains=None, limit=None):
+        """
+        Entrées du miroir au format des réponses brutes ldap3 ({'dn', 'attributes'}), triées par DN.
+
+        Args:
+            kind (str): 'users', 'groups' ou 'roles'
+            base (str|list, optional): conteneur(s), sous-arbre compris
+            equals (dict, optional): {attribut indexé: valeur}, comparaison caseIgnore
+            contains (dict, optional): {attribut indexé: sous-chaîne}
+            limit (int, optional): nombre maximum d'entrées
+        """
+        where, params = self._where(kind, base, equals, contains)
+        sql = f'SELECT dn, attributes FROM entries e WHERE {where} ORDER BY e.dn_key'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        db = self._connect()
+        try:
+            for dn, attributes in db.execute(sql, params):
+                yield {'dn': dn, 'attributes': json.loads(attributes)}
+        finally:
+            db.close()
+
+    def get_entries(self, kind, dns):
+        """
+        Entrées connues par leur DN, au format de LDAPBase._resolve_dns.
+
+        Returns:
+            dict: {DN normalisé: {'dn', 'attributes'}} pour les DNs présents dans le miroir
+        """
+        ldap_model = self._get_model()
+        keys = sorted({ldap_model._normalize_dn(dn) for dn in dns if dn})
+        found = {}
+        db = self._connect()
+        try:
+            for index in range(0, len(keys), 500):
+                chunk = keys[index:index + 500]
+                rows = db.execute(
+                    f"SELECT dn_key, dn, attributes FROM entries WHERE kind = ? "
+                    f"AND dn_key IN ({','.join('?' * len(chunk))})",
+                    [kind] + chunk
+                )
+                for key, dn, attributes in rows:
+                    found[key] = {'dn': dn, 'attributes': json.loads(attributes)}
+        finally:
+            db.close()
+        return found
+
+    def find_first(self, kind, bases, equals):
+        """
+        Première entrée correspondante en parcourant les conteneurs dans l'ordre donné.
+        """
+        for base in bases:
+            for entry in self.iter_entries(kind, base=base, equals=equals, limit=1):
+                return entry
+        return None
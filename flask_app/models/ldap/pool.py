@@ -0,0 +1,269 @@
+# flask_app/models/ldap/pool.py
+import threading
+import time
+from collections import deque
+from ldap3 import Connection, BASE, NO_ATTRIBUTES
+
+
+class LDAPPoolTimeout(Exception):
+    """
+    Levée quand aucune connexion n'a pu être obtenue du pool dans le délai imparti.
+    """
+    pass
+
+
+class PooledConnection:
+    """
+    Connexion ldap3 empruntée à un pool.
+
+    Se comporte comme la Connection sous-jacente (search, modify, entries, ...),
+    mais unbind() rend la connexion au pool au lieu de la fermer. Les mixins
+    peuvent donc garder leur schéma habituel « _get_connection() ... unbind() ».
+    """
+    _pool = None
+    _conn = None
+    _released = True
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def release(self, discard=False):
+        """
+        Rendre la connexion au pool (ou la détruire si discard=True).
+        """
+        if self._released:
+            return
+        self._released = True
+        self._pool.release(self._conn, discard=discard)
+
+    def unbind(self):
+        self.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
+
+    def __del__(self):
+        # Filet de sécurité pour les chemins qui oublient unbind()
+        try:
+            self.release()
+        except Exception:
+            pass
+
+
+class LDAPConnectionPool:
+    """
+    Pool thread-safe de connexions LDAP liées (bind) avec le compte de service.
+
+    - min_size connexions sont conservées même inactives
+    - au plus max_size connexions existent simultanément
+    - les connexions inactives depuis plus de idle_timeout secondes sont fermées
+    - une connexion restée inactive plus de health_check_interval secondes
+      est vérifiée (lecture BASE de bind_dn) avant d'être réutilisée
+    """
+
+    def __init__(self, ldap_server, bind_dn, password, min_size=1, max_size=10,
+                 idle_timeout=300, max_lifetime=3600, health_check_interval=60,
+                 checkout_timeout=10):
+        self.ldap_server = ldap_server
+        self.bind_dn = bind_dn
+        self.password = password
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+
+        self._lock = threading.Condition()
+        # Chaque élément: [connexion, créée_à, dernière_utilisation]
+        self._idle = deque()
+        self._created = {}
+        self._size = 0
+
+    def _create(self):
+        return Connection(
+            self.ldap_server,
+            user=self.bind_dn,
+            password=self.password,
+            auto_bind=True
+        )
+
+    def _close(self, conn):
+        self._created.pop(id(conn), None)
+        try:
+            conn.unbind()
+        except Exception:
+            pass
+
+    def _is_alive(self, conn):
+        return not conn.closed and conn.bound
+
+    def _ping(self, conn):
+        """
+        Vérifier qu'une connexion inactive répond toujours.
+        """
+        try:
+            conn.search(self.bind_dn, '(objectClass=*)', search_scope=BASE, attributes=NO_ATTRIBUTES)
+            return self._is_alive(conn)
+        except Exception:
+            return False
+
+    def _expired(self, conn, now):
+        created_at = self._created.get(id(conn), now)
+        return self.max_lifetime and now - created_at > self.max_lifetime
+
+    def _reap_idle(self, now):
+        """
+        Fermer les connexions inactives trop anciennes. Doit être appelé sous verrou.
+        """
+        reaped = []
+        kept = deque()
+        while self._idle:
+            item = self._idle.popleft()
+            conn, _, last_used = item
+            too_idle = now - last_used > self.idle_timeout
+            if (too_idle or self._expired(conn, now)) and self._size - len(reaped) > self.min_size:
+                reaped.append(conn)
+            else:
+                kept.append(item)
+        self._idle = kept
+        self._size -= len(reaped)
+        return reaped
+
+    def acquire(self):
+        """
+        Emprunter une connexion liée. Bloque au plus checkout_timeout secondes
+        si max_size connexions sont déjà en service.
+        """
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            conn = None
+            needs_ping = False
+            create = False
+            with self._lock:
+                now = time.monotonic()
+                reaped = self._reap_idle(now)
+                if self._idle:
+                    conn, _, last_used = self._idle.pop()
+                    needs_ping = now - last_used > self.health_check_interval
+                elif self._size < self.max_size:
+                    self._size += 1
+                    create = True
+                else:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise LDAPPoolTimeout(
+                            f"No LDAP connection available for {self.ldap_server} "
+                            f"after {self.checkout_timeout}s (max_size={self.max_size})"
+                        )
+                    self._lock.wait(remaining)
+            for old_conn in reaped:
+                self._close(old_conn)
+
+            if create:
+                try:
+                    conn = self._create()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+                self._created[id(conn)] = time.monotonic()
+                return PooledConnection(self, conn)
+
+            if conn is not None:
+                if self._is_alive(conn) and (not needs_ping or self._ping(conn)):
+                    return PooledConnection(self, conn)
+                # Connexion morte: la remplacer au tour suivant
+                self._close(conn)
+                with self._lock:
+                    self._size -= 1
+                    self._lock.notify()
+
+    def release(self, conn, discard=False):
+        """
+        Rendre une connexion au pool.
+        """
+        now = time.monotonic()
+        close = discard or not self._is_alive(conn) or self._expired(conn, now)
+        with self._lock:
+            if close:
+                self._size -= 1
+            else:
+                self._idle.append([conn, self._created.get(id(conn), now), now])
+            reaped = self._reap_idle(now)
+            self._lock.notify()
+        if close:
+            self._close(conn)
+        for old_conn in reaped:
+            self._close(old_conn)
+
+    def close_all(self):
+        """
+        Fermer toutes les connexions inactives (les connexions en service
+        seront fermées à leur retour si le pool est vidé entre-temps).
+        """
+        with self._lock:
+            idle = [item[0] for item in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._lock.notify_all()
+        for conn in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size
+            }
+
+
+class LDAPConnectionPoolManager:
+    """
+    Registre des pools par source LDAP, partagé par tout le processus.
+    """
+    pools = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_pool(cls, key, ldap_server, bind_dn, password, options=None):
+        pool = cls.pools.get(key)
+        if pool is not None:
+            return pool
+        options = options or {}
+        with cls._lock:
+            pool = cls.pools.get(key)
+            if pool is None:
+                pool = LDAPConnectionPool(
+                    ldap_server,
+                    bind_dn,
+                    password,
+                    min_size=options.get('pool_min_size', 1),
+                    max_size=options.get('pool_max_size', 10),
+                    idle_timeout=options.get('pool_idle_timeout', 300),
+                    max_lifetime=options.get('pool_max_lifetime', 3600),
+                    health_check_interval=options.get('pool_health_check_interval', 60),
+                    checkout_timeout=options.get('pool_checkout_timeout', 10)
+                )
+                cls.pools[key] = pool
+        return pool
+
+    @classmethod
+    def close_all(cls):
+        with cls._lock:
+            pools = list(cls.pools.values())
+            cls.pools = {}
+        for pool in pools:
+            pool.close_all()
@@ -1,41 +1,93 @@
 # flask_app/models/ldap/roles.py
 from .base import LDAPBase
 from flask import flash, render_template
-from ldap3 import Connection
 
 class LDAPRoleMixin(LDAPBase):
+    def _get_role_users_details(self, conn, user_dns, chunk_size=None):
+        """
+        Récupérer cn/fullName/ou/title des détenteurs d'un rôle, dans l'ordre de equivalentToMe
+        (lus dans le miroir local s'il est actif).
+        """
+        holders = self._mirrored_dns(conn, user_dns, ['cn', 'fullName', 'title', 'ou'], chunk_size=chunk_size)
+        users = []
+        for user_dn in user_dns:
+            user = holders.get(self._normalize_dn(user_dn))
+            if not user:
+                print(f"Utilisateur non trouvé pour DN: {user_dn}")
+                continue
+            users.append({
+                'CN': self._attr(user, 'cn', 'Unknown'),
+                'fullName': self._attr(user, 'fullName', 'Unknown'),
+                'ou': self._attr(user, 'ou', 'N/A'),
+                'title': self._attr(user, 'title', 'N/A')
+            })
+        return users
+
+    def _find_role_dn(self, role_cn):
+        """
+        Trouver le DN d'un rôle par son CN. Les bases de rôles sont interrogées en parallèle;
+        la première base (dans l'ordre) qui contient le rôle l'emporte.
+        """
+        base_dns = self.role_base_dn if isinstance(self.role_base_dn, list) else [self.role_base_dn]
+        role_dn = self._find_mirrored_dn('roles', base_dns, role_cn, 'nrfRole')
+        if role_dn:
+            return role_dn
+        print(f"Recherche du rôle '{role_cn}' dans {base_dns}")
+        entries = self._search_bases(base_dns, f'(cn={self._escape_ldap_filter(role_cn)})', ['cn'])
+        return entries[0]['dn'] if entries else None
+
+    def iter_role_users(self, role_dn, chunk_size=None):
+        """
+        Générateur des détenteurs d'un rôle (mêmes champs que get_role_users), lot par lot.
+
+        La connexion est rendue au pool quand le générateur est épuisé ou fermé.
+        """
+        conn = self._get_connection()
+        try:
+            conn.search(role_dn, '(objectClass=nrfRole)', search_scope='BASE', attributes=['equivalentToMe'])
+            user_dns = []
+            for item in conn.response or []:
+                if item.get('type') == 'searchResEntry':
+                    user_dns = self._attr_values(item, 'equivalentToMe')
+            for chunk in self._chunks(user_dns, chunk_size):
+                yield from self._get_role_users_details(conn, chunk, chunk_size)
+        finally:
+            conn.unbind()
+
+    def _parse_assigned_roles(self, nrf_assigned_roles):
+        """
+        Convertir les valeurs nrfAssignedRoles d'un utilisateur en {DN de rôle normalisé: req_desc}.
+
+        Chaque valeur a la forme '<DN du rôle>#0#<XML>' où le XML contient <req_desc>.
+        La première description trouvée pour un rôle est conservée.
+        """
+        descriptions = {}
+        for role_assignment in nrf_assigned_roles:
+            # Split the role DN and XML string
+            parts = role_assignment.split('#0#')
+            if len(parts) < 2:
+                continue
+            role_key = self._normalize_dn(parts[0].strip())
+            xml_part = parts[1].strip()
+            if role_key in descriptions:
+                continue
+            start_index = xml_part.find('<req_desc>')
+            end_index = xml_part.find('</req_desc>')
+            if start_index != -1 and end_index != -1:
+                descriptions[role_key] = xml_part[start_index + len('<req_desc>'):end_index].strip()
+        return descriptions
+
     def get_role_users(self, role_cn):
         """
         Obtient les utilisateurs associés à un rôle, avec validation des DNs.
         """
         try:
-            conn = Connection(self.ldap_server, user=self.bind_dn, password=self.password, auto_bind=True)
-            
-            # Search for the role in the entire subtree of o=FAVV and o=COPY
-            role_dn = None
+            role_dn = self._find_role_dn(role_cn)
+            if role_dn:
+                print(f"Rôle trouvé: {role_dn}")
             
-            # Vérifier que role_base_dn est une liste
-            base_dns = self.role_base_dn if isinstance(self.role_base_dn, list) else [self.role_base_dn]
+            conn = self._get_connection()
             
-            # Parcourir tous les base_dn valides
-            for base_dn in base_dns:
-                # Vérifier que le base_dn est valide
-                if not base_dn or not isinstance(base_dn, str) or '=' not in base_dn:
-                    print(f"Base DN invalide ignoré dans get_role_users: {base_dn}")
-                    continue
-                    
-                try:
-                    print(f"Recherche du rôle '{role_cn}' dans {base_dn}")
-                    conn.search(base_dn, f'(cn={role_cn})', search_scope='SUBTREE', attributes=['equivalentToMe'])
-                    
-                    if conn.entries:
-                        role_dn = conn.entries[0].entry_dn
-                        print(f"Rôle trouvé: {role_dn}")
-                        break
-                except Exception as e:
-                    print(f"Erreur lors de la recherche dans {base_dn}: {str(e)}")
-                    continue
-                    
             if role_dn:
                 print(f"Recherche des utilisateurs pour le rôle: {role_dn}")
 
@@ -43,26 +95,9 @@ class LDAPRoleMixin(LDAPBase):
                 conn.search(role_dn, '(objectClass=nrfRole)', attributes=['equivalentToMe'])
                 if conn.entries and hasattr(conn.entries[0], 'equivalentToMe') and conn.entries[0].equivalentToMe:
                     user_dns = conn.entries[0].equivalentToMe.values
-                    users = []
-
-                    # Fetch details for each user
-                    for user_dn in user_dns:
-                        try:
-                            conn.search(user_dn, '(objectClass=*)', attributes=['cn', 'fullName', 'title', 'ou'])
-                            if conn.entries:
-                                user = conn.entries[0]
-                                
-                                users.append({
-                                    'CN': user.cn.value if hasattr(user, 'cn') and user.cn else 'Unknown',
-                                    'fullName': user.fullName.value if hasattr(user, 'fullName') and user.fullName else 'Unknown',
-                                    'ou': user.ou.value if hasattr(user, 'ou') and user.ou else 'N/A',
-                                    'title': user.title.value if hasattr(user, 'title') and user.title else 'N/A'
-                                })
-                            else:
-                                print(f"Utilisateur non trouvé pour DN: {user_dn}")
-                        except Exception as e:
-                            print(f"Erreur lors de la récupération des détails de l'utilisateur {user_dn}: {str(e)}")
-                            continue
+
+                    # Fetch details for all holders in batched searches
+                    users = self._get_role_users_details(conn, user_dns)
 
                     result = {
                         'role_cn': role_cn,
@@ -95,13 +130,14 @@ class LDAPRoleMixin(LDAPBase):
         if role_cn:
             try:
                 # Connect to the LDAP server
-                conn = Connection(self.ldap_server, user=self.bind_dn, password=self.password, auto_bind=True)
+                conn = self._get_connection()
                 # Step 1: Search for the role in the RoleDefs container to get its DN
                 role_base_dn = self.role_base_dn
                 conn.search(role_base_dn, f'(cn={role_cn})', search_scope='SUBTREE', attributes=['entryDN'])
 
                 if not conn.entries:
                     print(f'Role "{role_cn}" not found.', 'danger')
+                    conn.unbind()
                     return render_template('role_groups.html', result=None, prefill_role_cn=role_cn)
 
                 role_dn = conn.entries[0].entry_dn
@@ -138,7 +174,7 @@ class LDAPRoleMixin(LDAPBase):
                 flash(f'An error occurred: {str(e)}', 'danger')
         
     def view_role(self, dn):
-        conn = Connection(self.ldap_server, user=self.bind_dn, password=self.password, auto_bind=True)
+        conn = self._get_connection()
         # Fetch the role's attributes
         conn.search(dn, '(objectClass=nrfRole)', search_scope='BASE', attributes=['cn', 'equivalentToMe'])
 
@@ -147,37 +183,21 @@ class LDAPRoleMixin(LDAPBase):
             role_cn = role.cn.value
             equivalent_users = role.equivalentToMe.values if role.equivalentToMe else []
 
-            # Fetch details for each user
+            # Fetch details for all holders in batched searches
+            holders = self._resolve_dns(conn, equivalent_users, ['cn', 'fullName', 'ou', 'nrfAssignedRoles'])
+            role_key = self._normalize_dn(dn)
             users = []
             for user_dn in equivalent_users:
-                conn.search(user_dn, '(objectClass=*)', attributes=['cn', 'fullName', 'ou', 'nrfAssignedRoles'])
-                if conn.entries:
-                    user = conn.entries[0]
-                    nrf_assigned_roles = user.nrfAssignedRoles.values if user.nrfAssignedRoles else []
-
-                    # Extract <req_desc> for the current role
-                    req_desc = "No description available"
-                    for role_assignment in nrf_assigned_roles:
-                        # Split the role DN and XML string
-                        parts = role_assignment.split('#0#')
-                        if len(parts) >= 2:
-                            role_dn_part = parts[0].strip()  # Role DN
-                            xml_part = parts[1].strip()  # XML part
-
-                            # Check if the role DN matches the current role
-                            if role_dn_part == dn:
-                                # Parse the XML part to extract <req_desc>
-                                start_index = xml_part.find('<req_desc>') + len('<req_desc>')
-                                end_index = xml_part.find('</req_desc>')
-                                if start_index != -1 and end_index != -1:
-                                    req_desc = xml_part[start_index:end_index].strip()
-                                    break
+                user = holders.get(self._normalize_dn(user_dn))
+                if user:
+                    # nrfAssignedRoles is parsed once per user into role DN -> <req_desc>
+                    assigned_roles = self._parse_assigned_roles(self._attr_values(user, 'nrfAssignedRoles'))
 
                     users.append({
-                    'CN': user.cn.value,
-                    'fullName': user.fullName.value,
-                    'ou': user.ou.value if user.ou else 'N/A',
-                    'req_desc': req_desc  # Add the extracted <req_desc>
+                    'CN': self._attr(user, 'cn'),
+                    'fullName': self._attr(user, 'fullName'),
+                    'ou': self._attr(user, 'ou', 'N/A'),
+                    'req_desc': assigned_roles.get(role_key, "No description available")
                     })
             # Extract the parent container DN
             parent_dn = ','.join(dn.split(',')[1:])  # Remove the first RDN to get the parent DN
@@ -196,7 +216,7 @@ class LDAPRoleMixin(LDAPBase):
             return None
         
     def get_ldap_children(self, current_dn):
-        conn = Connection(self.ldap_server, user=self.bind_dn, password=self.password, auto_bind=True) 
+        conn = self._get_connection()
         # Search for entries under the current DN
         conn.search(current_dn, '(objectClass=*)', search_scope='LEVEL', attributes=['cn', 'objectClass'])
 
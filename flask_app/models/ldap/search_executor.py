@@ -0,0 +1,30 @@
+# flask_app/models/ldap/search_executor.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LDAPSearchExecutor:
+    """
+    Pool de threads partagé par le processus pour lancer des recherches LDAP en parallèle.
+
+    Chaque tâche emprunte sa propre connexion au pool de la source (voir pool.py):
+    le nombre de recherches simultanées est donc aussi borné par pool_max_size.
+    """
+    _executor = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, max_workers=8):
+        if cls._executor is None:
+            with cls._lock:
+                if cls._executor is None:
+                    cls._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                                       thread_name_prefix='ldap-search')
+        return cls._executor
+
+    @classmethod
+    def shutdown(cls):
+        with cls._lock:
+            executor, cls._executor = cls._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
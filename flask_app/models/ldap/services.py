@@ -1,12 +1,18 @@
 # flask_app/models/ldap/services.py
 from .base import LDAPBase
-from ldap3 import Connection, SUBTREE
 
 class LDAPServiceMixin(LDAPBase):
     def get_service_users(self, service_name):
+        """
+        Utilisateurs actifs d'un service.
+
+        Returns:
+            dict ou None: {'service_name', 'users', 'incomplete_bases'}; incomplete_bases liste
+                          les bases qui n'ont pas répondu (la liste des utilisateurs est alors partielle)
+        """
         try:
             users = []
-            conn = Connection(self.ldap_server, user=self.bind_dn, password=self.password, auto_bind=True)
+            incomplete = set()
             
             # S'assurer que actif_users_dn est une liste
             base_dns = self.actif_users_dn if isinstance(self.actif_users_dn, list) else [self.actif_users_dn]
@@ -14,77 +20,95 @@ class LDAPServiceMixin(LDAPBase):
             # Échapper le service_name pour éviter les injections LDAP
             service_name_escaped = self._escape_ldap_filter(service_name) if hasattr(self, '_escape_ldap_filter') else service_name
             
-            # Parcourir tous les base_dn valides
-            for base_dn in base_dns:
-                # Vérifier que le base_dn est valide
-                if not base_dn or not isinstance(base_dn, str) or '=' not in base_dn:
-                    print(f"Base DN invalide ignoré dans get_service_users: {base_dn}")
-                    continue
-                    
-                try:
-                    print(f"Recherche des utilisateurs du service '{service_name}' dans {base_dn}")
-                    conn.search(base_dn, 
-                            f'(ou={service_name_escaped})', 
-                            search_scope='SUBTREE',
-                            attributes=['cn', 'fullName', 'title', 'mail'])
-                    
-                    # Traiter les résultats
-                    for entry in conn.entries:
-                        users.append({
-                            'CN': entry.cn.value if hasattr(entry, 'cn') and entry.cn else 'Unknown',
-                            'fullName': entry.fullName.value if hasattr(entry, 'fullName') and entry.fullName else 'Unknown',
-                            'title': entry.title.value if hasattr(entry, 'title') and entry.title else 'N/A',
-                            'mail': entry.mail.value if hasattr(entry, 'mail') and entry.mail else 'N/A'
-                        })
-                except Exception as e:
-                    print(f"Erreur lors de la recherche dans {base_dn}: {str(e)}")
-                    # Continuer avec le prochain base_dn en cas d'erreur
-                    continue
+            # Rechercher dans toutes les bases valides en parallèle
+            mirror = self._directory_mirror('users', base_dns)
+            if mirror is not None:
+                entries = list(mirror.iter_entries('users', base=base_dns, equals={'ou': service_name}))
+            else:
+                print(f"Recherche des utilisateurs du service '{service_name}' dans {base_dns}")
+                entries = self._search_bases(base_dns, f'(ou={service_name_escaped})', ['cn', 'fullName', 'title', 'mail'],
+                                             incomplete=incomplete)
+            for entry in entries:
+                users.append({
+                    'CN': self._attr(entry, 'cn', 'Unknown'),
+                    'fullName': self._attr(entry, 'fullName', 'Unknown'),
+                    'title': self._attr(entry, 'title', 'N/A'),
+                    'mail': self._attr(entry, 'mail', 'N/A')
+                })
 
-            if users:
+            if users or incomplete:
                 result = {
                     'service_name': service_name,
-                    'users': users
+                    'users': users,
+                    'incomplete_bases': sorted(incomplete)
                 }
             else:
                 result = None
                 print(f"Aucun utilisateur trouvé pour le service: {service_name}")
 
-            # Fermer la connexion
-            conn.unbind()
             return result
                 
         except Exception as e:
             import traceback
             print(f"Erreur dans get_service_users: {str(e)}")
             print(traceback.format_exc())
-            if 'conn' in locals() and conn:
-                conn.unbind()
             return None
         
+    def iter_service_users(self, service_name):
+        """
+        Générateur des utilisateurs d'un service (mêmes champs que get_service_users).
+
+        Les bases sont parcourues l'une après l'autre avec une recherche paginée:
+        chaque page est rendue dès sa réception. Un DN présent dans plusieurs bases
+        n'est rendu qu'une fois.
+        """
+        base_dns = self.actif_users_dn if isinstance(self.actif_users_dn, list) else [self.actif_users_dn]
+        search_filter = f'(ou={self._escape_ldap_filter(service_name)})'
+        valid_bases = []
+        for base_dn in base_dns:
+            if not base_dn or not isinstance(base_dn, str) or '=' not in base_dn:
+                print(f"Base DN invalide ignoré: {base_dn}")
+                continue
+            valid_bases.append(base_dn)
+        mirror = self._directory_mirror('users', valid_bases)
+        if mirror is not None:
+            entries = mirror.iter_entries('users', base=valid_bases, equals={'ou': service_name})
+        else:
+            entries = self._iter_search(valid_bases, search_filter, ['cn', 'fullName', 'title', 'mail'])
+        seen = set()
+        for entry in entries:
+            key = self._normalize_dn(entry['dn'])
+            if key in seen:
+                continue
+            seen.add(key)
+            yield {
+                'CN': self._attr(entry, 'cn', 'Unknown'),
+                'fullName': self._attr(entry, 'fullName', 'Unknown'),
+                'title': self._attr(entry, 'title', 'N/A'),
+                'mail': self._attr(entry, 'mail', 'N/A')
+            }
+
     def get_managers(self):
         try:
-            conn = Connection(self.ldap_server, user=self.bind_dn, password=self.password, auto_bind=True)
-        
             # Rechercher les utilisateurs avec FavvDienstHoofd=YES
             search_base = self.actif_users_dn
             search_filter = '(FavvDienstHoofd=YES)'
         
-            conn.search(search_base=search_base,
-                        search_filter=search_filter,
-                        search_scope=SUBTREE,
-                        attributes=['cn', 'fullName', 'title', 'mail'])
-        
+            mirror = self._directory_mirror('users', search_base)
+            if mirror is not None:
+                entries = mirror.iter_entries('users', base=search_base, equals={'FavvDienstHoofd': 'YES'})
+            else:
+                entries = self._iter_search(search_base, search_filter, ['cn', 'fullName', 'title', 'mail'])
+
             managers = []
-            for entry in conn.entries:
+            for entry in entries:
                 managers.append({
-                    'dn': entry.entry_dn,
-                    'fullName': entry.fullName.value if entry.fullName else '',
-                    'title': entry.title.value if entry.title else '',
-                    'mail': entry.mail.value if entry.mail else ''
+                    'dn': entry['dn'],
+                    'fullName': self._attr(entry, 'fullName', ''),
+                    'title': self._attr(entry, 'title', ''),
+                    'mail': self._attr(entry, 'mail', '')
                 })
         
-            conn.unbind()
             return managers
         
         except Exception as e:
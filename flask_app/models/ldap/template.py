@@ -1,11 +1,68 @@
 # flask_app/models/ldap/template.py
 from .base import LDAPBase
-from ldap3 import Connection, SUBTREE
+from ldap3 import SUBTREE
 
 class LDAPTemplate(LDAPBase):
+    # Attributs d'un template lus par get_template_details et par le catalogue
+    TEMPLATE_ATTRIBUTES = ['cn', 'description', 'title', 'objectClass', 'ou',
+                           'FavvExtDienstMgrDn', 'FavvEmployeeType', 'FavvEmployeeSubType',
+                           'groupMembership']
+
+    def _template_from_entry(self, entry):
+        """
+        Détails d'un template à partir d'une entrée brute, au format de get_template_details.
+        """
+        # CN lu dans le RDN si l'attribut n'est pas renvoyé
+        details = {'cn': self._entry_value(entry, 'cn') or self._split_dn(entry['dn'])[1]}
+        for name in ('description', 'title', 'ou', 'FavvExtDienstMgrDn', 'FavvEmployeeType', 'FavvEmployeeSubType'):
+            details[name] = self._entry_value(entry, name) or None
+        details['objectClass'] = self._attr_values(entry, 'objectClass')
+        details['groupMembership'] = self._attr_values(entry, 'groupMembership')
+        return details
+
+    def get_template_catalog(self, search_base=None):
+        """
+        Tous les templates de la source en une recherche paginée (voir services/template_catalog.py).
+
+        Returns:
+            dict: {'templates': {cn en minuscules: détails}, 'user_types': [...], 'signature': ...}
+        """
+        templates = {}
+        unique_types = {}
+        timestamps = []
+        for entry in self._iter_search(search_base or self.template_dn, '(objectClass=template)',
+                                       self.TEMPLATE_ATTRIBUTES + ['modifyTimestamp']):
+            details = self._template_from_entry(entry)
+            if not details['cn']:
+                continue
+            templates.setdefault(str(details['cn']).lower(), details)
+            timestamps.append(str(self._attr(entry, 'modifyTimestamp', '')))
+            if details['description']:
+                unique_types[details['cn']] = {
+                    'description': details['description'],
+                    'title': details['title']
+                }
+        user_types = [{'value': cn, 'label': data['description'], 'title': data['title']}
+                      for cn, data in unique_types.items()]
+        return {
+            'templates': templates,
+            'user_types': user_types,
+            'signature': (len(timestamps), max(timestamps) if timestamps else '')
+        }
+
+    def get_template_signature(self, search_base=None):
+        """
+        (nombre de templates, modifyTimestamp le plus récent): change dès qu'un template
+        est ajouté, modifié ou supprimé. Ne lit que modifyTimestamp.
+        """
+        timestamps = [str(self._attr(entry, 'modifyTimestamp', ''))
+                      for entry in self._iter_search(search_base or self.template_dn, '(objectClass=template)',
+                                                     ['modifyTimestamp'])]
+        return (len(timestamps), max(timestamps) if timestamps else '')
+
     def get_template_details(self, template_cn):
         try:
-            conn = Connection(self.ldap_server, user=self.bind_dn, password=self.password, auto_bind=True)
+            conn = self._get_connection()
         
             search_base = self.template_dn  # Base DN for templates
             search_filter = f'(cn={template_cn})'
@@ -43,29 +100,21 @@ class LDAPTemplate(LDAPBase):
             return None
         
     def get_user_types_from_ldap(self, dn):
-        conn = Connection(self.ldap_server, user=self.bind_dn, password=self.password, auto_bind=True)
-    
         search_base = dn
         attributes = ['cn', 'description', 'title']
     
-        conn.search(search_base=search_base,
-                    search_filter='(objectClass=template)',
-                    search_scope=SUBTREE,
-                    attributes=attributes)
-    
         # Use a dictionary to ensure uniqueness by cn
         unique_types = {}
-        for entry in conn.entries:
-            if hasattr(entry, 'description') and entry.description:
-                title_value = entry.title.value if hasattr(entry, 'title') and entry.title else None
-                unique_types[entry.cn.value] = {
-                    'description': entry.description.value,
-                    'title': title_value
+        for entry in self._iter_search(search_base, '(objectClass=template)', attributes):
+            description = self._attr(entry, 'description')
+            if description:
+                unique_types[self._attr(entry, 'cn')] = {
+                    'description': description,
+                    'title': self._attr(entry, 'title')
                 }
     
         # Convert to the list of dictionaries format
         user_types = [{'value': cn, 'label': data['description'], 'title': data['title']} 
                       for cn, data in unique_types.items()]
     
-        conn.unbind()
         return user_types
\ No newline at end of file
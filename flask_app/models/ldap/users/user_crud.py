@@ -2,6 +2,7 @@
 from ldap3 import MODIFY_REPLACE, MODIFY_DELETE, MODIFY_ADD
 # from flask import flash, redirect, url_for
 from ..base import LDAPBase
+from ..indexes import DuplicateIndex
 from .user_utils import LDAPUserUtils
 
 
@@ -10,6 +11,24 @@ class LDAPUserCRUD(LDAPBase):
     Classe pour gérer les opérations CRUD sur les utilisateurs LDAP.
     """
     
+    # Groupes d'attributs chargés par get_user (option 'sections')
+    USER_SECTIONS = {
+        'core': [
+            'cn', 'FavvEmployeeType', 'sn', 'givenName', 'FavvNatNr', 'fullName', 'mail', 'workforceID',
+            'ou', 'title', 'generationQualifier', 'FavvEmployeeSubType'
+        ],
+        'org': [
+            'FavvHierarMgrDN', 'FavvExtDienstMgrDn', 'FavvFuncMgrDn', 'l', 'telephoneNumber', 'mobile',
+            'roomNumber', 'FavvBuildFloor', 'FavvGbw', 'FavvGem', 'FavvAffecStat', 'FavvCorrLang',
+            'FavvDienstHoofd', 'FavvInDatum', 'generationQualifier'
+        ],
+        'memberships': ['groupMembership', 'nrfMemberOf', 'DirXML-Associations'],
+        'security': [
+            'loginDisabled', 'loginTime', 'passwordExpirationTime', 'lockedByIntruder', 'FavvAccountStatus',
+            'FavvPTBadgeNr', 'FavvPTPinCode', 'pwmLastPwdUpdate', 'pwmResponseSet'
+        ]
+    }
+    
     def _get_config_for_utils(self):
         """
         Helper method to provide config to the UserUtils class.
@@ -36,6 +55,97 @@ class LDAPUserCRUD(LDAPBase):
         }
         return config
     
+    def _build_user_filter(self, search_param, search_type, return_list=False, filter_attributes=None):
+        """
+        Filtre LDAP d'une recherche d'utilisateurs selon search_type (voir get_user).
+        """
+        if search_type == 'cn':
+            search_filter = f'(cn={search_param})'
+        elif search_type == 'fullName':
+            # Utiliser des jokers pour la recherche fullName quand return_list est True
+            if return_list:
+                search_filter = f'(fullName=*{search_param}*)'
+            else:
+                search_filter = f'(fullName={search_param})'
+        elif search_type == 'mail':
+            # Utiliser des jokers pour la recherche mail quand return_list est True
+            if return_list:
+                search_filter = f'(mail=*{search_param}*)'
+            else:
+                search_filter = f'(mail={search_param})'  
+        elif search_type == 'workforceID':
+            search_filter = f'(workforceID={search_param})'
+        elif search_type == 'FavvNatNr':
+            search_filter = f'(FavvNatNr={search_param})'
+        else:
+            # Recherche générique (traiter search_param comme le filtre)
+            search_filter = search_param if search_param.startswith('(') else f'({search_param})'
+        
+        # Ajouter des filtres supplémentaires si spécifiés
+        if filter_attributes:
+            additional_filters = []
+            for attr, value in filter_attributes.items():
+                additional_filters.append(f'({attr}={value})')
+            
+            # Combiner avec le filtre principal en utilisant &
+            combined_filters = ''.join(additional_filters)
+            search_filter = f'(&{search_filter}{combined_filters})'
+        return search_filter
+
+    def _user_search_bases(self, container, return_list=False):
+        """
+        Conteneurs à parcourir pour une recherche d'utilisateurs (voir get_user).
+        """
+        if container == 'active' or (container == 'all' and return_list):
+            return [self.actif_users_dn]
+        elif container == 'inactive':
+            return [self.out_users_dn]
+        elif container == 'toprocess':
+            return [self.toprocess_users_dn]
+        elif container == 'all':
+            return [self.actif_users_dn, self.out_users_dn, self.toprocess_users_dn]
+        return []
+
+    def search_users_page(self, search_param, options=None):
+        """
+        Une page de résultats de recherche d'utilisateurs, triés.
+
+        Args:
+            search_param (str): Terme ou filtre de recherche (comme get_user avec return_list)
+            options (dict, optional):
+                - search_type, container, filter_attributes, attributes: comme get_user
+                - sort (str): Attribut de tri ('cn' par défaut)
+                - offset (int): Position de la première entrée
+                - page_size (int): Taille de page (50 par défaut)
+
+        Returns:
+            dict: {'users': [...], 'total', 'offset', 'page_size', 'next_offset', 'prev_offset', 'mode'}
+                  chaque utilisateur a le même format que get_user(return_list=True)
+        """
+        options = options or {}
+        attributes = options.get('attributes') or ['cn', 'fullName', 'mail', 'ou', 'title']
+        if isinstance(attributes, str):
+            attributes = [attributes]
+        sort_attribute = options.get('sort', 'cn')
+        if sort_attribute not in attributes:
+            attributes = list(attributes) + [sort_attribute]
+
+        search_filter = self._build_user_filter(search_param, options.get('search_type'), True,
+                                                options.get('filter_attributes'))
+        search_bases = self._user_search_bases(options.get('container', 'active'), True)
+        page = self._sorted_search_page(search_bases, search_filter, attributes, sort_attribute,
+                                        offset=options.get('offset', 0),
+                                        page_size=options.get('page_size', 50))
+
+        users = []
+        for entry in page.pop('entries'):
+            user_data = {'dn': entry['dn']}
+            for attr in attributes:
+                user_data[attr] = self._entry_value(entry, attr)
+            users.append(user_data)
+        page['users'] = users
+        return page
+
     def get_user(self, search_param, options=None):
         """
         Args:
@@ -47,6 +157,10 @@ class LDAPUserCRUD(LDAPBase):
                 - return_list (bool): Retourner une liste d'utilisateurs au lieu d'un seul
                 - filter_attributes (dict): Attributs pour filtrer les résultats
                 - attributes (list): Liste des attributs à retourner
+                - sections (list): Groupes d'attributs à charger pour un utilisateur
+                  ('core', 'org', 'memberships', 'security', voir USER_SECTIONS).
+                  Par défaut toutes les sections; les managers ne sont résolus qu'avec
+                  'org', les groupes et rôles qu'avec 'memberships'.
 
         Returns:
             dict/list: Données utilisateur ou liste d'utilisateurs selon options
@@ -61,6 +175,7 @@ class LDAPUserCRUD(LDAPBase):
         return_list = options.get('return_list', False)
         filter_attributes = options.get('filter_attributes', {})
         custom_attributes = options.get('attributes')
+        sections = set(options.get('sections') or self.USER_SECTIONS)
 
         try:
             conn = self._get_connection()
@@ -73,15 +188,11 @@ class LDAPUserCRUD(LDAPBase):
                 # Attributs de base pour les résultats en style liste
                 attributes = ['cn', 'fullName', 'mail', 'ou', 'title']
             else:
-                # Attributs complets pour les informations détaillées sur l'utilisateur
-                attributes = [
-                    'cn', 'FavvEmployeeType', 'sn', 'givenName', 'FavvNatNr', 
-                    'fullName', 'mail', 'workforceID', 'groupMembership', 
-                    'DirXML-Associations', 'ou', 'title', 'FavvHierarMgrDN', 'FavvExtDienstMgrDn', 
-                    'nrfMemberOf', 'loginDisabled', 'loginTime', 'passwordExpirationTime',
-                    'generationQualifier', 'FavvPTBadgeNr', 'FavvPTPinCode', 'lockedByIntruder','l', 'telephoneNumber',
-                    'FavvAccountStatus', 'FavvAffecStat', 'FavvCorrLang', 'FavvDienstHoofd', 'FavvEmployeeSubType', 'FavvFuncMgrDn', 'FavvInDatum', 'pwmLastPwdUpdate', 'pwmResponseSet', 'roomNumber', 'FavvGem', 'FavvGbw', 'FavvBuildFloor', 'mobile'
-                ]
+                # Attributs des sections demandées pour les informations détaillées sur l'utilisateur
+                attributes = []
+                for section in ('core', 'org', 'memberships', 'security'):
+                    if section in sections:
+                        attributes.extend(attr for attr in self.USER_SECTIONS[section] if attr not in attributes)
             
             # Déterminer les paramètres de recherche en fonction du mode
             if search_type is None and not return_list and container != 'toprocess':
@@ -92,71 +203,27 @@ class LDAPUserCRUD(LDAPBase):
                 search_base = user_dn
             else:
                 # Construire le filtre de recherche selon search_type
-                if search_type == 'cn':
-                    search_filter = f'(cn={search_param})'
-                elif search_type == 'fullName':
-                    # Utiliser des jokers pour la recherche fullName quand return_list est True
-                    if return_list:
-                        search_filter = f'(fullName=*{search_param}*)'
-                    else:
-                        search_filter = f'(fullName={search_param})'
-                elif search_type == 'mail':
-                    # Utiliser des jokers pour la recherche mail quand return_list est True
-                    if return_list:
-                        search_filter = f'(mail=*{search_param}*)'
-                    else:
-                        search_filter = f'(mail={search_param})'  
-                elif search_type == 'workforceID':
-                    search_filter = f'(workforceID={search_param})'
-                elif search_type == 'FavvNatNr':
-                    search_filter = f'(FavvNatNr={search_param})'
-                else:
-                    # Recherche générique (traiter search_param comme le filtre)
-                    search_filter = search_param if search_param.startswith('(') else f'({search_param})'
-                
-                # Ajouter des filtres supplémentaires si spécifiés
-                if filter_attributes:
-                    additional_filters = []
-                    for attr, value in filter_attributes.items():
-                        additional_filters.append(f'({attr}={value})')
-                    
-                    # Combiner avec le filtre principal en utilisant &
-                    combined_filters = ''.join(additional_filters)
-                    search_filter = f'(&{search_filter}{combined_filters})'
-                
+                search_filter = self._build_user_filter(search_param, search_type, return_list, filter_attributes)
                 search_scope = 'SUBTREE'
                 
                 # Déterminer quels conteneurs rechercher
-                search_bases = []
-                if container == 'active' or (container == 'all' and return_list):
-                    search_bases.append(self.actif_users_dn)
-                elif container == 'inactive':
-                    search_bases.append(self.out_users_dn)
-                elif container == 'toprocess':
-                    search_bases.append(self.toprocess_users_dn)
-                elif container == 'all':
-                    search_bases = [self.actif_users_dn, self.out_users_dn, self.toprocess_users_dn]
+                search_bases = self._user_search_bases(container, return_list)
             
             # Gérer les recherches de style liste
             if return_list:
+                if isinstance(attributes, str):
+                    attributes = [attributes]
                 users = []
                 for search_base in search_bases:
-                    conn.search(search_base, 
-                            search_filter, 
-                            search_scope=search_scope,
-                            attributes=attributes)
-                    
-                    # Ajouter les résultats à la liste
-                    for entry in conn.entries:
+                    # Recherche paginée: pas de limite de taille serveur, une page en mémoire à la fois
+                    for entry in self._paged_search(conn, search_base, search_filter, attributes,
+                                                    search_scope=search_scope):
                         user_data = {
-                            'dn': entry.entry_dn
+                            'dn': entry['dn']
                         }
                         # Ajouter tous les attributs disponibles
                         for attr in attributes:
-                            if hasattr(entry, attr):
-                                user_data[attr] = getattr(entry, attr).value
-                            else:
-                                user_data[attr] = ''
+                            user_data[attr] = self._entry_value(entry, attr)
                         
                         users.append(user_data)
                 
@@ -284,82 +351,99 @@ class LDAPUserCRUD(LDAPBase):
                         'FavvAffecStat'
                     )
                 
+                result['sections'] = sorted(sections)
+                
+                # Sans la section 'security', ne pas présenter un état de compte non lu comme 'NO'
+                if 'security' not in sections:
+                    result['loginDisabled'] = ''
+                    result['lockedByIntruder'] = ''
+                
                 # Initialiser les champs de manager à des valeurs par défaut
-                result['ChefHierarchique'] = 'No manager specified'
-                result['manager_name'] = 'No manager specified'
-                result['ChefFonctionnel'] = 'No functional manager specified'
-                result['ServiceManager'] = 'No external service manager specified'
+                if 'org' in sections:
+                    result['ChefHierarchique'] = 'No manager specified'
+                    result['manager_name'] = 'No manager specified'
+                    result['ChefFonctionnel'] = 'No functional manager specified'
+                    result['ServiceManager'] = 'No external service manager specified'
+                else:
+                    result['ChefHierarchique'] = ''
+                    result['manager_name'] = ''
+                    result['ChefFonctionnel'] = ''
+                    result['ServiceManager'] = ''
+
+                # Lire en une fois (cache DN -> attributs + lectures groupées) les managers,
+                # les groupes et les rôles référencés par l'utilisateur
+                group_dns = user_attributes.groupMembership.values if hasattr(user_attributes, 'groupMembership') and user_attributes.groupMembership else []
+                role_dns = user_attributes.nrfMemberOf.values if hasattr(user_attributes, 'nrfMemberOf') and user_attributes.nrfMemberOf else []
+                manager_dns = [result['FavvHierarMgrDN'], result['FavvFuncMgrDn'], result['FavvExtDienstMgrDn']]
+                try:
+                    referenced = self._lookup_dns(conn, manager_dns + list(group_dns) + list(role_dns))
+                    lookup_error = None
+                except Exception as e:
+                    referenced = {}
+                    lookup_error = str(e)
+
+                def referenced_entry(dn):
+                    return referenced.get(self._normalize_dn(dn))
 
                 # Récupérer le nom complet du manager hiérarchique
                 if result['FavvHierarMgrDN']:
-                    try:
-                        conn.search(result['FavvHierarMgrDN'], '(objectClass=*)', attributes=['fullName'])
-                        if conn.entries:
-                            manager_name = conn.entries[0].fullName.value
-                            result['ChefHierarchique'] = manager_name
-                            result['manager_name'] = manager_name  # Pour la compatibilité
-                        else:
-                            result['ChefHierarchique'] = 'Manager not found'
-                            result['manager_name'] = 'Manager not found'
-                    except Exception as e:
-                        error_msg = f'Error fetching manager: {str(e)}'
+                    manager = referenced_entry(result['FavvHierarMgrDN'])
+                    if lookup_error:
+                        error_msg = f'Error fetching manager: {lookup_error}'
                         result['ChefHierarchique'] = error_msg
                         result['manager_name'] = error_msg
+                    elif manager:
+                        manager_name = self._attr(manager, 'fullName')
+                        result['ChefHierarchique'] = manager_name
+                        result['manager_name'] = manager_name  # Pour la compatibilité
+                    else:
+                        result['ChefHierarchique'] = 'Manager not found'
+                        result['manager_name'] = 'Manager not found'
 
                 # Récupérer le nom du chef fonctionnel
                 if result['FavvFuncMgrDn']:
-                    try:
-                        conn.search(result['FavvFuncMgrDn'], '(objectClass=*)', attributes=['fullName'])
-                        if conn.entries:
-                            func_manager_name = conn.entries[0].fullName.value
-                            result['ChefFonctionnel'] = func_manager_name
-                        else:
-                            result['ChefFonctionnel'] = 'Functional manager not found'
-                    except Exception as e:
-                        error_msg = f'Error fetching functional manager: {str(e)}'
-                        result['ChefFonctionnel'] = error_msg
+                    func_manager = referenced_entry(result['FavvFuncMgrDn'])
+                    if lookup_error:
+                        result['ChefFonctionnel'] = f'Error fetching functional manager: {lookup_error}'
+                    elif func_manager:
+                        result['ChefFonctionnel'] = self._attr(func_manager, 'fullName')
+                    else:
+                        result['ChefFonctionnel'] = 'Functional manager not found'
 
                 # Récupérer le nom du manager de service
                 if result['FavvExtDienstMgrDn']:
-                    try:
-                        conn.search(result['FavvExtDienstMgrDn'], '(objectClass=*)', attributes=['fullName'])
-                        if conn.entries:
-                            service_manager_name = conn.entries[0].fullName.value
-                            result['ServiceManager'] = service_manager_name
-                            
-                            # Si aucun manager hiérarchique n'est défini, utiliser le manager de service
-                            if result['ChefHierarchique'] == 'No manager specified' or result['ChefHierarchique'] == 'Manager not found':
-                                result['ChefHierarchique'] = service_manager_name
-                                result['manager_name'] = service_manager_name  # Pour la compatibilité
-                        else:
-                            result['ServiceManager'] = 'Service Manager not found'
-                    except Exception as e:
-                        error_msg = f'Error fetching service manager: {str(e)}'
-                        result['ServiceManager'] = error_msg
+                    service_manager = referenced_entry(result['FavvExtDienstMgrDn'])
+                    if lookup_error:
+                        result['ServiceManager'] = f'Error fetching service manager: {lookup_error}'
+                    elif service_manager:
+                        service_manager_name = self._attr(service_manager, 'fullName')
+                        result['ServiceManager'] = service_manager_name
+                        
+                        # Si aucun manager hiérarchique n'est défini, utiliser le manager de service
+                        if result['ChefHierarchique'] == 'No manager specified' or result['ChefHierarchique'] == 'Manager not found':
+                            result['ChefHierarchique'] = service_manager_name
+                            result['manager_name'] = service_manager_name  # Pour la compatibilité
+                    else:
+                        result['ServiceManager'] = 'Service Manager not found'
                 
                 # Récupérer les groupes (groupMembership)
-                if hasattr(user_attributes, 'groupMembership') and user_attributes.groupMembership:
-                    for group_dn in user_attributes.groupMembership.values:
-                        conn.search(group_dn, '(objectClass=groupOfNames)', attributes=['cn'])
-                        if conn.entries:
-                            group_cn = conn.entries[0].cn.value
-                            result['groupMembership'].append({
-                                'dn': group_dn,
-                                'cn': group_cn,
-                            })
+                for group_dn in group_dns:
+                    group = referenced_entry(group_dn)
+                    if group and self._has_object_class(group, 'groupOfNames'):
+                        result['groupMembership'].append({
+                            'dn': group_dn,
+                            'cn': self._attr(group, 'cn'),
+                        })
                 
                 # Récupérer les rôles (nrfMemberOf)
-                if hasattr(user_attributes, 'nrfMemberOf') and user_attributes.nrfMemberOf:
-                    for role_dn in user_attributes.nrfMemberOf.values:
-                        conn.search(role_dn, '(objectClass=nrfRole)', attributes=['cn', 'nrfRoleCategoryKey'])
-                        if conn.entries:
-                            role_cn = conn.entries[0].cn.value
-                            role_catKey = conn.entries[0].nrfRoleCategoryKey.value if hasattr(conn.entries[0], 'nrfRoleCategoryKey') else 'N/A'
-                            result['nrfMemberOf'].append({
-                                'dn': role_dn,
-                                'cn': role_cn,
-                                'category': role_catKey
-                            })
+                for role_dn in role_dns:
+                    role = referenced_entry(role_dn)
+                    if role and self._has_object_class(role, 'nrfRole'):
+                        result['nrfMemberOf'].append({
+                            'dn': role_dn,
+                            'cn': self._attr(role, 'cn'),
+                            'category': self._attr(role, 'nrfRoleCategoryKey', 'N/A')
+                        })
                 
                 # Appliquer le format simplifié si demandé
                 if simplified:
@@ -394,6 +478,103 @@ class LDAPUserCRUD(LDAPBase):
             print(f"Error searching for user: {str(e)}")
             return None
     
+    # objectClass des comptes créés par l'application
+    NEW_USER_OBJECT_CLASSES = ['inetOrgPerson', 'top', 'pwmUser', 'FavvAfscaUser']
+    # Attributs recopiés du template vers le nouvel utilisateur
+    TEMPLATE_ATTRIBUTES = ['title', 'description', 'ou', 'FavvExtDienstMgrDn', 'FavvEmployeeType',
+                           'FavvEmployeeSubType']
+    # Types d'utilisateurs pour lesquels le numéro de registre national est enregistré
+    FAVVNATNR_USER_TYPES = ('BOODOCI', 'OCI')
+
+    def validate_new_user(self, user_type, given_name, sn, email=None, manager=None, favvnatnr=None,
+                          email_override=False, manager_override=False, favvnatnr_override=False):
+        """
+        Champs obligatoires d'un nouvel utilisateur (formulaire de création et import en masse).
+
+        Returns:
+            str: message d'erreur, ou None si les champs sont valides
+        """
+        if not given_name or not sn:
+            return "Les champs Prénom et Nom sont obligatoires."
+        if not email and not email_override:
+            return "L'adresse email est obligatoire."
+        if user_type == 'STAG' and not manager and not manager_override:
+            return "Un chef hiérarchique est obligatoire pour les stagiaires."
+        if user_type in self.FAVVNATNR_USER_TYPES and not favvnatnr and not favvnatnr_override:
+            return "Le numéro de registre national est obligatoire pour les utilisateurs de type OCI."
+        return None
+
+    def build_new_user_attributes(self, cn, given_name, sn, email=None, user_type=None, template_details=None,
+                                  favvnatnr=None, manager_dn=None):
+        """
+        Attributs LDAP d'un nouvel utilisateur (formulaire de création et import en masse).
+
+        Returns:
+            dict: attributs à passer à create_user
+        """
+        ldap_attributes = {
+            'givenName': [given_name],
+            'sn': [sn],
+            'cn': [cn],
+            'fullName': [f"{sn} {given_name}"]
+        }
+
+        # Ajouter l'email s'il est fourni
+        if email:
+            ldap_attributes['mail'] = [email]
+
+        # Ajouter les attributs du template si disponibles
+        for attribute in self.TEMPLATE_ATTRIBUTES:
+            if template_details and template_details.get(attribute):
+                ldap_attributes[attribute] = [template_details[attribute]]
+
+        # Ajouter FavvNatNr pour les utilisateurs de type OCI ou BOODOCI (si fourni)
+        if user_type in self.FAVVNATNR_USER_TYPES and favvnatnr:
+            ldap_attributes['FavvNatNr'] = [favvnatnr.replace(' ', '').replace('-', '')]
+
+        # Chef hiérarchique (stagiaires)
+        if manager_dn:
+            ldap_attributes['FavvHierarMgrDN'] = [manager_dn]
+
+        return ldap_attributes
+
+    def _has_short_name(self, ldap_attributes):
+        # Nom ou prénom court (3 caractères ou moins), comme dans preview_user_details
+        for attribute in ('givenName', 'sn'):
+            value = ldap_attributes.get(attribute)
+            if isinstance(value, (list, tuple)):
+                value = value[0] if value else None
+            if value and len(value) <= 3:
+                return True
+        return False
+
+    def _prepare_new_user(self, cn, ldap_attributes, password):
+        """
+        Compléter les attributs d'un nouvel utilisateur: mot de passe, uid et objectClass.
+        """
+        ldap_attributes['userPassword'] = [password]
+        # Ajouter l'attribut uid (UniqueID dans ConsoleOne)
+        ldap_attributes['uid'] = [cn]
+        # Assurer les valeurs d'objectClass appropriées - s'assurer que FavvAfscaUser est inclus
+        ldap_attributes['objectClass'] = list(self.NEW_USER_OBJECT_CLASSES)
+        return ldap_attributes
+
+    def _update_duplicate_index(self, user_dn, ldap_attributes=None):
+        """
+        Tenir l'index des doublons à jour après une création (ou une suppression si
+        ldap_attributes est None), sans attendre sa synchronisation.
+        """
+        index = DuplicateIndex.get(getattr(self, 'source', None))
+        if index is None:
+            return
+        try:
+            if ldap_attributes is None:
+                index.remove_entry(user_dn)
+            else:
+                index.add_entry(user_dn, ldap_attributes)
+        except Exception as e:
+            print(f"Erreur lors de la mise à jour de l'index des doublons: {str(e)}")
+
     def create_user(self, cn, ldap_attributes, template_details=None, previewed_password=None):
         """
         Crée un nouvel utilisateur dans LDAP avec les attributs spécifiés.
@@ -414,11 +595,7 @@ class LDAPUserCRUD(LDAPBase):
             user_dn = f"cn={cn},{self.usercreation_dn}"
 
             # Vérifier si l'utilisateur a un nom ou prénom court (3 caractères ou moins)
-            has_short_name = False
-            if 'givenName' in ldap_attributes and len(ldap_attributes['givenName']) <= 3:
-                has_short_name = True
-            elif 'sn' in ldap_attributes and len(ldap_attributes['sn']) <= 3:
-                has_short_name = True
+            has_short_name = self._has_short_name(ldap_attributes)
             
             # Utiliser le mot de passe prévisualisé s'il est fourni, sinon en générer un nouveau
             if previewed_password:
@@ -432,25 +609,18 @@ class LDAPUserCRUD(LDAPBase):
                 user_utils = LDAPUserUtils(self._get_config_for_utils())
                 password = user_utils.generate_password_from_cn(cn, short_name=has_short_name)
             
-            # Ajouter l'attribut userPassword
-            ldap_attributes['userPassword'] = [password]
-            
-            # Ajouter l'attribut uid (UniqueID dans ConsoleOne)
-            ldap_attributes['uid'] = [cn]
-            
-            # Assurer les valeurs d'objectClass appropriées - s'assurer que FavvAfscaUser est inclus
-            ldap_attributes['objectClass'] = [
-                'inetOrgPerson', 
-                'top',
-                'pwmUser',
-                'FavvAfscaUser'
-            ]
+            # Ajouter userPassword, uid et objectClass
+            self._prepare_new_user(cn, ldap_attributes, password)
 
             # Ajouter l'utilisateur au serveur LDAP
             result = conn.add(user_dn, attributes=ldap_attributes)
+            add_result = conn.result
+            # Rendre la connexion au pool avant les ajouts aux groupes
+            conn.unbind()
 
             if result:
-                print(f"User created successfully with password {password}! {conn.result}", 'success')
+                print(f"User created successfully with password {password}! {add_result}", 'success')
+                self._update_duplicate_index(user_dn, ldap_attributes)
                 
                 # Si le template contient des groupes, ajouter l'utilisateur à ces groupes
                 groups_added = 0
@@ -466,7 +636,7 @@ class LDAPUserCRUD(LDAPBase):
                 
                 return True, password, groups_added, groups_failed
             else:
-                print(f"Failed to create user: {conn.result}", 'error')
+                print(f"Failed to create user: {add_result}", 'error')
                 return False, None, 0, 0
 
         except Exception as e:
@@ -668,15 +838,7 @@ class LDAPUserCRUD(LDAPBase):
                     
                     # Si aucun DN n'est trouvé mais qu'un nom est fourni, rechercher le groupe
                     if not group_dn and group_name:
-                        search_bases = ['ou=Groups,ou=IAM-Security,o=COPY', self.app_base_dn, 'ou=GROUPS,ou=SYNC,o=COPY']
-                        for base_dn in search_bases:
-                            conn.search(base_dn, 
-                                    f'(cn={group_name})', 
-                                    search_scope='SUBTREE',
-                                    attributes=['cn'])
-                            if conn.entries:
-                                group_dn = conn.entries[0].entry_dn
-                                break
+                        group_dn = self._find_group_dn(group_name)
                 
                 # Si nous avons trouvé un DN de groupe, ajouter l'utilisateur
                 if group_dn:
@@ -706,6 +868,9 @@ class LDAPUserCRUD(LDAPBase):
             
             conn.unbind()
             
+            # Le fullName de l'utilisateur peut être affiché comme manager: oublier l'entrée en cache
+            self._invalidate_dns(user_dn, new_dn)
+            
             # Construire le message de succès
             if len(log_messages) > 0:
                 success_message = f"User {user_cn} updated successfully: " + "; ".join(log_messages)
@@ -737,6 +902,8 @@ class LDAPUserCRUD(LDAPBase):
             
             # Supprimer l'utilisateur
             conn.delete(user_dn)
+            if conn.result.get('result') == 0:
+                self._update_duplicate_index(user_dn)
             
             conn.unbind()
             return True, f"User {user_cn} deleted successfully."
@@ -1,83 +1,306 @@
 # flask_app/models/ldap/users/user_utils.py
+import os
+import threading
 import unicodedata
 import json
 from ldap3 import SUBTREE
 from ..base import LDAPBase
+from ..indexes import DuplicateIndex, normalize_favvnatnr
 
+PREFIX_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))), 'config', 'prefix.json')
 
-class LDAPUserUtils(LDAPBase):
-    
-    def generate_unique_cn(self, given_name, sn):
-        original_sn = sn
 
-        with open('flask_app/config/prefix.json', 'r') as f:
-            prefix_list = json.load(f)
-    
-        # Sort prefixes by length in descending order (longest first)
-        prefix_list.sort(key=lambda x: len(x.get('prefix', '')), reverse=True)
-    
-        for prefix_obj in prefix_list:
-            prefix = prefix_obj.get('prefix', '')
-            if prefix and sn.lower().startswith(prefix.lower()):
-                sn = sn[len(prefix):].strip()
+class PrefixTrie:
+    """
+    Particules de noms (prefix.json) en trie, insensible à la casse:
+    longest_match() trouve la plus longue particule en tête d'un nom en un seul parcours.
+    """
+
+    def __init__(self, prefixes):
+        self.root = {}
+        for prefix in prefixes:
+            if not prefix:
+                continue
+            node = self.root
+            for char in prefix.lower():
+                node = node.setdefault(char, {})
+            node[None] = len(prefix)
+
+    def longest_match(self, text):
+        """
+        Longueur de la plus longue particule par laquelle text commence (0 si aucune).
+        """
+        node = self.root
+        length = 0
+        for char in text.lower():
+            node = node.get(char)
+            if node is None:
                 break
+            length = node.get(None, length)
+        return length
+
+
+_prefix_trie = None
+_prefix_lock = threading.Lock()
+
+
+def get_prefix_trie():
+    """
+    Trie des particules, construit une seule fois par processus.
+    """
+    global _prefix_trie
+    if _prefix_trie is None:
+        with _prefix_lock:
+            if _prefix_trie is None:
+                with open(PREFIX_FILE, 'r') as f:
+                    prefix_list = json.load(f)
+                _prefix_trie = PrefixTrie(item.get('prefix', '') for item in prefix_list)
+    return _prefix_trie
+
+
+def _normalize_cn(cn_string):
+    # Sans accents ni caractères non alphanumériques, en majuscules
+    normalized = unicodedata.normalize('NFD', cn_string)
+    return ''.join(c for c in normalized if c.isalnum() and not unicodedata.combining(c)).upper()
+
+
+def _cn_candidates(given_name, sn):
+    """
+    CNs candidats dans l'ordre de préférence, et CN de 5 caractères si tous sont pris.
+    """
+    original_sn = sn
+    prefix_length = get_prefix_trie().longest_match(sn)
+    if prefix_length:
+        sn = sn[prefix_length:].strip()
+    # If surname becomes empty after prefix removal (rare edge case)
+    if not sn:
+        sn = original_sn
+
+    first_part = given_name[:3]
+    candidates = [_normalize_cn(f"{first_part}{sn[:3]}")]
+    # Remplacer le 3e caractère du nom par chacun des caractères suivants du nom complet
+    base = sn[:2] if len(sn) > 2 else sn
+    for i in range(3, len(original_sn)):
+        candidates.append(_normalize_cn(f"{first_part}{base}{original_sn[i]}"))
+    fallback = _normalize_cn(f"{given_name[:3]}{sn[:2]}")
+    return candidates, fallback
+
+
+class LDAPUserUtils(LDAPBase):
     
-        # If surname becomes empty after prefix removal (rare edge case)
-        if not sn:
-            sn = original_sn
-    
-        # Construct initial CN with first 3 chars of given_name and first 3 chars of sn (without prefix)
-        # Handle short names gracefully
-        first_part = given_name[:min(3, len(given_name))]
-        second_part = sn[:min(3, len(sn))]
-        cn_temp = f"{first_part}{second_part}"
-    
-        # Function to normalize and format in uppercase
-        def normalize_cn(cn_string):
-            normalized = unicodedata.normalize('NFD', cn_string)
-            return ''.join(c for c in normalized if c.isalnum() and not unicodedata.combining(c)).upper()
-    
-        # Normalize the initial CN for the search
-        cn = normalize_cn(cn_temp)
-    
-        # Check for uniqueness
-        conn = self._get_connection()
-        i = 2
-    
-        while True:
-            # Check if CN already exists
-            search_result = conn.search(
-                search_base=self.all_users_dn,
-                search_filter=f'(cn={cn})',
-                search_scope=SUBTREE
-            )
-        
-            # If CN doesn't exist, return it
-            if not conn.entries:
-                break
-        
-            # If we've exhausted all available characters in the surname
-            i += 1
-            if i >= len(original_sn):
-                print("All surname characters have been tried. Creating a 5-character CN.")
-                # Create a 5-char CN (3 from given name + 2 from surname)
-                cn_temp = f"{given_name[:min(3, len(given_name))]}{sn[:min(2, len(sn))]}"
-                cn = normalize_cn(cn_temp)
+    def generate_unique_cn(self, given_name, sn, reserved=None):
+        """
+        CN unique: 3 premiers caractères du prénom + 3 premiers du nom (sans particule).
+
+        Tous les candidats sont calculés d'avance (le 3e caractère du nom est remplacé
+        successivement par les caractères suivants) et vérifiés en une seule recherche.
+
+        Args:
+            given_name (str): Prénom
+            sn (str): Nom
+            reserved (set, optional): CNs déjà attribués mais pas encore créés (import en lot),
+                                      en majuscules
+
+        Returns:
+            str: CN en majuscules
+        """
+        candidates, fallback = _cn_candidates(given_name, sn)
+        taken = set(reserved or ())
+        taken.update(self._existing_cns(candidates))
+
+        for cn in candidates:
+            if cn not in taken:
                 break
-        
-            # Generate a new CN by replacing the 3rd character of the second part with the next character from surname
-            if len(sn) > 2:  # Make sure surname has at least 3 chars
-                new_sn = sn[:2] + original_sn[i]
-            else:
-                new_sn = sn + original_sn[i]
-        
-            cn_temp = f"{first_part}{new_sn}"
-            cn = normalize_cn(cn_temp)
-    
-        conn.unbind()
+        else:
+            print("All surname characters have been tried. Creating a 5-character CN.")
+            cn = fallback
+
         print(f"Final CN: {cn}")
         return cn
-   
+
+    def allocate_unique_cns(self, names, reserved=None):
+        """
+        CNs uniques pour un lot de nouveaux utilisateurs (import en masse).
+
+        Les candidats de tous les noms sont vérifiés ensemble (filtres OR par lots),
+        puis attribués dans l'ordre en mémoire: deux lignes du lot n'obtiennent jamais le même CN.
+        Contrairement à generate_unique_cn, le CN de 5 caractères est lui aussi vérifié.
+
+        Args:
+            names (list): tuples (prénom, nom)
+            reserved (set, optional): CNs à ne pas attribuer, en majuscules
+
+        Returns:
+            list: un CN par nom, ou None si aucun candidat n'est libre
+        """
+        plans = [_cn_candidates(given_name, sn) for given_name, sn in names]
+        wanted = set()
+        for candidates, fallback in plans:
+            wanted.update(candidates)
+            wanted.add(fallback)
+        taken = set(reserved or ())
+        taken.update(self._existing_cns(wanted))
+
+        allocated = []
+        for candidates, fallback in plans:
+            cn = next((candidate for candidate in candidates + [fallback] if candidate and candidate not in taken), None)
+            if cn:
+                taken.add(cn)
+            allocated.append(cn)
+        return allocated
+
+    def _existing_cns(self, cns):
+        """
+        CNs (en majuscules) déjà utilisés parmi cns, en une recherche avec un filtre OR par lot.
+        """
+        cns = sorted({cn for cn in cns if cn})
+        if not cns:
+            return set()
+        wanted = set(cns)
+        existing = set()
+        conn = self._get_connection()
+        try:
+            for chunk in self._chunks(cns):
+                or_filter = ''.join(f'(cn={self._escape_ldap_filter(cn)})' for cn in chunk)
+                conn.search(
+                    search_base=self.all_users_dn,
+                    search_filter=f'(|{or_filter})',
+                    search_scope=SUBTREE,
+                    attributes=['cn']
+                )
+                for item in conn.response or []:
+                    if item.get('type') != 'searchResEntry':
+                        continue
+                    existing.update(value.upper() for value in self._attr_values(item, 'cn') if value)
+            return existing & wanted
+        finally:
+            conn.unbind()
+
+    # Attributs relus pour confirmer une correspondance trouvée dans DuplicateIndex
+    DUPLICATE_CHECK_ATTRIBUTES = ['givenName', 'sn', 'FavvNatNr', 'fullName']
+
+    def _duplicate_index(self):
+        """
+        Index des doublons de la source s'il est prêt, sinon None (recherche dans LDAP).
+        """
+        return DuplicateIndex.get(getattr(self, 'source', None))
+
+    def _confirm_duplicates(self, index, dns):
+        """
+        Relire dans LDAP les DNs trouvés dans l'index et le corriger: une entrée
+        supprimée ou renommée depuis la dernière reconstruction en est retirée,
+        une entrée modifiée y est réindexée avec ses valeurs actuelles.
+
+        Si une lecture échoue, l'exception est propagée avant toute modification de
+        l'index: l'appelant revient alors à la recherche dans LDAP.
+        """
+        dns = sorted(set(dns))
+        if not dns:
+            return
+        conn = self._get_connection()
+        try:
+            # Sans `failed`, _resolve_dns lève une exception au premier lot en échec:
+            # seules les absences confirmées par une lecture réussie retirent un DN
+            current = self._resolve_dns(conn, dns, self.DUPLICATE_CHECK_ATTRIBUTES)
+        finally:
+            conn.unbind()
+        for dn in dns:
+            entry = current.get(self._normalize_dn(dn))
+            if entry is None:
+                index.remove_entry(dn)
+            else:
+                index.add_entry(entry['dn'], entry['attributes'])
+
+    def _indexed_names(self, index, names):
+        """
+        find_existing_names à partir de l'index: les correspondances sont confirmées
+        dans LDAP, une absence de l'index vaut absence de l'annuaire.
+        """
+        pairs = [(given_name, sn) for given_name, sn in names if given_name and sn]
+        hits = index.find_names(pairs)
+        self._confirm_duplicates(index, [dn for dns in hits.values() for dn in dns])
+        hits = index.find_names(pairs)
+        found = {}
+        for given_name, sn in pairs:
+            dns = hits.get(index.name_key(given_name, sn))
+            if dns:
+                found.setdefault((given_name.strip().lower(), sn.strip().lower()), dns[0])
+        return found
+
+    def _indexed_favvnatnrs(self, index, values):
+        hits = index.find_favvnatnrs(values)
+        self._confirm_duplicates(index, [dn for matches in hits.values() for dn, _ in matches])
+        return {
+            natnr: (matches[0][0], matches[0][1] or 'Unknown')
+            for natnr, matches in index.find_favvnatnrs(values).items()
+        }
+
+    def find_existing_names(self, names):
+        """
+        Version groupée de check_name_combination_exists.
+
+        Args:
+            names (list): tuples (prénom, nom)
+
+        Returns:
+            dict: {(prénom, nom) en minuscules: DN du premier utilisateur existant}
+        """
+        index = self._duplicate_index()
+        if index is not None:
+            try:
+                return self._indexed_names(index, names)
+            except Exception as e:
+                print(f"Index des doublons indisponible, recherche dans LDAP: {str(e)}")
+
+        keys = sorted({(given_name.strip().lower(), sn.strip().lower()) for given_name, sn in names
+                       if given_name and sn})
+        found = {}
+        conn = self._get_connection()
+        try:
+            for chunk in self._chunks(keys):
+                or_filter = ''.join(
+                    f'(&(givenName={self._escape_ldap_filter(given_name)})(sn={self._escape_ldap_filter(sn)}))'
+                    for given_name, sn in chunk
+                )
+                for entry in self._paged_search(conn, self.all_users_dn, f'(|{or_filter})', ['givenName', 'sn']):
+                    for given_name in self._attr_values(entry, 'givenName'):
+                        for sn in self._attr_values(entry, 'sn'):
+                            found.setdefault((given_name.lower(), sn.lower()), entry['dn'])
+        finally:
+            conn.unbind()
+        wanted = set(keys)
+        return {key: dn for key, dn in found.items() if key in wanted}
+
+    def find_existing_favvnatnrs(self, favvnatnrs):
+        """
+        Version groupée de check_favvnatnr_exists (numéros normalisés sans espaces ni tirets).
+
+        Returns:
+            dict: {FavvNatNr: (DN, fullName)} pour les numéros déjà présents
+        """
+        values = sorted({normalize_favvnatnr(value) for value in favvnatnrs if value})
+        index = self._duplicate_index()
+        if index is not None:
+            try:
+                return self._indexed_favvnatnrs(index, values)
+            except Exception as e:
+                print(f"Index des doublons indisponible, recherche dans LDAP: {str(e)}")
+
+        wanted = set(values)
+        found = {}
+        conn = self._get_connection()
+        try:
+            for chunk in self._chunks(values):
+                or_filter = ''.join(f'(FavvNatNr={self._escape_ldap_filter(value)})' for value in chunk)
+                for entry in self._paged_search(conn, self.all_users_dn, f'(|{or_filter})', ['FavvNatNr', 'fullName']):
+                    for value in self._attr_values(entry, 'FavvNatNr'):
+                        if value in wanted:
+                            found.setdefault(value, (entry['dn'], self._attr(entry, 'fullName', 'Unknown')))
+        finally:
+            conn.unbind()
+        return found
+
     def generate_password_from_cn(self, cn, short_name=False):
         if len(cn) < 5:
             # Handle case with very short CN
@@ -107,6 +330,16 @@ class LDAPUserUtils(LDAPBase):
                 return (second_part + first_part).lower() + '*987'
     
     def check_name_combination_exists(self, given_name, sn):
+        index = self._duplicate_index()
+        if index is not None and given_name and sn:
+            try:
+                found = self._indexed_names(index, [(given_name, sn)])
+                if found:
+                    return True, next(iter(found.values()))
+                return False, ""
+            except Exception as e:
+                print(f"Index des doublons indisponible, recherche dans LDAP: {str(e)}")
+
         try:
             conn = self._get_connection()
             
@@ -135,6 +368,17 @@ class LDAPUserUtils(LDAPBase):
             return False, ""
     
     def check_favvnatnr_exists(self, favvnatnr):
+        index = self._duplicate_index()
+        if index is not None and favvnatnr:
+            try:
+                found = self._indexed_favvnatnrs(index, [favvnatnr])
+                if found:
+                    user_dn, fullname = next(iter(found.values()))
+                    return True, user_dn, fullname
+                return False, "", ""
+            except Exception as e:
+                print(f"Index des doublons indisponible, recherche dans LDAP: {str(e)}")
+
         try:
             conn = self._get_connection()
         
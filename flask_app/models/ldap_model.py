@@ -1,4 +1,6 @@
 # flask_app/models/ldap_model.py
+import threading
+from flask import g, has_app_context
 from flask_app.models.ldap_config_manager import LDAPConfigManager
 from flask_app.models.ldap import (
     LDAPUserMixin,
@@ -10,7 +12,9 @@ from flask_app.models.ldap import (
     LDAPTemplate
 )
 from flask_app.models.ldap.users import (LDAPUserCRUD,LDAPUserUtils)
-from ldap3 import Server, Connection, ALL
+from flask_app.utils.cache_utils import TTLCache
+from ldap3 import Server, Connection, ALL, NONE, BASE
+from ldap3.core.exceptions import LDAPBindError
 
 class LDAPModel(
     LDAPUserMixin,
@@ -23,6 +27,15 @@ class LDAPModel(
     LDAPDashboardMixin,
     LDAPTemplate
 ):
+    # Cache cn -> DN des comptes qui se connectent: {(source, cn en minuscules): DN}
+    user_dn_cache = TTLCache(max_size=5000, default_ttl=3600)
+    # Attributs conservés en session pour l'utilisateur connecté
+    LOGIN_ATTRIBUTES = ['cn', 'fullName', 'mail', 'groupMembership']
+
+    # Un modèle partagé par source et par processus (voir get_ldap_model)
+    _instances = {}
+    _instances_lock = threading.Lock()
+
     def __init__(self, source='meta'):
         """
         Initialise le modèle avec la configuration correspondant à la source demandée.
@@ -33,14 +46,129 @@ class LDAPModel(
         config = LDAPConfigManager.get_config(source)
         self.source = source
         super().__init__(config)
+
+    def __setattr__(self, name, value):
+        # Les modèles partagés entre requêtes et threads sont en lecture seule
+        if self.__dict__.get('_frozen'):
+            raise AttributeError(f"Shared LDAPModel for '{self.source}' is read-only (attribute '{name}')")
+        super().__setattr__(name, value)
+
+    @classmethod
+    def shared(cls, source='meta'):
+        """
+        Modèle de la source, créé une seule fois par processus puis réutilisé.
+        Les sources inconnues retombent sur la source par défaut, comme LDAPConfigManager.get_config.
+        Les configurations sont chargées au démarrage (set_ldap_source ne change que la
+        source de la session): un changement de configuration demande un redémarrage.
+        """
+        source = (source or LDAPConfigManager.default_source).lower()
+        if source not in LDAPConfigManager.configs:
+            source = LDAPConfigManager.default_source
+        model = cls._instances.get(source)
+        if model is None:
+            with cls._instances_lock:
+                model = cls._instances.get(source)
+                if model is None:
+                    model = cls(source=source)
+                    model._frozen = True
+                    cls._instances[source] = model
+        return model
+
         
     @staticmethod
     def escape_filter_chars(text):
         return text.replace('\\', '\\5c').replace('*', '\\2a').replace('(', '\\28').replace(')', '\\29').replace('\0', '\\00')
 
+    def _bind_as_user(self, user_dn, password):
+        """
+        Vérifier le mot de passe par un bind simple. La connexion sert uniquement au bind:
+        pas de lecture du schéma ni du root DSE.
+
+        Returns:
+            Connection liée, ou None si le bind est refusé
+        """
+        if not user_dn or not password:
+            # Un bind sans mot de passe serait accepté comme bind anonyme
+            return None
+        try:
+            server = Server(self.ldap_server, get_info=NONE, connect_timeout=10)
+            return Connection(server, user=user_dn, password=password, auto_bind=True,
+                              client_strategy='SYNC', receive_timeout=10)
+        except LDAPBindError:
+            return None
+
+    def login(self, username, password):
+        """
+        Authentifier un utilisateur et lire ses données de session.
+
+        - DN trouvé via le cache cn -> DN (recherche seulement au premier login)
+        - bind avec le mot de passe de l'utilisateur
+        - une lecture BASE de l'utilisateur (LOGIN_ATTRIBUTES) sur le pool
+        - une recherche par conteneur de groupes de rôles, filtre OR sur leurs CN
+          restreint aux groupes dont l'utilisateur est membre
+
+        Returns:
+            dict ou None: {'dn', 'cn', 'fullName', 'mail', 'groupMembership', 'roles', ...}
+        """
+        try:
+            user_dn = self.get_user_dn(username)
+            user_conn = self._bind_as_user(user_dn, password)
+            if user_conn is None and user_dn:
+                # Le compte a pu être renommé ou déplacé depuis la mise en cache
+                fresh_dn = self.get_user_dn(username, use_cache=False)
+                if fresh_dn and self._normalize_dn(fresh_dn) != self._normalize_dn(user_dn):
+                    user_dn = fresh_dn
+                    user_conn = self._bind_as_user(user_dn, password)
+            if user_conn is None:
+                return None
+            user_conn.unbind()
+
+            role_groups = self._role_group_dns()
+            conn = self._get_connection()
+            try:
+                conn.search(user_dn, '(objectClass=*)', search_scope=BASE, attributes=self.LOGIN_ATTRIBUTES)
+                entry = next((item for item in conn.response or [] if item.get('type') == 'searchResEntry'), None)
+                if entry is None:
+                    return None
+                if self.login_role_check == 'groupMembership':
+                    member_of = {self._normalize_dn(dn) for dn in self._attr_values(entry, 'groupMembership')}
+                else:
+                    member_filter = f'(member={self._escape_ldap_filter(entry["dn"])})'
+                    member_of = self._resolve_dns(conn, list(role_groups.values()), ['cn'],
+                                                  search_filter=member_filter)
+            finally:
+                conn.unbind()
+
+            roles = [role for role, group_dn in role_groups.items() if self._normalize_dn(group_dn) in member_of]
+            groups = []
+            for group_dn in self._attr_values(entry, 'groupMembership'):
+                _, group_cn, _ = self._split_dn(group_dn)
+                groups.append({'dn': group_dn, 'cn': group_cn})
+
+            return {
+                'dn': entry['dn'],
+                'cn': self._attr(entry, 'cn', username),
+                'fullName': self._attr(entry, 'fullName', username),
+                'mail': self._attr(entry, 'mail'),
+                'groupMembership': groups,
+                'roles': roles,
+                # Indicateurs historiques, lus par User.from_ldap_data
+                'is_admin_member': 'admin' in roles,
+                'is_reader_member': 'reader' in roles,
+                'is_oci_admin_member': 'OCI-admin' in roles,
+                'admin_group_dn': self.admin_group_dn,
+                'reader_group_dn': self.reader_group_dn,
+                'oci_admin_group_dn': self.oci_admin_group_dn
+            }
+        except Exception as e:
+            print(f"Authentication error for '{username}': {e}")
+            return None
+
     def authenticate(self, username, password):
         # user_dn = f'cn={username},{self.actif_users_dn}'
         user_dn = self.get_user_dn (username)
+        if not user_dn or not password:
+            return None
         try:
             # Set up the server with a timeout
             server = Server(self.ldap_server, get_info=ALL, connect_timeout=10)
@@ -64,7 +192,15 @@ class LDAPModel(
             print(f"Authentication failed: {e}")
             return None
     
-    def get_user_dn(self, username):
+    def get_user_dn(self, username, use_cache=True):
+        """
+        DN d'un utilisateur actif à partir de son CN (mis en cache, voir user_dn_cache).
+        """
+        cache_key = (self._pool_key(), (username or '').lower())
+        if use_cache:
+            user_dn = LDAPModel.user_dn_cache.get(cache_key)
+            if user_dn:
+                return user_dn
     
         try:
             # ldap_model = LDAPModel(source=ldap_source)
@@ -86,7 +222,9 @@ class LDAPModel(
             
             if not user_dn:
                 print(f"User '{username}' not found in any container")
+                LDAPModel.user_dn_cache.delete(cache_key)
                 return None
+            LDAPModel.user_dn_cache.set(cache_key, user_dn)
             return user_dn    
         
         except Exception as e:
@@ -95,10 +233,30 @@ class LDAPModel(
     
     def authenticate_admin(self, username, password):
         try:
+            # Le compte de service passe par le pool de connexions de la source
+            if username == self.bind_dn and password == self.password:
+                return self._get_connection()
             server = Server(self.ldap_server, get_info=ALL)
             conn = Connection(server, username, password=password, auto_bind=True)
             return conn
             
         except Exception as e:
             print(f"Authentication failed: {e}")
-            return None
\ No newline at end of file
+            return None
+
+
+def get_ldap_model(source='meta'):
+    """
+    Modèle LDAP de la source pour la requête en cours.
+
+    Le modèle partagé du processus est mémorisé dans flask.g: les routes et les
+    helpers d'une même requête obtiennent le même objet et le même pool de connexions.
+    Hors contexte d'application (threads de fond), le modèle partagé est retourné directement.
+    """
+    if not has_app_context():
+        return LDAPModel.shared(source)
+    models = g.setdefault('ldap_models', {})
+    model = models.get(source)
+    if model is None:
+        model = models[source] = LDAPModel.shared(source)
+    return model
@@ -78,15 +78,32 @@ class User(UserMixin):
         
         roles = []
         
-        if 'admin_group_dn' in user_data and user_data.get('is_admin_member', False):
-            roles.append('admin')
-        
-        if 'reader_group_dn' in user_data and user_data.get('is_reader_member', False):
-            roles.append('reader')
-        
-        if 'oci_admin_group_dn' in user_data and user_data.get('is_oci_admin_member', False):
-            roles.append('OCI-admin')
+        if 'roles' in user_data:
+            # Rôles calculés au login à partir de tous les groupes de rôles configurés
+            roles = list(user_data['roles'])
+        else:
+            if 'admin_group_dn' in user_data and user_data.get('is_admin_member', False):
+                roles.append('admin')
+            
+            if 'reader_group_dn' in user_data and user_data.get('is_reader_member', False):
+                roles.append('reader')
+            
+            if 'oci_admin_group_dn' in user_data and user_data.get('is_oci_admin_member', False):
+                roles.append('OCI-admin')
         
+        return cls(
+            username=username,
+            dn=user_data.get('dn', ''),
+            display_name=user_data.get('fullName', username),
+            email=user_data.get('mail', None),
+            ldap_source=ldap_source,
+            roles=roles,
+            permissions=cls._permissions_for(roles),
+            groups=groups
+        )
+
+    @staticmethod
+    def _permissions_for(roles):
         from flask import current_app
         permissions = set()
         
@@ -97,16 +114,32 @@ class User(UserMixin):
                 permissions.update([
                     'view_users', 'create_users', 'edit_users', 'delete_users', 'admin_users'
                 ])
-        
+        return permissions
+
+    def to_profile(self):
+        """
+        Profil minimal conservé en session (les permissions sont recalculées à partir des rôles).
+        """
+        return {
+            'dn': self.dn,
+            'name': self.display_name,
+            'mail': self.email,
+            'roles': list(self.roles),
+            'groups': list(self.groups)
+        }
+
+    @classmethod
+    def from_profile(cls, username, profile, ldap_source='meta'):
+        roles = profile.get('roles') or []
         return cls(
             username=username,
-            dn=user_data.get('dn', ''),
-            display_name=user_data.get('fullName', username),
-            email=user_data.get('mail', None),
+            dn=profile.get('dn', ''),
+            display_name=profile.get('name') or username,
+            email=profile.get('mail'),
             ldap_source=ldap_source,
             roles=roles,
-            permissions=permissions,
-            groups=groups
+            permissions=cls._permissions_for(roles),
+            groups=profile.get('groups') or []
         )
         
 # Role-based access decorators
@@ -1,31 +1,101 @@
 from flask import Blueprint, request, jsonify, session, flash, json
-from flask_app.models.ldap_model import LDAPModel
+from flask_app.models.ldap_model import get_ldap_model
 # from flask_app.utils.ldap_utils import login_required
 from flask_login import login_required  # Nouvel import depuis Flask-Login
 from functools import lru_cache
 from flask_app.models.ldap_config_manager import LDAPConfigManager
+from flask_app.utils.cache_utils import TTLCache
 
 autocomplete_bp = Blueprint('autocomplete', __name__)
 
-# Cache pour les résultats d'autocomplétion
-autocomplete_cache = {}
-MAX_CACHE_SIZE = 100
+# Cache pour les résultats d'autocomplétion (LRU borné, expiration par type)
+MAX_CACHE_SIZE = 1000
+autocomplete_cache = TTLCache(max_size=MAX_CACHE_SIZE, default_ttl=300)
+prefix_hits = {'count': 0}
+
+# Par type: durée de vie en cache, nombre maximum de résultats renvoyés par la recherche
+# (None = jamais tronquée) et longueur minimale du terme.
+AUTOCOMPLETE_CACHE_SETTINGS = {
+    'fullName': {'ttl': 120, 'limit': 20, 'min_length': 3},
+    'managers': {'ttl': 300, 'limit': None, 'min_length': 1},
+    'group': {'ttl': 600, 'limit': None, 'min_length': 1},
+    'role': {'ttl': 600, 'limit': None, 'min_length': 1},
+    'roles': {'ttl': 600, 'limit': None, 'min_length': 1},
+    'services': {'ttl': 600, 'limit': 20, 'min_length': 1}
+}
+DEFAULT_CACHE_SETTINGS = {'ttl': 300, 'limit': None, 'min_length': 1}
+
+def _normalize_term(search_term):
+    """Forme utilisée pour les clés et le filtrage local (comme caseIgnore côté LDAP)"""
+    return ' '.join(search_term.split()).casefold()
+
+def _matches(item, term):
+    value = item.get('value') if isinstance(item, dict) else item
+    return term in _normalize_term(str(value or ''))
 
 def get_cached_result(ldap_source, search_type, search_term):
-    """Récupère un résultat depuis le cache"""
-    cache_key = f"{ldap_source}:{search_type}:{search_term}"
-    return autocomplete_cache.get(cache_key)
+    """
+    Récupère un résultat depuis le cache.
 
-def set_cached_result(ldap_source, search_type, search_term, result):
-    """Stocke un résultat dans le cache"""
-    cache_key = f"{ldap_source}:{search_type}:{search_term}"
-    autocomplete_cache[cache_key] = result
-    
-    # Nettoyer le cache s'il devient trop grand
-    if len(autocomplete_cache) > MAX_CACHE_SIZE:
-        keys = list(autocomplete_cache.keys())
-        for key in keys[:MAX_CACHE_SIZE//2]:  # Supprimer la moitié du cache
-            del autocomplete_cache[key]
+    Si le terme exact n'est pas en cache, un résultat complet pour un préfixe du terme
+    est filtré localement: tout ce qui contient « dupo » contient aussi « dup ».
+    Chaque résultat est conservé avec un indicateur « complet » (voir set_cached_result).
+    """
+    settings = AUTOCOMPLETE_CACHE_SETTINGS.get(search_type, DEFAULT_CACHE_SETTINGS)
+    term = _normalize_term(search_term)
+
+    cached = autocomplete_cache.get((ldap_source, search_type, term), count=False)
+    if cached is not None:
+        autocomplete_cache.record_hit()
+        return cached[0]
+
+    # Les jokers ne sont pas échappés pour certains types: pas de filtrage local
+    if '*' not in term:
+        for length in range(len(term) - 1, settings['min_length'] - 1, -1):
+            base = autocomplete_cache.get((ldap_source, search_type, term[:length]), count=False)
+            if base is None:
+                continue
+            base_result, complete = base
+            if not complete:
+                # Résultat tronqué: il peut manquer des entrées pour le terme plus long
+                break
+            result = [item for item in base_result if _matches(item, term)]
+            autocomplete_cache.set((ldap_source, search_type, term), (result, True), ttl=settings['ttl'])
+            autocomplete_cache.record_hit()
+            prefix_hits['count'] += 1
+            return result
+
+    autocomplete_cache.get((ldap_source, search_type, term))  # compte le miss
+    return None
+
+def set_cached_result(ldap_source, search_type, search_term, result, complete=None):
+    """
+    Stocke un résultat dans le cache.
+    Les résultats vides ne sont pas conservés: le modèle renvoie aussi [] en cas d'erreur LDAP.
+
+    complete indique si le résultat contient toutes les correspondances (réutilisable
+    pour un terme plus long). Par défaut: moins de résultats que la limite du type.
+    Un type sans limite n'est incomplet que si une base n'a pas répondu: ce résultat
+    partiel n'est pas conservé du tout.
+    """
+    if not result:
+        return
+    settings = AUTOCOMPLETE_CACHE_SETTINGS.get(search_type, DEFAULT_CACHE_SETTINGS)
+    if complete is False and settings['limit'] is None:
+        return
+    if complete is None:
+        complete = settings['limit'] is None or len(result) < settings['limit']
+    autocomplete_cache.set((ldap_source, search_type, _normalize_term(search_term)), (result, complete),
+                           ttl=settings['ttl'])
+
+def cached_autocomplete(ldap_source, search_type, search_term, compute):
+    """Résultat en cache ou calculé par compute() (qui retourne (résultat, complet)), puis mis en cache"""
+    cached_result = get_cached_result(ldap_source, search_type, search_term)
+    if cached_result is not None:
+        return cached_result
+    result, complete = compute()
+    set_cached_result(ldap_source, search_type, search_term, result, complete=complete)
+    return result
 
 @autocomplete_bp.route('/autocomplete_groups', methods=['GET'])
 @login_required
@@ -45,8 +115,9 @@ def autocomplete_groups():
     
     try:
         # Créer une instance du modèle LDAP avec la source spécifiée
-        ldap_model = LDAPModel(source=ldap_source)
-        result = ldap_model.autocomplete('group', search_term)
+        ldap_model = get_ldap_model(ldap_source)
+        result = cached_autocomplete(ldap_source, 'group', search_term,
+                                     lambda: ldap_model.autocomplete('group', search_term, return_complete=True))
         return jsonify(result)
     except Exception as e:
         print(f"Erreur d'autocomplétion des groupes: {str(e)}")
@@ -75,11 +146,11 @@ def autocomplete_fullName():
     try:
         # Vérifier si le résultat existe dans le cache
         cached_result = get_cached_result(ldap_source, 'fullName', search_term)
-        if cached_result:
+        if cached_result is not None:
             return jsonify(cached_result)
         
         # Créer une instance du modèle LDAP avec la source spécifiée
-        ldap_model = LDAPModel(source=ldap_source)
+        ldap_model = get_ldap_model(ldap_source)
         result = ldap_model.autocomplete('fullName', search_term)
         
         # Limiter les résultats retournés
@@ -113,9 +184,10 @@ def autocomplete_roles():
     
     try:
         # Créer une instance du modèle LDAP avec la source spécifiée
-        ldap_model = LDAPModel(source=ldap_source)
+        ldap_model = get_ldap_model(ldap_source)
         # Utiliser la fonction spécifique pour les rôles
-        result = ldap_model.autocomplete_role(search_term)
+        result = cached_autocomplete(ldap_source, 'roles', search_term,
+                                     lambda: ldap_model.autocomplete_role(search_term, return_complete=True))
         print(f"Résultats trouvés: {len(result)}")
         return jsonify(result)
     except Exception as e:
@@ -146,18 +218,18 @@ def autocomplete_services():
     try:
         # Vérifier si le résultat existe dans le cache
         cached_result = get_cached_result(ldap_source, 'services', search_term)
-        if cached_result:
+        if cached_result is not None:
             print(f"Résultats (du cache): {len(cached_result)}")
             return jsonify(cached_result)
         
         # Créer une instance du modèle LDAP avec la source spécifiée
-        ldap_model = LDAPModel(source=ldap_source)
+        ldap_model = get_ldap_model(ldap_source)
         # Utiliser la fonction spécifique pour les services
-        result = ldap_model.autocomplete_services(search_term)
+        result, complete = ldap_model.autocomplete_services(search_term, return_complete=True)
         print(f"Résultats trouvés: {len(result)}")
         
-        # Mettre en cache le résultat
-        set_cached_result(ldap_source, 'services', search_term, result)
+        # Mettre en cache le résultat (un résultat coupé par la limite de taille n'est pas réutilisé)
+        set_cached_result(ldap_source, 'services', search_term, result, complete=complete)
         
         return jsonify(result)
     except Exception as e:
@@ -185,8 +257,9 @@ def autocomplete_managers():
     
     try:
         # Créer une instance du modèle LDAP avec la source spécifiée
-        ldap_model = LDAPModel(source=ldap_source)
-        result = ldap_model.autocomplete('managers', search_term)
+        ldap_model = get_ldap_model(ldap_source)
+        result = cached_autocomplete(ldap_source, 'managers', search_term,
+                                     lambda: ldap_model.autocomplete('managers', search_term, return_complete=True))
         return jsonify(result)
     except Exception as e:
         print(f"Erreur d'autocomplétion des managers: {str(e)}")
@@ -232,17 +305,26 @@ def unified_autocomplete():
     try:
         # Vérifier si le résultat existe dans le cache
         cached_result = get_cached_result(ldap_source, search_type, search_term)
-        if cached_result:
+        if cached_result is not None:
             return jsonify(cached_result)
             
         # Créer une instance du modèle LDAP avec la source spécifiée
-        ldap_model = LDAPModel(source=ldap_source)
-        result = ldap_model.autocomplete(search_type, search_term)
+        ldap_model = get_ldap_model(ldap_source)
+        result, complete = ldap_model.autocomplete(search_type, search_term, return_complete=True)
         
         # Mettre en cache le résultat
-        set_cached_result(ldap_source, search_type, search_term, result)
+        set_cached_result(ldap_source, search_type, search_term, result, complete=complete)
         
         return jsonify(result)
     except Exception as e:
         print(f"Erreur d'autocomplétion ({search_type}): {str(e)}")
-        return jsonify([]), 500
\ No newline at end of file
+        return jsonify([]), 500
+
+
+@autocomplete_bp.route('/autocomplete_cache_stats', methods=['GET'])
+@login_required
+def autocomplete_cache_stats():
+    """Compteurs du cache d'autocomplétion (taille, hits, misses, réutilisations de préfixe)"""
+    stats = autocomplete_cache.stats()
+    stats['prefix_hits'] = prefix_hits['count']
+    return jsonify(stats)
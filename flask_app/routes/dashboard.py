@@ -1,6 +1,5 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session
+from flask import Blueprint, render_template, request, redirect, url_for, session, current_app, flash
 from flask_login import login_required  # Nouvel import depuis Flask-Login
-from flask_app.models.ldap_model import LDAPModel
 from flask_app.models.ldap_config_manager import LDAPConfigManager
 
 dashboard_bp = Blueprint('dashboard', __name__)
@@ -23,15 +22,18 @@ def dashboard():
     session['ldap_source'] = ldap_source
     session.modified = True
     
-    # Step 3: Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
-    
-    # Step 4: Get LDAP name for display purposes
+    # Step 3: Get LDAP name for display purposes
     config = LDAPConfigManager.get_config(ldap_source)
     ldap_name = config.get('LDAP_name', 'META')
     
-    # Récupérer les statistiques
-    stats = ldap_model.get_dashboard_stats(inactive_months=3, disabled_user_type=None) # changer ici si on veut les personnes qui n'ont pas fait de login depuis plus longtemps.
+    # Step 4: Récupérer les statistiques depuis le cache d'instantanés (rafraîchi en arrière-plan)
+    dashboard_cache = current_app.dashboard_cache
+    try:
+        stats, computed_at = dashboard_cache.get_stats(ldap_source, inactive_months=3, disabled_user_type=None) # changer ici si on veut les personnes qui n'ont pas fait de login depuis plus longtemps.
+    except Exception as e:
+        print(f"Statistiques du tableau de bord indisponibles: {str(e)}")
+        flash('Dashboard statistics are currently unavailable.', 'warning')
+        stats, computed_at = {}, None
     #ajouter les OCI, DERDEN, LABEXT etc
     
     disabled_accounts = stats.get('disabled_accounts', 0)
@@ -45,5 +47,6 @@ def dashboard():
                           inactive_users=inactive_users,
                           expired_password_users=expired_password_users,
                           never_logged_in_users=never_logged_in_users,
+                          stats_updated_at=dashboard_cache.format_timestamp(computed_at),
                           ldap_source=ldap_source,
                           ldap_name=ldap_name)
\ No newline at end of file
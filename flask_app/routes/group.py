@@ -1,7 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
-from flask_app.models.ldap_model import LDAPModel
+from flask_app.models.ldap_model import get_ldap_model
 from flask_app.models.ldap_config_manager import LDAPConfigManager
-from flask_app.utils.export_utils import util_export_group_users_csv
+from flask_app.utils.export_utils import util_export_group_users_csv, util_export_group_users_pdf, peek_rows
 from flask_login import login_required  # Nouvel import depuis Flask-Login
 
 group_bp = Blueprint('group', __name__)
@@ -27,7 +27,7 @@ def group_users():
     session.modified = True
     
     # Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
     # Get LDAP name for display purposes
     config = LDAPConfigManager.get_config(ldap_source)
@@ -70,18 +70,50 @@ def export_group_users_csv():
     if not ldap_source:
         ldap_source = session.get('ldap_source', 'meta')
     
+    # format=csv|xlsx, gzip=1 pour un CSV compressé
+    export_format = request.args.get('format', 'csv')
+    compress = request.args.get('gzip') == '1'
+    
     # Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
+    
+    # If we have a specific DN, use it; otherwise look the group up by its CN
+    if not group_dn and group_name:
+        group_dn = ldap_model._find_group_dn(group_name)
     
-    # If we have a specific DN, use it
     if group_dn:
-        result = ldap_model.get_group_users_by_dn(group_dn, group_name)
-    else:
-        # Otherwise, use the existing method based on the CN
-        result = ldap_model.get_group_users(group_name)
+        if not group_name:
+            group_name = ldap_model._split_dn(group_dn)[1]
+        # Les membres sont lus lot par lot pendant l'envoi de la réponse
+        rows = peek_rows(ldap_model.iter_group_users(group_dn))
+        if rows:
+            return util_export_group_users_csv(group_name, rows, export_format, compress)
     
-    if result and result['users']:
-        return util_export_group_users_csv(result['group_name'], result['users'])
+    return redirect(url_for('group.group_users', source=ldap_source))
+
+@group_bp.route('/export_group_users_pdf')
+@login_required
+def export_group_users_pdf():
+    group_name = request.args.get('group_name', '')
+    group_dn = request.args.get('group_dn', '')
+    
+    # Get LDAP source with proper fallback
+    ldap_source = request.args.get('source')
+    if not ldap_source:
+        ldap_source = session.get('ldap_source', 'meta')
+    
+    # Create LDAP model with the appropriate source
+    ldap_model = get_ldap_model(ldap_source)
+    
+    if not group_dn and group_name:
+        group_dn = ldap_model._find_group_dn(group_name)
+    
+    if group_dn:
+        if not group_name:
+            group_name = ldap_model._split_dn(group_dn)[1]
+        rows = peek_rows(ldap_model.iter_group_users(group_dn))
+        if rows:
+            return util_export_group_users_pdf(group_name, rows)
     
     return redirect(url_for('group.group_users', source=ldap_source))
 
@@ -106,7 +138,7 @@ def add_users_to_group():
     session.modified = True
     
     # Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
     # Get LDAP name for display purposes
     config = LDAPConfigManager.get_config(ldap_source)
@@ -169,7 +201,7 @@ def add_users_to_group():
         ldap_source = session.get('ldap_source', ldap_source)
         
         # Reinitialize the model with the correct source
-        ldap_model = LDAPModel(source=ldap_source)
+        ldap_model = get_ldap_model(ldap_source)
         
         # Get LDAP name for display purposes
         config = LDAPConfigManager.get_config(ldap_source)
@@ -205,7 +237,7 @@ def search_users_for_group():
     session.modified = True
     
     # Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
     # Get LDAP name for display purposes
     config = LDAPConfigManager.get_config(ldap_source)
@@ -286,7 +318,7 @@ def confirm_add_users():
     session.modified = True
     
     # Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
     import json
     try:
@@ -348,7 +380,7 @@ def validate_bulk_cns():
     session.modified = True
     
     # Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
     if not cn_list or not group_dn:
         return jsonify({'error': 'Empty CN list or group DN'}), 400
@@ -377,7 +409,8 @@ def validate_bulk_cns():
         options = {
             'search_type': 'cn',
             'container': 'all',
-            'simplified': True  
+            'simplified': True,
+            'sections': ['core']
         }
     
         user_info = ldap_model.get_user(cn, options)
@@ -1,5 +1,5 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, json, current_app
-from flask_app.models.ldap_model import LDAPModel
+from flask_app.models.ldap_model import get_ldap_model
 from flask_login import login_required, current_user
 from flask_app.models.ldap_config_manager import LDAPConfigManager
 
@@ -24,7 +24,7 @@ def post_creation():
     session['ldap_source'] = ldap_source
     session.modified = True
     
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
     config = LDAPConfigManager.get_config(ldap_source)
     ldap_name = config.get('LDAP_name', 'META')
@@ -50,17 +50,10 @@ def post_creation():
         # Filter users by type
         pending_users = []
         for user in all_pending_users:
-            # You'll need to modify get_pending_users to include user type
-            # or fetch user details here
-            options = {
-                'container': 'all',
-                }
-            user_details = ldap_model.get_user(user['dn'], options)
-            
-            if user_details and 'title' in user_details:
-                user_type = user_details['title']
-                if user_type in allowed_types:
-                    pending_users.append(user)
+            # Le title fait partie des attributs de la liste: pas de lecture supplémentaire par utilisateur
+            user_type = user.get('title')
+            if user_type in allowed_types:
+                pending_users.append(user)
     
     
     selected_user = None
@@ -167,7 +160,7 @@ def complete_user():
         set_password = request.form.get('set_password') == 'true'
         
         # Complete the user creation process
-        ldap_model = LDAPModel(source=ldap_source)
+        ldap_model = get_ldap_model(ldap_source)
         
         # Configurer les options pour update_user
         options = {
@@ -212,7 +205,7 @@ def delete_user():
         session.modified = True
         
         if user_dn:
-            ldap_model = LDAPModel(source=ldap_source)
+            ldap_model = get_ldap_model(ldap_source)
             success, message = ldap_model.delete_user(user_dn)
             
             if success:
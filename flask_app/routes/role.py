@@ -1,7 +1,7 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, session
-from flask_app.models.ldap_model import LDAPModel
+from flask_app.models.ldap_model import get_ldap_model
 from flask_app.models.ldap_config_manager import LDAPConfigManager
-from flask_app.utils.export_utils import util_export_role_users_csv, util_export_role_users_pdf
+from flask_app.utils.export_utils import util_export_role_users_csv, util_export_role_users_pdf, peek_rows
 from flask_login import login_required  # Nouvel import depuis Flask-Login
 
 role_bp = Blueprint('role', __name__)
@@ -26,7 +26,7 @@ def role_users():
     session.modified = True
     
     # Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
     # Get LDAP name for display purposes
     config = LDAPConfigManager.get_config(ldap_source)
@@ -94,7 +94,7 @@ def role_groups():
     session.modified = True
     
     # Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
     # Get LDAP name for display purposes
     config = LDAPConfigManager.get_config(ldap_source)
@@ -128,12 +128,19 @@ def export_role_users_csv(role_cn):
     if not ldap_source:
         ldap_source = session.get('ldap_source', 'meta')
     
+    # format=csv|xlsx, gzip=1 pour un CSV compressé
+    export_format = request.args.get('format', 'csv')
+    compress = request.args.get('gzip') == '1'
+    
     # Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
-    result = ldap_model.get_role_users(role_cn)
-    if result and result['users']:
-        return util_export_role_users_csv(role_cn, result['users'])
+    role_dn = ldap_model._find_role_dn(role_cn)
+    if role_dn:
+        # Les détenteurs sont lus lot par lot pendant l'envoi de la réponse
+        rows = peek_rows(ldap_model.iter_role_users(role_dn))
+        if rows:
+            return util_export_role_users_csv(role_cn, rows, export_format, compress)
     
     return redirect(url_for('role.role_users', source=ldap_source))
 
@@ -146,11 +153,13 @@ def export_role_users_pdf(role_cn):
         ldap_source = session.get('ldap_source', 'meta')
     
     # Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
-    result = ldap_model.get_role_users(role_cn)
-    if result and result['users']:
-        return util_export_role_users_pdf(role_cn, result['users'])
+    role_dn = ldap_model._find_role_dn(role_cn)
+    if role_dn:
+        rows = peek_rows(ldap_model.iter_role_users(role_dn))
+        if rows:
+            return util_export_role_users_pdf(role_cn, rows)
     
     return redirect(url_for('role.role_users', source=ldap_source))
 
@@ -167,7 +176,7 @@ def view_role(dn):
     session.modified = True
     
     # Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
     # Get LDAP name for display purposes
     config = LDAPConfigManager.get_config(ldap_source)
@@ -1,11 +1,14 @@
-from flask import Blueprint, render_template, request, flash, session
+from flask import Blueprint, render_template, request, flash, session, jsonify
 from flask_login import login_required
 from flask_app.models.ldap_config_manager import LDAPConfigManager
-from flask_app.models.ldap.users import LDAPUserCRUD
+from flask_app.models.ldap_model import get_ldap_model
 # from flask_app.models.ldap.users import LDAPUserUtils
 
 search_bp = Blueprint('search', __name__)
 
+# Sections chargées pour la fiche utilisateur; les groupes et rôles sont chargés à la demande
+DETAIL_SECTIONS = ['core', 'org', 'security']
+
 @search_bp.route('/search', methods=['GET', 'POST'])
 @login_required
 def search_user():
@@ -15,6 +18,7 @@ def search_user():
     """
     result = None
     search_results = None
+    pagination = None
     prefill_cn = request.args.get('cn', '')
     prefill_workforceID = request.args.get('workforceID', '')
     prefill_FavvNatNr = request.args.get('FavvNatNr', '')
@@ -38,12 +42,14 @@ def search_user():
     
     ldap_name = config.get('LDAP_name', 'META')
     
-    user_crud = LDAPUserCRUD(config)
+    user_crud = get_ldap_model(ldap_source)
     
-    if request.method == 'POST':
-        # Get search parameters from form
-        search_term = request.form.get('search_term', '')
-        search_type = request.form.get('search_type', '')  # 'cn', 'workforceID', 'FavvNatNr', 'fullName'
+    # Une recherche vient du formulaire (POST) ou d'un lien de pagination (GET avec search_term)
+    if request.method == 'POST' or request.args.get('search_term'):
+        # Get search parameters from form (or from the pagination link)
+        params = request.form if request.method == 'POST' else request.args
+        search_term = params.get('search_term', '')
+        search_type = params.get('search_type', '')  # 'cn', 'workforceID', 'FavvNatNr', 'fullName'
         
         # Validate input
         if not search_term or not search_type:
@@ -63,26 +69,42 @@ def search_user():
         
         if has_wildcard:
             
+            # Résultats triés par CN, une page à la fois
             options = {
                 'search_type': search_type,
-                'return_list': True,
-                'container': 'all'  
+                'container': 'all',
+                'sort': 'cn',
+                'offset': request.args.get('offset', 0, type=int),
+                'page_size': config.get('search_page_size', 50)
             }
-            search_results = user_crud.get_user(search_term, options)
+            page = user_crud.search_users_page(search_term, options)
+            search_results = page['users']
             
-            if len(search_results) == 1:
+            if page['total'] == 1 and len(search_results) == 1:
                 
                 options = {
-                    'container': 'all'  
+                    'container': 'all',
+                    'sections': DETAIL_SECTIONS
                 }
                 result = user_crud.get_user(search_results[0]['dn'], options)
                 search_results = None
-            elif len(search_results) == 0:
+            elif page['total'] == 0:
                 flash('No users found matching your criteria.', 'danger')
+            else:
+                pagination = {
+                    'search_term': search_term,
+                    'search_type': search_type,
+                    'total': page['total'],
+                    'first': page['offset'] + 1,
+                    'last': page['offset'] + len(search_results),
+                    'next_offset': page['next_offset'],
+                    'prev_offset': page['prev_offset']
+                }
         else:
             options = {
                 'search_type': search_type,
-                'container': 'all'  
+                'container': 'all',
+                'sections': DETAIL_SECTIONS
             }
             result = user_crud.get_user(search_term, options)
             
@@ -95,16 +117,42 @@ def search_user():
         user_dn = request.args.get('dn')
         
         options = {
-            'container': 'all'  # Rechercher dans tous les conteneurs (actif, inactif,to-process)
+            'container': 'all',  # Rechercher dans tous les conteneurs (actif, inactif,to-process)
+            'sections': DETAIL_SECTIONS
         }
         result = user_crud.get_user(user_dn, options)
     
     return render_template('search.html', 
                            result=result,
                            search_results=search_results,
+                           pagination=pagination,
                            prefill_cn=prefill_cn, 
                            prefill_workforceID=prefill_workforceID, 
                            prefill_FavvNatNr=prefill_FavvNatNr,
                            prefill_fullName=prefill_fullName,
                            ldap_source=ldap_source,
-                           ldap_name=ldap_name)
\ No newline at end of file
+                           ldap_name=ldap_name)
+
+
+@search_bp.route('/search/memberships', methods=['GET'])
+@login_required
+def user_memberships():
+    """
+    Groupes et rôles d'un utilisateur (JSON), chargés à la demande par la fiche utilisateur.
+    """
+    user_dn = request.args.get('dn')
+    if not user_dn:
+        return jsonify({'error': "Le paramètre 'dn' est requis"}), 400
+    
+    ldap_source = request.args.get('source') or session.get('ldap_source', 'meta')
+    user_crud = get_ldap_model(ldap_source)
+    
+    result = user_crud.get_user(user_dn, {'container': 'all', 'sections': ['memberships']})
+    if not result:
+        return jsonify({'error': 'User not found'}), 404
+    
+    return jsonify({
+        'dn': result['dn'],
+        'groupMembership': result['groupMembership'],
+        'nrfMemberOf': result['nrfMemberOf']
+    })
@@ -1,6 +1,6 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session
-from flask_app.models.ldap_model import LDAPModel
-from flask_app.utils.export_utils import util_export_service_users_csv
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from flask_app.models.ldap_model import get_ldap_model
+from flask_app.utils.export_utils import util_export_service_users_csv, util_export_service_users_pdf, peek_rows
 from flask_login import login_required  # Nouvel import depuis Flask-Login
 from flask_app.models.ldap_config_manager import LDAPConfigManager
 
@@ -31,8 +31,11 @@ def service_users():
     if request.method == 'POST' or prefill_service_name:
         # Get the service CN from the form
         service_name = request.form.get('service_name', '') or prefill_service_name        
-        ldap_model = LDAPModel(source=ldap_source)
+        ldap_model = get_ldap_model(ldap_source)
         result = ldap_model.get_service_users(service_name)
+        if result and result.get('incomplete_bases'):
+            flash('Partial results: no answer from ' + ', '.join(result['incomplete_bases']) + '. '
+                  'Some users of this service may be missing.', 'warning')
         return render_template('service_users.html', 
                               result=result, 
                               prefill_service_name=prefill_service_name,
@@ -59,8 +62,29 @@ def export_service_users_csv(service_name):
     session['ldap_source'] = ldap_source
     session.modified = True
     
-    ldap_model = LDAPModel(source=ldap_source)
-    result = ldap_model.get_service_users(service_name)
-    if result and result['users']:
-        return util_export_service_users_csv(service_name, result['users'])
-    return redirect(url_for('service.service_users', source=ldap_source))
\ No newline at end of file
+    # format=csv|xlsx, gzip=1 pour un CSV compressé
+    export_format = request.args.get('format', 'csv')
+    compress = request.args.get('gzip') == '1'
+    
+    ldap_model = get_ldap_model(ldap_source)
+    # Les pages de résultats sont envoyées au fur et à mesure de leur réception
+    rows = peek_rows(ldap_model.iter_service_users(service_name))
+    if rows:
+        return util_export_service_users_csv(service_name, rows, export_format, compress)
+    return redirect(url_for('service.service_users', source=ldap_source))
+
+@service_bp.route('/export_service_users_pdf/<service_name>')
+@login_required
+def export_service_users_pdf(service_name):
+    # Get LDAP source with proper fallback sequence
+    ldap_source = request.args.get('source')
+    
+    # If not in query params, get from session with default fallback
+    if not ldap_source:
+        ldap_source = session.get('ldap_source', 'meta')
+    
+    ldap_model = get_ldap_model(ldap_source)
+    rows = peek_rows(ldap_model.iter_service_users(service_name))
+    if rows:
+        return util_export_service_users_pdf(service_name, rows)
+    return redirect(url_for('service.service_users', source=ldap_source))
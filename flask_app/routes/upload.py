@@ -1,6 +1,6 @@
-from flask import Blueprint, render_template, request, redirect, json, session
-from flask_app.utils.file_utils import validate_entries, apply_changes
-from flask_login import login_required  # Nouvel import depuis Flask-Login
+from flask import Blueprint, render_template, request, redirect, json, session, url_for, jsonify, abort, current_app
+from flask_app.utils.file_utils import run_validation_job, run_import_job
+from flask_login import login_required, current_user  # Nouvel import depuis Flask-Login
 from flask_app.models.ldap_config_manager import LDAPConfigManager
 
 # Load group DN options from JSON file
@@ -9,6 +9,24 @@ with open('flask_app/utils/group_dn_options.json', 'r') as f:
 
 upload_bp = Blueprint('upload', __name__)
 
+
+@upload_bp.record_once
+def register_jobs(state):
+    """Déclarer les jobs de validation et d'import auprès du job runner"""
+    state.app.job_runner.register('membership_validation', run_validation_job)
+    state.app.job_runner.register('membership_import', run_import_job)
+
+
+def _get_owned_job(job_id):
+    """Job de l'utilisateur courant, ou 404/403"""
+    job = current_app.job_runner.get(job_id)
+    if job is None:
+        abort(404)
+    if job['owner'] != current_user.get_id():
+        abort(403)
+    return job
+
+
 @upload_bp.route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload_file():
@@ -46,17 +64,14 @@ def upload_file():
             # Get the selected group DN structure from the form
             group_dn_structure = request.form['group_dn']
             
-            # Validate the CSV entries
-            valid_entries, invalid_entries = validate_entries(file_path, group_dn_structure)
+            # Validate the CSV entries in the background
+            job_id = current_app.job_runner.submit('membership_validation', {
+                'file_path': file_path,
+                'group_dn_structure': group_dn_structure,
+                'ldap_source': ldap_source
+            }, owner=current_user.get_id())
             
-            # Render the validation report
-            return render_template('report.html', 
-                                 valid_entries=valid_entries, 
-                                 invalid_entries=invalid_entries,
-                                 file_path=file_path,
-                                 group_dn_structure=group_dn_structure,
-                                 ldap_source=ldap_source,
-                                 ldap_name=ldap_name)
+            return redirect(url_for('upload.job_status', job_id=job_id))
     
     return render_template('upload.html', 
                           group_dn_options=group_dn_options,
@@ -77,23 +92,84 @@ def apply():
     session['ldap_source'] = ldap_source
     session.modified = True
     
-    # Get LDAP name for display purposes
-    config = LDAPConfigManager.get_config(ldap_source)
-    ldap_name = config.get('LDAP_name', 'META')
-    
     file_path = request.form['file_path']
     group_dn_structure = request.form['group_dn_structure']
 
-    # Validate the CSV entries again (for safety)
-    valid_entries, _ = validate_entries(file_path, group_dn_structure)
+    # Validate again and apply the changes in the background (batched by group, see utils/bulk_import.py)
+    job_id = current_app.job_runner.submit('membership_import', {
+        'file_path': file_path,
+        'group_dn_structure': group_dn_structure,
+        'ldap_source': ldap_source
+    }, owner=current_user.get_id())
+
+    return redirect(url_for('upload.job_status', job_id=job_id))
+
+
+@upload_bp.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+def job_status(job_id):
+    """Page de suivi d'un job (rafraîchie par /jobs/<job_id>/progress)"""
+    job = _get_owned_job(job_id)
+    ldap_source = job['params'].get('ldap_source', session.get('ldap_source', 'meta'))
+    config = LDAPConfigManager.get_config(ldap_source)
+    return render_template('job_status.html',
+                           job=job,
+                           ldap_source=ldap_source,
+                           ldap_name=config.get('LDAP_name', 'META'))
+
+
+@upload_bp.route('/jobs/<job_id>/progress', methods=['GET'])
+@login_required
+def job_progress(job_id):
+    """État et avancement d'un job (JSON)"""
+    job = _get_owned_job(job_id)
+    return jsonify({
+        'id': job['id'],
+        'type': job['type'],
+        'status': job['status'],
+        'progress_done': job['progress_done'],
+        'progress_total': job['progress_total'],
+        'error': job['error'],
+        'result_url': url_for('upload.job_result', job_id=job_id) if job['status'] == 'succeeded' else None
+    })
+
+
+@upload_bp.route('/jobs/<job_id>/result', methods=['GET'])
+@login_required
+def job_result(job_id):
+    """Résultat d'un job terminé: rapport de validation ou résultats de l'import"""
+    job = _get_owned_job(job_id)
+    if job['status'] != 'succeeded':
+        return redirect(url_for('upload.job_status', job_id=job_id))
+
+    params = job['params']
+    result = job['result']
+    ldap_source = params.get('ldap_source', 'meta')
+    config = LDAPConfigManager.get_config(ldap_source)
+    ldap_name = config.get('LDAP_name', 'META')
+
+    if job['type'] == 'user_onboarding':
+        return render_template('onboarding_results.html',
+                               job=job,
+                               dry_run=result['dry_run'],
+                               counts=result['counts'],
+                               outcomes=result['outcomes'],
+                               ldap_source=ldap_source,
+                               ldap_name=ldap_name)
 
-    # Apply the changes
-    success_count, failure_count, failures = apply_changes(valid_entries, group_dn_structure)
+    if job['type'] == 'membership_validation':
+        return render_template('report.html',
+                               valid_entries=result['valid_entries'],
+                               invalid_entries=result['invalid_entries'],
+                               file_path=params['file_path'],
+                               group_dn_structure=params['group_dn_structure'],
+                               ldap_source=ldap_source,
+                               ldap_name=ldap_name)
 
-    # Render the results
     return render_template('results.html',
-                         success_count=success_count,
-                         failure_count=failure_count,
-                         failures=failures,
-                         ldap_source=ldap_source,
-                         ldap_name=ldap_name)
\ No newline at end of file
+                           success_count=result['success_count'],
+                           failure_count=result['failure_count'],
+                           failures=result['failures'],
+                           outcomes=result['outcomes'],
+                           ldap_source=ldap_source,
+                           ldap_name=ldap_name)
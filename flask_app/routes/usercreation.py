@@ -1,14 +1,32 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, session
-from flask_app.models.ldap_model import LDAPModel
+import os
+import uuid
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, session, current_app
+from werkzeug.utils import secure_filename
+from flask_app.models.ldap_model import get_ldap_model
+from flask_app.routes.upload import _get_owned_job
+from flask_app.utils.file_utils import run_onboarding_job
+from flask_app.utils.export_utils import stream_users_export
 from flask_login import login_required, current_user  # Nouvel import depuis Flask-Login
 from flask_app.models.ldap_config_manager import LDAPConfigManager
 from flask_wtf import FlaskForm
 from wtforms import SelectField, StringField, HiddenField
 from wtforms.validators import DataRequired
-from ldap3 import Server, Connection, ALL, MODIFY_ADD, SUBTREE
+from ldap3 import Server, ALL, MODIFY_ADD, SUBTREE
 
 usercreation_bp = Blueprint('usercreation', __name__)
 
+# Colonnes du rapport d'onboarding téléchargeable
+ONBOARDING_EXPORT_COLUMNS = [('Row', 'row'), ('Status', 'status'), ('CN', 'cn'), ('Password', 'password'),
+                             ('Given Name', 'givenName'), ('Surname', 'sn'), ('Email', 'email'),
+                             ('User Type', 'user_type'), ('Groups Added', 'groups_added'),
+                             ('Groups Failed', 'groups_failed'), ('Error', 'error')]
+
+
+@usercreation_bp.record_once
+def register_jobs(state):
+    """Déclarer le job de création en masse auprès du job runner"""
+    state.app.job_runner.register('user_onboarding', run_onboarding_job)
+
 
 class UserCreationForm(FlaskForm):
     user_type = SelectField('User Type', validators=[DataRequired()], choices=[])
@@ -31,10 +49,7 @@ def fetch_user_types():
     session['ldap_source'] = ldap_source
     session.modified = True
     
-    # Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
-    
-    user_types = ldap_model.get_user_types_from_ldap('ou=tpl,ou=sync,o=copy')  # Adjust the DN as needed
+    user_types = current_app.template_catalog.get_user_types(ldap_source)
     return jsonify(user_types)
 
 @usercreation_bp.route('/user_creation', methods=['GET', 'POST'])
@@ -54,7 +69,7 @@ def create_user():
     session.modified = True
     
     # Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
     # Get LDAP name for display purposes
     config = LDAPConfigManager.get_config(ldap_source)
@@ -64,7 +79,7 @@ def create_user():
     form = UserCreationForm()
     
     # Récupérer les types d'utilisateurs pour le formulaire
-    user_types = ldap_model.get_user_types_from_ldap('ou=tpl,ou=sync,o=copy')
+    user_types = current_app.template_catalog.get_user_types(ldap_source)
     form.user_type.choices = [(ut['value'], ut['label']) for ut in user_types]
     
     # Variables pour préserver les valeurs du formulaire en cas d'erreur
@@ -110,95 +125,38 @@ def create_user():
             'manager': manager
         }
 
-        # Valider les champs obligatoires
-        if not given_name or not sn:
-            flash("Les champs Prénom et Nom sont obligatoires.", 'error')
-            return render_template('user_creation.html', form=form, form_data=form_data, 
-                                  ldap_source=ldap_source, ldap_name=ldap_name)
-        
-        # Valider l'email (obligatoire sauf si override)
-        if not email and not email_override:
-            flash("L'adresse email est obligatoire.", 'error')
-            return render_template('user_creation.html', form=form, form_data=form_data,
-                                  ldap_source=ldap_source, ldap_name=ldap_name)
-        
-        # Vérifier si un chef hiérarchique est requis pour ce type d'utilisateur
-        is_stag = user_type == "STAG" 
-        if is_stag and not manager and not manager_override:
-            flash("Un chef hiérarchique est obligatoire pour les stagiaires.", 'error')
-            return render_template('user_creation.html', form=form, form_data=form_data,
-                                  ldap_source=ldap_source, ldap_name=ldap_name)
-        
-        # Vérifier si le FavvNatNr est requis pour certains types d'utilisateurs
-        if (user_type == "BOODOCI" or user_type == "OCI") and not favvnatnr and not favvnatnr_override:
-            flash("Le numéro de registre national est obligatoire pour les utilisateurs de type OCI.", 'error')
+        # Valider les champs obligatoires (mêmes règles que l'import en masse)
+        error = ldap_model.validate_new_user(user_type, given_name, sn, email=email, manager=manager,
+                                             favvnatnr=favvnatnr, email_override=email_override,
+                                             manager_override=manager_override,
+                                             favvnatnr_override=favvnatnr_override)
+        if error:
+            flash(error, 'error')
             return render_template('user_creation.html', form=form, form_data=form_data,
                                   ldap_source=ldap_source, ldap_name=ldap_name)
+        is_stag = user_type == "STAG"
         
         # Obtenir les détails du modèle sélectionné
-        template_details = ldap_model.get_template_details(user_type)
+        template_details = current_app.template_catalog.get_template_details(ldap_source, user_type)
         # print(f"DEBUG - User type: {user_type}")
         # print(f"DEBUG - Template details from get_template_details: {template_details}")
         
         # Générer un CN unique pour le nouvel utilisateur
         cn = ldap_model.generate_unique_cn(given_name, sn)
 
-        # Définir les attributs LDAP en fonction du type d'utilisateur
-        ldap_attributes = {
-            'givenName': [given_name],
-            'sn': [sn],
-            'cn': [cn],
-            'fullName': [f"{sn} {given_name}"]
-        }
-
-        # Ajouter l'email s'il est fourni
-        if email:
-            ldap_attributes['mail'] = [email]
-
-        # Ajouter les attributs du template si disponibles
-        if template_details:
-            # Ajouter le titre
-            if template_details.get('title'):
-                ldap_attributes['title'] = [template_details['title']]
-    
-            # Ajouter la description
-            if template_details.get('description'):
-                ldap_attributes['description'] = [template_details['description']]
-    
-            # Ajouter l'unité organisationnelle
-            if template_details.get('ou'):
-                ldap_attributes['ou'] = [template_details['ou']]
-    
-            # Ajouter FavvExtDienstMgrDn
-            if template_details.get('FavvExtDienstMgrDn'):
-                ldap_attributes['FavvExtDienstMgrDn'] = [template_details['FavvExtDienstMgrDn']]
-    
-            # Ajouter FavvEmployeeType
-            if template_details.get('FavvEmployeeType'):
-                ldap_attributes['FavvEmployeeType'] = [template_details['FavvEmployeeType']]
-    
-            # Ajouter FavvEmployeeSubType
-            if template_details.get('FavvEmployeeSubType'):
-                ldap_attributes['FavvEmployeeSubType'] = [template_details['FavvEmployeeSubType']]
-
-        # Ajouter FavvNatNr pour les utilisateurs de type OCI ou BOODOCI (si fourni)
-        if (user_type == "BOODOCI" or user_type == "OCI") and favvnatnr:
-            normalized_favvnatnr = favvnatnr.replace(' ', '').replace('-', '')
-            ldap_attributes['FavvNatNr'] = [normalized_favvnatnr]
-            
-        # Ajouter le chef hiérarchique pour les stagiaires
+        # Obtenir le DN du manager pour l'attribut FavvHierarMgrDN (stagiaires)
+        manager_dn = None
         if is_stag and manager:
-            # Obtenir le DN du manager pour l'attribut FavvHierarMgrDN
-            manager_dn = None
-            if manager:
-                managers = ldap_model.get_managers()
-                for mgr in managers:
-                    if mgr['fullName'] == manager:
-                        manager_dn = mgr['dn']
-                        break
-                        
-                if manager_dn:
-                    ldap_attributes['FavvHierarMgrDN'] = [manager_dn]
+            managers = ldap_model.get_managers()
+            for mgr in managers:
+                if mgr['fullName'] == manager:
+                    manager_dn = mgr['dn']
+                    break
+
+        # Définir les attributs LDAP en fonction du type d'utilisateur et du template
+        ldap_attributes = ldap_model.build_new_user_attributes(cn, given_name, sn, email=email, user_type=user_type,
+                                                               template_details=template_details,
+                                                               favvnatnr=favvnatnr, manager_dn=manager_dn)
         # Récupérer le mot de passe prévisualisé (s'il existe)
         previewed_password = request.form.get('password')
         
@@ -259,24 +217,24 @@ def preview_user_details():
             return jsonify({'error': 'Given name, surname and user type are required'}), 400
         
         # Instantiate the LDAP model
-        ldap_model = LDAPModel(source=ldap_source)
+        ldap_model = get_ldap_model(ldap_source)
         
         # Generate the CN
         cn = ldap_model.generate_unique_cn(given_name, sn)
         
         # Check if either name is short (3 characters or less)
-        has_short_name = len(given_name) <= 3 or len(sn) <= 3
+        has_short_name = ldap_model._has_short_name({'givenName': given_name, 'sn': sn})
         
         # Generate password with short_name flag if needed
         password = ldap_model.generate_password_from_cn(cn, short_name=has_short_name)
                 
         # Get template details
-        template_details = ldap_model.get_template_details(user_type)
+        template_details = current_app.template_catalog.get_template_details(ldap_source, user_type)
         
         # Get service manager's fullName if FavvExtDienstMgrDn is present
         if template_details and template_details.get('FavvExtDienstMgrDn'):
             try:
-                conn = Connection(ldap_model.ldap_server, user=ldap_model.bind_dn, password=ldap_model.password, auto_bind=True)
+                conn = ldap_model._get_connection()
                 conn.search(template_details['FavvExtDienstMgrDn'], '(objectClass=*)', attributes=['fullName'])
                 
                 if conn.entries and conn.entries[0].fullName:
@@ -293,7 +251,7 @@ def preview_user_details():
         if template_details and 'groupMembership' in template_details and template_details['groupMembership']:
             groups_info = []
             try:
-                conn = Connection(ldap_model.ldap_server, user=ldap_model.bind_dn, password=ldap_model.password, auto_bind=True)
+                conn = ldap_model._get_connection()
                 
                 for group_dn in template_details['groupMembership']:
                     conn.search(group_dn, '(objectClass=*)', attributes=['cn'])
@@ -343,7 +301,7 @@ def check_name_exists():
         return jsonify({'status': 'error', 'message': 'Prénom et nom sont requis'}), 400
     
     # Créer une instance du modèle LDAP avec la source spécifiée
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
     exists, existing_dn = ldap_model.check_name_combination_exists(given_name, sn)
     
@@ -384,7 +342,7 @@ def check_favvnatnr_exists():
     normalized_favvnatnr = favvnatnr.replace(' ', '').replace('-', '')
     
     # Créer une instance du modèle LDAP avec la source spécifiée
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
     exists, existing_dn, fullname = ldap_model.check_favvnatnr_exists(normalized_favvnatnr)
     
@@ -397,4 +355,82 @@ def check_favvnatnr_exists():
         return jsonify({
             'status': 'ok',
             'message': f"Aucun utilisateur existant avec le numéro national '{favvnatnr}'."
-        })
\ No newline at end of file
+        })
+
+
+@usercreation_bp.route('/bulk_user_creation', methods=['GET', 'POST'])
+@login_required
+def bulk_user_creation():
+    """
+    Création en masse à partir d'un CSV de nouveaux arrivants (colonnes:
+    user_type, givenName, sn, email, manager, favvNatNr), exécutée en arrière-plan.
+    """
+    # Get LDAP source with proper fallback sequence
+    ldap_source = request.args.get('source')
+    if request.method == 'POST':
+        ldap_source = request.form.get('ldap_source', ldap_source)
+    
+    # If not in query or form params, get from session with default fallback
+    if not ldap_source:
+        ldap_source = session.get('ldap_source', 'meta')
+    
+    # Make sure session is updated with current source
+    session['ldap_source'] = ldap_source
+    session.modified = True
+    
+    # Get LDAP name for display purposes
+    config = LDAPConfigManager.get_config(ldap_source)
+    ldap_name = config.get('LDAP_name', 'META')
+    
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or file.filename == '':
+            flash("Veuillez choisir un fichier CSV.", 'error')
+            return redirect(request.url)
+        
+        # Save the uploaded file under a unique name
+        os.makedirs('flask_app/uploads', exist_ok=True)
+        file_path = f"flask_app/uploads/onboarding_{uuid.uuid4().hex}_{secure_filename(file.filename)}"
+        file.save(file_path)
+        
+        # Preview first unless the user asked to create the accounts directly
+        job_id = current_app.job_runner.submit('user_onboarding', {
+            'file_path': file_path,
+            'ldap_source': ldap_source,
+            'dry_run': request.form.get('dry_run') == 'true'
+        }, owner=current_user.get_id())
+        
+        return redirect(url_for('upload.job_status', job_id=job_id))
+    
+    return render_template('bulk_user_creation.html', ldap_source=ldap_source, ldap_name=ldap_name)
+
+
+@usercreation_bp.route('/bulk_user_creation/<job_id>/apply', methods=['POST'])
+@login_required
+def apply_bulk_user_creation(job_id):
+    """Créer les comptes d'un aperçu (le plan est recalculé: les CNs libres ont pu changer)"""
+    job = _get_owned_job(job_id)
+    params = job['params']
+    if job['type'] != 'user_onboarding' or not params.get('dry_run'):
+        return redirect(url_for('upload.job_status', job_id=job_id))
+    
+    new_job_id = current_app.job_runner.submit('user_onboarding', {
+        'file_path': params['file_path'],
+        'ldap_source': params.get('ldap_source', 'meta'),
+        'dry_run': False
+    }, owner=current_user.get_id())
+    
+    return redirect(url_for('upload.job_status', job_id=new_job_id))
+
+
+@usercreation_bp.route('/bulk_user_creation/<job_id>/export', methods=['GET'])
+@login_required
+def export_bulk_user_creation(job_id):
+    """Rapport de création en masse (CN et mot de passe de chaque compte) en CSV ou XLSX"""
+    job = _get_owned_job(job_id)
+    if job['type'] != 'user_onboarding' or job['status'] != 'succeeded':
+        return redirect(url_for('upload.job_status', job_id=job_id))
+    
+    export_format = request.args.get('format', 'csv')
+    return stream_users_export(f"onboarding_{job_id[:8]}", job['result']['outcomes'], ONBOARDING_EXPORT_COLUMNS,
+                               export_format=export_format, sheet_name='Onboarding')
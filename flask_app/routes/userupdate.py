@@ -1,5 +1,5 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, json, jsonify
-from flask_app.models.ldap_model import LDAPModel
+from flask_app.models.ldap_model import get_ldap_model
 from flask_login import login_required  # Nouvel import depuis Flask-Login
 from flask_app.models.ldap_config_manager import LDAPConfigManager
 from ldap3 import MODIFY_REPLACE, MODIFY_DELETE, MODIFY_ADD
@@ -32,7 +32,7 @@ def update_user_page():
     selected_user = None
 
     # Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
     # Get LDAP name for display purposes
     config = LDAPConfigManager.get_config(ldap_source)
@@ -82,7 +82,7 @@ def search_user():
             return redirect(url_for('userupdate.update_user_page', source=ldap_source))
         
         # Create LDAP model with the appropriate source
-        ldap_model = LDAPModel(source=ldap_source)
+        ldap_model = get_ldap_model(ldap_source)
         
         # Get LDAP name for display purposes
         config = LDAPConfigManager.get_config(ldap_source)
@@ -129,7 +129,7 @@ def select_user():
         return redirect(url_for('userupdate.update_user_page', source=ldap_source))
     
     # Create LDAP model with the appropriate source
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     
     # Get LDAP name for display purposes
     config = LDAPConfigManager.get_config(ldap_source)
@@ -250,7 +250,7 @@ def update_user():
     #         attributes['someMiscLDAPAttr'] = request.form.get('someMiscField')
 
     # --- Perform Update ---
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     change_reason = request.form.get('change_reason', f'Update via Web UI - Section: {update_section or "All"}') # Add section to reason
 
     # --- Construct options dictionary for LDAPUserCRUD.update_user ---
@@ -271,7 +271,7 @@ def update_user():
         options['change_reason'] = change_reason
 
     # --- Perform Update ---
-    ldap_model = LDAPModel(source=ldap_source)
+    ldap_model = get_ldap_model(ldap_source)
     success, message = ldap_model.update_user(
         user_dn=user_dn,
         attributes=attributes if attributes else None, # Pass None if no attributes changed
@@ -0,0 +1,156 @@
+# flask_app/services/dashboard_cache.py
+import threading
+import time
+from datetime import datetime
+from flask_app.models.ldap_model import get_ldap_model
+
+
+class DashboardStatsCache:
+    """
+    Cache des statistiques du tableau de bord, par source LDAP.
+
+    - Un instantané plus jeune que `ttl` est servi tel quel.
+    - Un instantané plus vieux que `ttl` mais plus jeune que `stale_ttl` est servi
+      immédiatement et recalculé en arrière-plan (stale-while-revalidate).
+    - Au-delà de `stale_ttl` (ou sans instantané), le calcul est fait pendant la requête,
+      une seule fois par clé même si plusieurs administrateurs ouvrent la page.
+    - Un thread de fond rafraîchit les instantanés consultés récemment, de sorte
+      que la charge sur l'annuaire est d'au plus un calcul par source et par `ttl`.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        self.ttl = 300
+        self.stale_ttl = 1800
+        self.refresh_interval = 30
+        self.idle_expiry = 3600
+        self._snapshots = {}
+        self._key_locks = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._refresher = None
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.ttl = app.config.get('DASHBOARD_CACHE_TTL', self.ttl)
+        self.stale_ttl = max(self.ttl, app.config.get('DASHBOARD_CACHE_STALE_TTL', self.stale_ttl))
+        self.refresh_interval = app.config.get('DASHBOARD_CACHE_REFRESH_INTERVAL', self.refresh_interval)
+
+        # Register with app context
+        app.dashboard_cache = self
+
+    def get_stats(self, source, inactive_months=3, disabled_user_type=None):
+        """
+        Retourne (stats, computed_at) pour la source demandée.
+        """
+        key = (source, inactive_months, disabled_user_type)
+        self._ensure_refresher()
+
+        now = time.time()
+        snapshot = self._snapshots.get(key)
+        if snapshot:
+            snapshot['last_access'] = now
+            age = now - snapshot['computed_at']
+            if age < self.ttl:
+                return snapshot['stats'], snapshot['computed_at']
+            if age < self.stale_ttl:
+                self._refresh_async(key)
+                return snapshot['stats'], snapshot['computed_at']
+
+        try:
+            snapshot = self._refresh(key)
+        except Exception as e:
+            # Garder l'instantané précédent, même trop vieux, plutôt que des compteurs faux
+            print(f"Erreur lors du calcul des statistiques {key}: {str(e)}")
+            if snapshot is None:
+                raise
+        return snapshot['stats'], snapshot['computed_at']
+
+    def invalidate(self, source=None):
+        with self._lock:
+            for key in list(self._snapshots):
+                if source is None or key[0] == source:
+                    del self._snapshots[key]
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _refresh(self, key):
+        """
+        Recalcule l'instantané d'une clé (un seul calcul à la fois par clé).
+
+        En cas d'erreur LDAP l'exception est propagée et l'instantané précédent est conservé.
+        """
+        started = time.time()
+        with self._key_lock(key):
+            # Un autre thread a pu terminer le calcul pendant l'attente du verrou
+            snapshot = self._snapshots.get(key)
+            if snapshot and snapshot['computed_at'] >= started:
+                return snapshot
+
+            source, inactive_months, disabled_user_type = key
+            ldap_model = get_ldap_model(source)
+            stats = ldap_model.get_dashboard_stats(inactive_months=inactive_months,
+                                                   disabled_user_type=disabled_user_type)
+            computed_at = time.time()
+            snapshot = {
+                'stats': stats,
+                'computed_at': computed_at,
+                'last_access': snapshot['last_access'] if snapshot else computed_at
+            }
+            self._snapshots[key] = snapshot
+            return snapshot
+
+    def _refresh_async(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._refresh(key)
+            except Exception as e:
+                print(f"Erreur lors du rafraîchissement des statistiques {key}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name='dashboard-stats-refresh', daemon=True).start()
+
+    def _ensure_refresher(self):
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop,
+                                               name='dashboard-stats-refresher', daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        """
+        Rafraîchit en tâche de fond les instantanés arrivant à expiration.
+        Les clés non consultées depuis `idle_expiry` secondes sont abandonnées.
+        """
+        while True:
+            time.sleep(self.refresh_interval)
+            now = time.time()
+            for key, snapshot in list(self._snapshots.items()):
+                if now - snapshot['last_access'] > self.idle_expiry:
+                    with self._lock:
+                        self._snapshots.pop(key, None)
+                    continue
+                # Rafraîchir un peu avant l'expiration pour que les requêtes trouvent un instantané frais
+                if now - snapshot['computed_at'] >= self.ttl - self.refresh_interval:
+                    try:
+                        self._refresh(key)
+                    except Exception as e:
+                        print(f"Erreur lors du rafraîchissement des statistiques {key}: {str(e)}")
+
+    @staticmethod
+    def format_timestamp(timestamp):
+        return datetime.fromtimestamp(timestamp).strftime('%H:%M:%S') if timestamp else ''
@@ -0,0 +1,64 @@
+# flask_app/services/directory_index_service.py
+import os
+from flask_app.models.ldap_config_manager import LDAPConfigManager
+from flask_app.models.ldap.indexes import DuplicateIndex, FullNameIndex
+from flask_app.models.ldap.mirror import DirectoryMirror
+
+
+class DirectoryIndexService:
+    """
+    Démarre les index en mémoire de l'annuaire pour les sources qui les activent.
+
+    Chaque index est activé par un drapeau de la configuration LDAP de la source
+    (ex.: 'fullname_index_enabled', 'duplicate_index_enabled'). Les intervalles de synchronisation
+    se règlent avec 'index_sync_interval' et 'index_full_rebuild_interval'.
+
+    Le miroir local de l'annuaire ('directory_mirror_enabled') est démarré de la
+    même façon; ses fichiers SQLite sont dans DIRECTORY_MIRROR_DIR
+    (par défaut <instance>/mirror).
+    """
+    index_classes = [FullNameIndex, DuplicateIndex, DirectoryMirror]
+
+    def __init__(self, app=None):
+        self.app = app
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        DirectoryMirror.db_dir = app.config.get('DIRECTORY_MIRROR_DIR', os.path.join(app.instance_path, 'mirror'))
+        if app.config.get('DIRECTORY_INDEXES_ENABLED', True):
+            for source in LDAPConfigManager.get_available_configs():
+                self.start_source(source)
+
+        # Register with app context
+        app.directory_indexes = self
+
+    def start_source(self, source):
+        config = LDAPConfigManager.get_config(source)
+        options = {
+            'sync_interval': config.get('index_sync_interval', 60),
+            'full_rebuild_interval': config.get('index_full_rebuild_interval', 21600)
+        }
+        for index_class in self.index_classes:
+            if config.get(index_class.config_flag):
+                try:
+                    index_class.start(source, **options)
+                except Exception as e:
+                    print(f"Impossible de démarrer {index_class.__name__} pour {source}: {str(e)}")
+
+    def status(self):
+        """
+        État des index par classe et par source (prêt, dernière synchronisation).
+        """
+        return {
+            index_class.__name__: {
+                source: {
+                    'ready': index.ready,
+                    'last_full_load': index.last_full_load,
+                    'last_sync': index.last_sync
+                }
+                for source, index in (index_class.registry or {}).items()
+            }
+            for index_class in self.index_classes
+        }
@@ -0,0 +1,225 @@
+# flask_app/services/job_runner.py
+import json
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+
+class JobRunner:
+    """
+    Exécution en arrière-plan des traitements longs (validation et import CSV, ...).
+
+    - les jobs sont enregistrés dans une table SQLite (JOB_DB_PATH, par défaut
+      <instance>/jobs.sqlite3), ce qui permet de suivre leur état depuis n'importe
+      quelle requête et de retrouver les résultats après un redémarrage;
+    - JOB_WORKERS threads locaux exécutent les jobs en file;
+    - un handler reçoit (params, progress) et renvoie un résultat sérialisable en JSON;
+      progress(done, total) met à jour l'avancement affiché;
+    - au démarrage, les jobs restés en file sont repris; un job 'running' dont le
+      processus a disparu est marqué 'failed' (un import à moitié appliqué n'est
+      pas relancé automatiquement).
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        self.db_path = None
+        self.workers = 2
+        self.retention = 7 * 24 * 3600
+        self.handlers = {}
+        self._queue = queue.Queue()
+        self._threads = []
+        # Jobs repris avant la déclaration de leur handler, par type
+        self._deferred = {}
+        self._lock = threading.Lock()
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        os.makedirs(app.instance_path, exist_ok=True)
+        self.db_path = app.config.get('JOB_DB_PATH', os.path.join(app.instance_path, 'jobs.sqlite3'))
+        self.workers = app.config.get('JOB_WORKERS', self.workers)
+        self.retention = app.config.get('JOB_RETENTION', self.retention)
+        self._init_db()
+        # Reprendre tout de suite les jobs restés en file avant le redémarrage
+        self._ensure_workers()
+
+        # Register with app context
+        app.job_runner = self
+
+    # --- Stockage ---
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    owner TEXT,
+                    params TEXT,
+                    result TEXT,
+                    error TEXT,
+                    runner TEXT,
+                    progress_done INTEGER DEFAULT 0,
+                    progress_total INTEGER DEFAULT 0,
+                    created_at REAL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            ''')
+            # Un job 'running' dont le processus n'existe plus a été interrompu par un arrêt
+            for row in conn.execute("SELECT id, runner FROM jobs WHERE status = 'running'").fetchall():
+                if not self._runner_alive(row['runner']):
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = 'Interrupted by application restart', "
+                        "finished_at = ? WHERE id = ?",
+                        (time.time(), row['id'])
+                    )
+            conn.execute('DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?',
+                         (time.time() - self.retention,))
+
+    @staticmethod
+    def _runner_name():
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @staticmethod
+    def _runner_alive(runner):
+        host, _, pid = (runner or '').rpartition(':')
+        if host != socket.gethostname() or not pid.isdigit():
+            return False
+        if int(pid) == os.getpid():
+            return False
+        try:
+            os.kill(int(pid), 0)
+            return True
+        except OSError:
+            return False
+
+    def _update(self, job_id, **fields):
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        with self._connect() as conn:
+            conn.execute(f'UPDATE jobs SET {columns} WHERE id = ?', list(fields.values()) + [job_id])
+
+    # --- API ---
+
+    def register(self, job_type, handler):
+        """
+        Associer un type de job à sa fonction handler(params, progress).
+        """
+        with self._lock:
+            self.handlers[job_type] = handler
+            deferred = self._deferred.pop(job_type, [])
+        for job_id in deferred:
+            self._queue.put(job_id)
+
+    def submit(self, job_type, params, owner=None):
+        """
+        Mettre un job en file et retourner immédiatement son identifiant.
+        """
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        self._ensure_workers()
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, type, status, owner, params, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, job_type, 'queued', owner, json.dumps(params), time.time())
+            )
+        self._queue.put(job_id)
+        return job_id
+
+    def get(self, job_id):
+        """
+        État d'un job (dict) ou None s'il n'existe pas.
+        """
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params']) if job['params'] else {}
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    # --- Exécution ---
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            if self._threads:
+                return
+            # Reprendre les jobs restés en file avant un redémarrage
+            with self._connect() as conn:
+                pending = [row['id'] for row in conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at")]
+            for job_id in pending:
+                self._queue.put(job_id)
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._execute(job_id)
+            except Exception as e:
+                print(f"Erreur du job runner pour {job_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _execute(self, job_id):
+        job = self.get(job_id)
+        if job is None or job['status'] != 'queued':
+            return
+        with self._lock:
+            if job['type'] not in self.handlers:
+                # Job repris au démarrage avant que les blueprints déclarent leurs handlers
+                self._deferred.setdefault(job['type'], []).append(job_id)
+                return
+
+        # Réserver le job (un autre worker ou processus a pu le prendre entre-temps)
+        with self._connect() as conn:
+            claimed = conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, runner = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), self._runner_name(), job_id)
+            ).rowcount
+        if not claimed:
+            return
+        job = self.get(job_id)
+        handler = self.handlers[job['type']]
+
+        last_update = [0]
+
+        def progress(done, total):
+            # Limiter les écritures: au plus une mise à jour par seconde, plus la dernière
+            now = time.time()
+            if done >= total or now - last_update[0] >= 1:
+                last_update[0] = now
+                self._update(job_id, progress_done=done, progress_total=total)
+
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    result = handler(job['params'], progress)
+            else:
+                result = handler(job['params'], progress)
+            self._update(job_id, status='succeeded', result=json.dumps(result, default=str),
+                         finished_at=time.time())
+        except Exception as e:
+            print(f"Erreur dans le job {job_id} ({job['type']}): {str(e)}")
+            print(traceback.format_exc())
+            self._update(job_id, status='failed', error=str(e), finished_at=time.time())
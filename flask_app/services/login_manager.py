@@ -1,7 +1,7 @@
 from flask_login import LoginManager, current_user
 from flask import g, session, flash, redirect, url_for, request
 from flask_app.models.user_model import User
-from flask_app.models.ldap_model import LDAPModel
+from flask_app.models.ldap_model import get_ldap_model
 import functools
 
 login_manager = LoginManager()
@@ -21,11 +21,9 @@ def init_login_manager(app):
             return None
         
         # Store user in g for easy access
-        if 'user_data' in session:
-            user_data = session['user_data']
+        if 'user_profile' in session:
             ldap_source = session.get('ldap_source', 'meta')
-            user = User.from_ldap_data(username, user_data, ldap_source)
-            return user
+            return User.from_profile(username, session['user_profile'], ldap_source)
         
         return None
     
@@ -48,74 +46,26 @@ def authenticate_user(username, password, ldap_source='meta'):
     """Authenticate a user against LDAP and create User object"""
     try:
         # Create LDAP model for the specified source
-        ldap_model = LDAPModel(source=ldap_source)
+        ldap_model = get_ldap_model(ldap_source)
         
-        # Authenticate against LDAP
-        conn = ldap_model.authenticate(username, password)
-        if not conn:
+        # Bind as the user, then read the session attributes and role groups in one pass
+        user_data = ldap_model.login(username, password)
+        if not user_data:
             return None
         
-        # Check for role-specific group memberships
-        is_admin_member = False
-        is_reader_member = False
-        is_oci_admin_member = False
-        is_stag_admin_member = False
-        
-        # Get group DNs from LDAP model or config
-        admin_group_dn = ldap_model.admin_group_dn
-        reader_group_dn = ldap_model.reader_group_dn
-        oci_admin_group_dn = ldap_model.oci_admin_group_dn  # You'll need to add these
-        # stag_admin_group_dn = ldap_model.stag_admin_group_dn  # properties to LDAPModel
-        
-        # Check admin group membership
-        if admin_group_dn:
-            conn.search(admin_group_dn, f'(member={conn.user})', search_scope='BASE')
-            if conn.entries:
-                is_admin_member = True
-        
-        # Check reader group membership
-        if reader_group_dn:
-            conn.search(reader_group_dn, f'(member={conn.user})', search_scope='BASE')
-            if conn.entries:
-                is_reader_member = True
-        
-        # Check OCI admin group membership
-        if oci_admin_group_dn:
-            conn.search(oci_admin_group_dn, f'(member={conn.user})', search_scope='BASE')
-            if conn.entries:
-                is_oci_admin_member = True
-        
-        # Get user details
-        options = {
-            'search_type': 'cn',
-            'container': 'active',
-            'simplified': True 
-        }
-        user_data = ldap_model.get_user(username, options)
-        
+        # Create user
+        user = User.from_ldap_data(username, user_data, ldap_source)
         
-        if not user_data:
-            return None
-            
-        # Add group membership information
-        user_data['is_admin_member'] = is_admin_member
-        user_data['is_reader_member'] = is_reader_member
-        user_data['is_oci_admin_member'] = is_oci_admin_member
-        user_data['is_stag_admin_member'] = is_stag_admin_member
-        user_data['admin_group_dn'] = admin_group_dn
-        user_data['reader_group_dn'] = reader_group_dn
-        user_data['oci_admin_group_dn'] = oci_admin_group_dn
-        # user_data['stag_admin_group_dn'] = stag_admin_group_dn
+        # New session id for the authenticated user (see session_store.py)
+        if hasattr(session, 'regenerate'):
+            session.regenerate()
         
-        # Store user data in session for later retrieval
-        session['user_data'] = user_data
+        # Store the minimal profile in session for later retrieval
+        session['user_profile'] = user.to_profile()
         session['ldap_source'] = ldap_source
         
-        # Create and return user
-        user = User.from_ldap_data(username, user_data, ldap_source)
-        
         return user
     
     except Exception as e:
         print(f"Authentication error: {str(e)}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,179 @@
+# flask_app/services/session_store.py
+import os
+import secrets
+import sqlite3
+import time
+from datetime import timedelta
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """
+    Session dont le contenu reste côté serveur; le cookie ne porte que l'identifiant.
+    """
+
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.expires_at = expires_at
+        self.previous_sid = None
+
+    def regenerate(self):
+        """
+        Changer d'identifiant en gardant le contenu (au login, contre la fixation de session).
+        """
+        if not self.new and self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = SQLiteSessionInterface.new_sid()
+        self.new = True
+        self.modified = True
+
+
+class SQLiteSessionInterface(SessionInterface):
+    """
+    Stockage des sessions dans une table SQLite (SESSION_DB_PATH, par défaut
+    <instance>/sessions.sqlite3), indexée par identifiant de session.
+
+    - le cookie ne contient qu'un identifiant aléatoire: plus de contenu signé à
+      sérialiser et vérifier à chaque requête, ni de limite de taille de cookie
+    - chaque session expire après PERMANENT_SESSION_LIFETIME si elle est permanente,
+      sinon après SESSION_STORE_TTL secondes sans écriture
+    - une session non modifiée n'est réécrite que pour prolonger son expiration,
+      au plus une fois toutes les SESSION_REFRESH_INTERVAL secondes
+    - les sessions expirées sont purgées au démarrage puis au plus une fois par heure
+    """
+    serializer = TaggedJSONSerializer()
+    session_class = ServerSession
+
+    def __init__(self, app=None):
+        self.app = app
+        self.db_path = None
+        self.ttl = 12 * 3600
+        self.refresh_interval = 300
+        self.purge_interval = 3600
+        self._last_purge = 0
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        os.makedirs(app.instance_path, exist_ok=True)
+        self.db_path = app.config.get('SESSION_DB_PATH', os.path.join(app.instance_path, 'sessions.sqlite3'))
+        self.ttl = app.config.get('SESSION_STORE_TTL', self.ttl)
+        self.refresh_interval = app.config.get('SESSION_REFRESH_INTERVAL', self.refresh_interval)
+        self._init_db()
+
+        app.session_interface = self
+        # Register with app context
+        app.session_store = self
+
+    @staticmethod
+    def new_sid():
+        return secrets.token_urlsafe(32)
+
+    # --- Stockage ---
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)')
+        self.purge_expired()
+
+    def purge_expired(self):
+        """
+        Supprimer les sessions expirées. Retourne le nombre de sessions supprimées.
+        """
+        self._last_purge = time.time()
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM sessions WHERE expires_at <= ?', (self._last_purge,)).rowcount
+
+    def _lifetime(self, app, session):
+        if session.permanent:
+            lifetime = app.permanent_session_lifetime
+            return lifetime.total_seconds() if isinstance(lifetime, timedelta) else lifetime
+        return self.ttl
+
+    # --- SessionInterface ---
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute('SELECT data, expires_at FROM sessions WHERE id = ?', (sid,)).fetchone()
+                if row and row[1] > time.time():
+                    return self.session_class(self.serializer.loads(row[0]), sid=sid, expires_at=row[1])
+            except Exception as e:
+                print(f"Erreur lors de la lecture de la session: {str(e)}")
+        return self.session_class(sid=self.new_sid(), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        now = time.time()
+
+        try:
+            with self._connect() as conn:
+                if session.previous_sid:
+                    conn.execute('DELETE FROM sessions WHERE id = ?', (session.previous_sid,))
+                    session.previous_sid = None
+
+                if not session:
+                    # Session vidée (logout): supprimer l'entrée et le cookie
+                    if not session.new:
+                        conn.execute('DELETE FROM sessions WHERE id = ?', (session.sid,))
+                        response.delete_cookie(name, domain=domain, path=path,
+                                               secure=self.get_cookie_secure(app),
+                                               httponly=self.get_cookie_httponly(app),
+                                               samesite=self.get_cookie_samesite(app))
+                    return
+
+                lifetime = self._lifetime(app, session)
+                # Prolonger une session inchangée seulement si son expiration date un peu
+                stale = session.expires_at is None or session.expires_at - now < lifetime - self.refresh_interval
+                if not (session.modified or session.new or stale):
+                    return
+
+                session.expires_at = now + lifetime
+                conn.execute(
+                    'INSERT OR REPLACE INTO sessions (id, data, expires_at) VALUES (?, ?, ?)',
+                    (session.sid, self.serializer.dumps(dict(session)), session.expires_at)
+                )
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement de la session: {str(e)}")
+            return
+
+        if now - self._last_purge >= self.purge_interval:
+            self.purge_expired()
+
+        if session.new or session.permanent:
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+        response.vary.add('Cookie')
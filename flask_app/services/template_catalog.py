@@ -0,0 +1,152 @@
+# flask_app/services/template_catalog.py
+import copy
+import threading
+import time
+from flask_app.models.ldap_config_manager import LDAPConfigManager
+from flask_app.models.ldap_model import get_ldap_model
+
+
+class TemplateCatalogService:
+    """
+    Catalogue en mémoire des templates de création d'utilisateurs, par source LDAP.
+
+    - chargé au démarrage en arrière-plan (une recherche paginée par source), puis
+      à la première demande pour une source pas encore chargée
+    - un thread de fond compare toutes les `check_interval` secondes la signature
+      des templates (nombre et modifyTimestamp le plus récent) et recharge le
+      catalogue si elle a changé, ou au plus tard après `ttl` secondes
+    - le formulaire de création, l'aperçu et l'import en masse lisent le catalogue
+      sans interroger l'annuaire; un template absent du catalogue est lu dans LDAP
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        self.ttl = 3600
+        self.check_interval = 60
+        self._catalogs = {}
+        self._source_locks = {}
+        self._lock = threading.Lock()
+        self._refresher = None
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.ttl = app.config.get('TEMPLATE_CATALOG_TTL', self.ttl)
+        self.check_interval = app.config.get('TEMPLATE_CATALOG_CHECK_INTERVAL', self.check_interval)
+        if app.config.get('TEMPLATE_CATALOG_PRELOAD', True):
+            threading.Thread(target=self._preload, name='template-catalog-preload', daemon=True).start()
+
+        # Register with app context
+        app.template_catalog = self
+
+    # --- API ---
+
+    def get_user_types(self, source):
+        """
+        Types d'utilisateurs (templates avec description), au format de get_user_types_from_ldap.
+        """
+        catalog = self._catalog(source)
+        if catalog is None:
+            ldap_model = get_ldap_model(source)
+            return ldap_model.get_user_types_from_ldap(ldap_model.template_dn)
+        return copy.deepcopy(catalog['user_types'])
+
+    def get_template_details(self, source, template_cn):
+        """
+        Détails d'un template, au format de get_template_details (copie modifiable).
+        """
+        if not template_cn:
+            return None
+        catalog = self._catalog(source)
+        details = catalog['templates'].get(str(template_cn).lower()) if catalog else None
+        if details is None:
+            # Template créé depuis le dernier chargement, ou sans objectClass=template
+            return get_ldap_model(source).get_template_details(template_cn)
+        return copy.deepcopy(details)
+
+    def invalidate(self, source=None):
+        with self._lock:
+            for key in list(self._catalogs):
+                if source is None or key == source:
+                    del self._catalogs[key]
+
+    def status(self):
+        return {
+            source: {
+                'templates': len(catalog['templates']),
+                'loaded_at': catalog['loaded_at'],
+                'checked_at': catalog['checked_at']
+            }
+            for source, catalog in list(self._catalogs.items())
+        }
+
+    # --- Chargement ---
+
+    def _source_lock(self, source):
+        with self._lock:
+            return self._source_locks.setdefault(source, threading.Lock())
+
+    def _catalog(self, source):
+        # Nom de source normalisé (les sources inconnues retombent sur la source par défaut)
+        source = get_ldap_model(source).source
+        self._ensure_refresher()
+        catalog = self._catalogs.get(source)
+        if catalog is not None:
+            return catalog
+        try:
+            return self._load(source)
+        except Exception as e:
+            print(f"Erreur lors du chargement du catalogue de templates ({source}): {str(e)}")
+            return None
+
+    def _load(self, source):
+        """
+        Charger le catalogue d'une source (un seul chargement à la fois par source).
+        """
+        started = time.time()
+        with self._source_lock(source):
+            catalog = self._catalogs.get(source)
+            if catalog is not None and catalog['loaded_at'] >= started:
+                return catalog
+            data = get_ldap_model(source).get_template_catalog()
+            now = time.time()
+            catalog = dict(data, loaded_at=now, checked_at=now)
+            self._catalogs[source] = catalog
+            print(f"Catalogue de templates chargé pour {source}: {len(catalog['templates'])} templates")
+            return catalog
+
+    def _preload(self):
+        for source in LDAPConfigManager.get_available_configs():
+            try:
+                self._load(source)
+            except Exception as e:
+                print(f"Impossible de charger le catalogue de templates pour {source}: {str(e)}")
+        self._ensure_refresher()
+
+    def _ensure_refresher(self):
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop,
+                                               name='template-catalog-refresher', daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.check_interval)
+            for source, catalog in list(self._catalogs.items()):
+                try:
+                    now = time.time()
+                    if now - catalog['loaded_at'] >= self.ttl:
+                        self._load(source)
+                        continue
+                    signature = get_ldap_model(source).get_template_signature()
+                    if tuple(signature) != tuple(catalog['signature']):
+                        self._load(source)
+                    else:
+                        catalog['checked_at'] = now
+                except Exception as e:
+                    print(f"Erreur lors de la vérification du catalogue de templates ({source}): {str(e)}")
@@ -36,6 +36,50 @@ $(document).ready(function() {
     // ===== AMÉLIORATION 4: Encapsuler les fonctionnalités de tri et filtrage =====
     initializeFilterAndSort();
     
+    // ===== AMÉLIORATION 5: Charger les groupes et rôles à la demande =====
+    loadMemberships(currentLdapSource);
+    
+    // Fonction de chargement des groupes et rôles de l'utilisateur affiché
+    function loadMemberships(source) {
+        const groupsContainer = $('#groups');
+        const rolesContainer = $('#roles');
+        const url = groupsContainer.data('memberships-url');
+        if (!url) {
+            return;
+        }
+        
+        $.getJSON(url, function(data) {
+            groupsContainer.empty();
+            if (data.groupMembership && data.groupMembership.length > 0) {
+                $.each(data.groupMembership, function(index, group) {
+                    const link = $('<a>')
+                        .addClass('text-white text-decoration-none')
+                        .attr('href', window.groupUsersUrl + '?group_name=' + encodeURIComponent(group.cn) + '&source=' + encodeURIComponent(source))
+                        .text(group.cn);
+                    groupsContainer.append($('<div>').addClass('badge bg-info me-2 mb-2 p-2 group-badge').append(link));
+                });
+            } else {
+                groupsContainer.append($('<div>').addClass('text-muted').text('No group memberships found.'));
+            }
+            
+            rolesContainer.empty();
+            if (data.nrfMemberOf && data.nrfMemberOf.length > 0) {
+                $.each(data.nrfMemberOf, function(index, role) {
+                    const link = $('<a>')
+                        .addClass('text-white text-decoration-none')
+                        .attr('href', window.roleUsersUrl + '?role_cn=' + encodeURIComponent(role.cn) + '&source=' + encodeURIComponent(source))
+                        .text(role.cn + ' (' + role.category + ')');
+                    rolesContainer.append($('<div>').addClass('badge bg-secondary me-2 mb-2 p-2 role-badge').append(link));
+                });
+            } else {
+                rolesContainer.append($('<div>').addClass('text-muted').text('No assigned roles found.'));
+            }
+        }).fail(function() {
+            groupsContainer.html('<div class="text-danger">Unable to load group memberships.</div>');
+            rolesContainer.html('<div class="text-danger">Unable to load assigned roles.</div>');
+        });
+    }
+    
     // Fonctions d'amélioration des liens (fallback)
     function enhanceLinksWithLdapSource(source) {
         $('a[href]').each(function() {
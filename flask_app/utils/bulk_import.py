@@ -0,0 +1,199 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ldap3 import MODIFY_ADD
+
+# Codes de résultat LDAP indiquant un serveur surchargé: ralentir puis réessayer
+THROTTLE_CODES = {
+    3,   # timeLimitExceeded
+    11,  # adminLimitExceeded
+    51,  # busy
+    52,  # unavailable
+    53   # unwillingToPerform
+}
+# La valeur est déjà présente: l'ajout est considéré comme fait
+ALREADY_EXISTS_CODE = 20
+
+
+class AdaptiveThrottle:
+    """
+    Délai partagé entre les workers, ajusté selon les réponses du serveur.
+
+    Chaque réponse de surcharge double le délai (au plus max_delay secondes);
+    chaque succès le divise par deux, jusqu'à revenir à zéro.
+    """
+
+    def __init__(self, initial_delay=0.5, max_delay=30):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.delay = 0
+        self.backoffs = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        delay = self.delay
+        if delay:
+            time.sleep(delay)
+
+    def success(self):
+        with self._lock:
+            if self.delay:
+                self.delay = self.delay / 2 if self.delay / 2 >= self.initial_delay / 4 else 0
+
+    def backoff(self):
+        with self._lock:
+            self.backoffs += 1
+            self.delay = min(self.max_delay, max(self.initial_delay, self.delay * 2))
+
+
+class BulkMembershipImporter:
+    """
+    Ajout en masse d'utilisateurs dans des groupes.
+
+    - côté groupe: un MODIFY_ADD multi-valeurs de 'member' par lot de chunk_size utilisateurs
+    - côté utilisateur: un MODIFY_ADD de tous ses nouveaux groupes dans 'groupMembership'
+    - les opérations sont réparties sur max_workers connexions du pool de la source
+    - un lot refusé (valeur déjà présente, entrée absente, ...) est coupé en deux
+      jusqu'à isoler les valeurs en cause, afin d'obtenir un résultat par ligne
+    """
+
+    def __init__(self, ldap_model, chunk_size=100, max_workers=4, max_retries=5, max_delay=30):
+        self.ldap_model = ldap_model
+        self.chunk_size = max(1, chunk_size)
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.throttle = AdaptiveThrottle(max_delay=max_delay)
+        self._lock = threading.Lock()
+        self._done = 0
+        self._total = 0
+        self._progress_callback = None
+
+    def _modify(self, dn, attribute, values):
+        """
+        Un MODIFY_ADD, réessayé tant que le serveur répond qu'il est surchargé.
+
+        Returns:
+            tuple: (code de résultat, description)
+        """
+        attempt = 0
+        while True:
+            self.throttle.wait()
+            conn = None
+            try:
+                conn = self.ldap_model._get_connection()
+                conn.modify(dn, {attribute: [(MODIFY_ADD, list(values))]})
+                code = conn.result.get('result')
+                description = conn.result.get('description') or conn.result.get('message') or ''
+                conn.unbind()
+            except Exception as e:
+                # Connexion inutilisable: la retirer du pool et réessayer
+                if conn is not None:
+                    conn.release(discard=True)
+                code, description = 52, str(e)
+
+            if code in THROTTLE_CODES and attempt < self.max_retries:
+                attempt += 1
+                self.throttle.backoff()
+                continue
+            if code == 0:
+                self.throttle.success()
+            return code, description
+
+    def _add_values(self, dn, attribute, values):
+        """
+        Ajouter des valeurs à un attribut, en coupant le lot en deux en cas de refus.
+
+        Returns:
+            dict: {valeur: (statut, erreur)} avec statut 'added', 'already_present' ou 'failed'
+        """
+        code, description = self._modify(dn, attribute, values)
+        if code == 0:
+            return {value: ('added', None) for value in values}
+        if len(values) == 1:
+            if code == ALREADY_EXISTS_CODE:
+                return {values[0]: ('already_present', None)}
+            return {values[0]: ('failed', f"{description} (code {code})")}
+        if code in THROTTLE_CODES:
+            # Serveur toujours surchargé après les essais: inutile de multiplier les requêtes
+            return {value: ('failed', f"{description} (code {code})") for value in values}
+        middle = len(values) // 2
+        outcome = self._add_values(dn, attribute, values[:middle])
+        outcome.update(self._add_values(dn, attribute, values[middle:]))
+        return outcome
+
+    def _run_task(self, dn, attribute, values):
+        outcome = self._add_values(dn, attribute, values)
+        with self._lock:
+            self._done += 1
+            done, total = self._done, self._total
+        if self._progress_callback:
+            try:
+                self._progress_callback(done, total)
+            except Exception as e:
+                print(f"Erreur dans le suivi de progression: {str(e)}")
+        return dn, outcome
+
+    def run(self, rows, progress_callback=None):
+        """
+        Appliquer les lignes d'import.
+
+        Args:
+            rows (list): dicts avec 'user_dn' et 'group_dn' (les autres clés sont recopiées dans le résultat)
+            progress_callback (callable, optional): appelé avec (opérations terminées, total)
+
+        Returns:
+            list: une entrée par ligne, avec 'status' ('added', 'already_member' ou 'failed') et 'error'
+        """
+        normalize = self.ldap_model._normalize_dn
+        members_by_group = {}
+        groups_by_user = {}
+        for row in rows:
+            group_key, user_key = normalize(row['group_dn']), normalize(row['user_dn'])
+            members = members_by_group.setdefault(group_key, (row['group_dn'], {}))[1]
+            members.setdefault(user_key, row['user_dn'])
+            groups = groups_by_user.setdefault(user_key, (row['user_dn'], {}))[1]
+            groups.setdefault(group_key, row['group_dn'])
+
+        tasks = []
+        for group_dn, members in members_by_group.values():
+            for chunk in self.ldap_model._chunks(list(members.values()), self.chunk_size):
+                tasks.append((group_dn, 'member', chunk))
+        for user_dn, groups in groups_by_user.values():
+            for chunk in self.ldap_model._chunks(list(groups.values()), self.chunk_size):
+                tasks.append((user_dn, 'groupMembership', chunk))
+
+        self._done = 0
+        self._total = len(tasks)
+        self._progress_callback = progress_callback
+
+        group_side = {}
+        user_side = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bulk-import') as executor:
+            futures = [executor.submit(self._run_task, *task) for task in tasks]
+            for (dn, attribute, _), future in zip(tasks, futures):
+                _, outcome = future.result()
+                for value, status in outcome.items():
+                    if attribute == 'member':
+                        group_side[(normalize(dn), normalize(value))] = status
+                    else:
+                        user_side[(normalize(value), normalize(dn))] = status
+
+        results = []
+        for row in rows:
+            key = (normalize(row['group_dn']), normalize(row['user_dn']))
+            group_status, group_error = group_side.get(key, ('failed', 'Not processed'))
+            user_status, user_error = user_side.get(key, ('failed', 'Not processed'))
+            if group_status == 'failed' or user_status == 'failed':
+                status = 'failed'
+            elif group_status == 'already_present' and user_status == 'already_present':
+                status = 'already_member'
+            else:
+                status = 'added'
+            result = dict(row)
+            result['status'] = status
+            result['error'] = '; '.join(error for error in (group_error, user_error) if error) or None
+            results.append(result)
+
+        print(f"Import terminé: {len(rows)} lignes, {len(tasks)} opérations, "
+              f"{self.throttle.backoffs} ralentissements")
+        return results
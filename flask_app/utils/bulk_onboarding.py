@@ -0,0 +1,239 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask_app.utils.bulk_import import AdaptiveThrottle, BulkMembershipImporter, THROTTLE_CODES
+
+# Colonnes attendues dans le CSV d'onboarding ('mail' est accepté pour 'email')
+ONBOARDING_COLUMNS = ['user_type', 'givenName', 'sn', 'email', 'manager', 'favvNatNr']
+
+
+class BulkUserOnboarding:
+    """
+    Création en masse de nouveaux utilisateurs (CSV d'onboarding).
+
+    - validation des lignes avec les règles du formulaire de création
+    - un template lu par type d'utilisateur, la liste des chefs hiérarchiques lue une fois
+    - doublons (prénom + nom, FavvNatNr) vérifiés en quelques recherches groupées,
+      dans l'annuaire et à l'intérieur du lot
+    - CNs attribués en mémoire pour tout le lot (voir LDAPUserUtils.allocate_unique_cns)
+    - ajouts répartis sur max_workers connexions du pool, puis appartenances aux groupes
+      des templates appliquées par lots (voir BulkMembershipImporter)
+    """
+
+    def __init__(self, ldap_model, max_workers=4, chunk_size=100, max_retries=5, max_delay=30,
+                 template_lookup=None):
+        self.ldap_model = ldap_model
+        # Lecture d'un template par type d'utilisateur (catalogue en mémoire si fourni)
+        self.template_lookup = template_lookup or ldap_model.get_template_details
+        self.max_workers = max(1, max_workers)
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.max_delay = max_delay
+        self.throttle = AdaptiveThrottle(max_delay=max_delay)
+        self._lock = threading.Lock()
+        self._done = 0
+
+    # --- Préparation ---
+
+    def _check_row(self, row, templates):
+        """
+        Erreur de validation d'une ligne (règles du formulaire, voir validate_new_user), ou None.
+        """
+        if not row['user_type']:
+            return "Le type d'utilisateur est obligatoire."
+        if templates.get(row['user_type']) is None:
+            return f"Type d'utilisateur inconnu: {row['user_type']}"
+        return self.ldap_model.validate_new_user(row['user_type'], row['givenName'], row['sn'],
+                                                 email=row['email'], manager=row['manager'],
+                                                 favvnatnr=row['favvNatNr'])
+
+    def plan(self, rows):
+        """
+        Valider le lot et préparer chaque création (CN, mot de passe, attributs).
+
+        Args:
+            rows (list): dicts avec 'row' et les colonnes ONBOARDING_COLUMNS
+
+        Returns:
+            list: une entrée par ligne, 'status' = 'ready', 'invalid' ou 'duplicate'
+        """
+        model = self.ldap_model
+        planned = [dict(row, status='ready', error=None, cn=None, dn=None, password=None) for row in rows]
+
+        # Un template par type d'utilisateur
+        templates = {}
+        for user_type in sorted({row['user_type'] for row in planned if row['user_type']}):
+            templates[user_type] = self.template_lookup(user_type)
+
+        managers = {}
+        if any(row['user_type'] == 'STAG' and row['manager'] for row in planned):
+            for manager in model.get_managers():
+                managers.setdefault(manager['fullName'], manager['dn'])
+
+        for row in planned:
+            error = self._check_row(row, templates)
+            if error is None and row['user_type'] == 'STAG' and row['manager'] not in managers:
+                error = f"Chef hiérarchique introuvable: {row['manager']}"
+            if error:
+                row['status'], row['error'] = 'invalid', error
+
+        # Doublons dans l'annuaire puis à l'intérieur du lot
+        ready = [row for row in planned if row['status'] == 'ready']
+        existing_names = model.find_existing_names([(row['givenName'], row['sn']) for row in ready])
+        existing_natnrs = model.find_existing_favvnatnrs([row['favvNatNr'] for row in ready
+                                                          if row['user_type'] in model.FAVVNATNR_USER_TYPES])
+        seen_names = {}
+        seen_natnrs = {}
+        for row in ready:
+            name_key = (row['givenName'].strip().lower(), row['sn'].strip().lower())
+            natnr = ''
+            if row['user_type'] in model.FAVVNATNR_USER_TYPES:
+                natnr = row['favvNatNr'].replace(' ', '').replace('-', '')
+            if name_key in existing_names:
+                row['error'] = f"Un utilisateur avec ce nom existe déjà: {existing_names[name_key]}"
+            elif natnr and natnr in existing_natnrs:
+                dn, fullname = existing_natnrs[natnr]
+                row['error'] = f"Le numéro national existe déjà dans l'annuaire: {fullname} ({dn})"
+            elif name_key in seen_names:
+                row['error'] = f"Doublon de la ligne {seen_names[name_key]}"
+            elif natnr and natnr in seen_natnrs:
+                row['error'] = f"Numéro national en double avec la ligne {seen_natnrs[natnr]}"
+            if row['error']:
+                row['status'] = 'duplicate'
+                continue
+            seen_names[name_key] = row['row']
+            if natnr:
+                seen_natnrs[natnr] = row['row']
+
+        # CNs attribués pour tout le lot en une passe
+        ready = [row for row in planned if row['status'] == 'ready']
+        cns = model.allocate_unique_cns([(row['givenName'], row['sn']) for row in ready])
+        for row, cn in zip(ready, cns):
+            if not cn:
+                row['status'], row['error'] = 'invalid', "Aucun CN disponible pour ce nom"
+                continue
+            template = templates[row['user_type']]
+            short_name = model._has_short_name({'givenName': row['givenName'], 'sn': row['sn']})
+            row['cn'] = cn
+            row['dn'] = f"cn={cn},{model.usercreation_dn}"
+            row['password'] = model.generate_password_from_cn(cn, short_name=short_name)
+            row['groups'] = list(template.get('groupMembership') or [])
+            row['attributes'] = model.build_new_user_attributes(
+                cn, row['givenName'], row['sn'], email=row['email'], user_type=row['user_type'],
+                template_details=template, favvnatnr=row['favvNatNr'], manager_dn=managers.get(row['manager'])
+            )
+        return planned
+
+    # --- Application ---
+
+    def _add(self, dn, attributes):
+        """
+        Un ajout d'entrée, réessayé tant que le serveur répond qu'il est surchargé.
+
+        Returns:
+            tuple: (code de résultat, description)
+        """
+        attempt = 0
+        while True:
+            self.throttle.wait()
+            conn = None
+            try:
+                conn = self.ldap_model._get_connection()
+                conn.add(dn, attributes=attributes)
+                code = conn.result.get('result')
+                description = conn.result.get('description') or conn.result.get('message') or ''
+                conn.unbind()
+            except Exception as e:
+                # Connexion inutilisable: la retirer du pool et réessayer
+                if conn is not None:
+                    conn.release(discard=True)
+                code, description = 52, str(e)
+
+            if code in THROTTLE_CODES and attempt < self.max_retries:
+                attempt += 1
+                self.throttle.backoff()
+                continue
+            if code == 0:
+                self.throttle.success()
+            return code, description
+
+    def _create(self, row, total, progress_callback):
+        attributes = self.ldap_model._prepare_new_user(row['cn'], dict(row['attributes']), row['password'])
+        code, description = self._add(row['dn'], attributes)
+        if code == 0:
+            self.ldap_model._update_duplicate_index(row['dn'], attributes)
+        with self._lock:
+            self._done += 1
+            done = self._done
+        if progress_callback:
+            try:
+                progress_callback(done, total)
+            except Exception as e:
+                print(f"Erreur dans le suivi de progression: {str(e)}")
+        return code, description
+
+    def run(self, rows, dry_run=False, progress_callback=None):
+        """
+        Préparer puis créer les utilisateurs du lot.
+
+        Args:
+            rows (list): lignes du CSV (voir plan)
+            dry_run (bool): seulement préparer (CNs et mots de passe prévus, rien n'est créé)
+            progress_callback (callable, optional): appelé avec (opérations terminées, total)
+
+        Returns:
+            list: une entrée par ligne, 'status' = 'created', 'planned', 'invalid', 'duplicate' ou 'failed'
+        """
+        planned = self.plan(rows)
+        ready = [row for row in planned if row['status'] == 'ready']
+
+        if dry_run:
+            for row in ready:
+                row['status'] = 'planned'
+        else:
+            self._done = 0
+            total = len(ready)
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bulk-onboarding') as executor:
+                futures = [executor.submit(self._create, row, total, progress_callback) for row in ready]
+                for row, future in zip(ready, futures):
+                    code, description = future.result()
+                    if code == 0:
+                        row['status'] = 'created'
+                    else:
+                        row['status'], row['error'] = 'failed', f"{description} (code {code})"
+
+            # Groupes des templates: un MODIFY_ADD multi-valeurs par groupe et par lot
+            memberships = [
+                {'user_dn': row['dn'], 'group_dn': group_dn}
+                for row in ready if row['status'] == 'created'
+                for group_dn in row['groups']
+            ]
+            if memberships:
+                importer = BulkMembershipImporter(self.ldap_model, chunk_size=self.chunk_size,
+                                                  max_workers=self.max_workers, max_retries=self.max_retries,
+                                                  max_delay=self.max_delay)
+
+                def membership_progress(done, membership_total):
+                    if progress_callback:
+                        progress_callback(total + done, total + membership_total)
+
+                outcomes = importer.run(memberships, progress_callback=membership_progress)
+                failed_by_user = {}
+                for outcome in outcomes:
+                    if outcome['status'] == 'failed':
+                        failed_by_user[outcome['user_dn']] = failed_by_user.get(outcome['user_dn'], 0) + 1
+                for row in ready:
+                    if row['status'] == 'created':
+                        row['groups_failed'] = failed_by_user.get(row['dn'], 0)
+                        row['groups_added'] = len(row['groups']) - row['groups_failed']
+
+        results = []
+        for row in planned:
+            result = {key: value for key, value in row.items() if key not in ('attributes', 'groups')}
+            result.setdefault('groups_added', 0)
+            result.setdefault('groups_failed', 0)
+            results.append(result)
+
+        created = sum(1 for row in results if row['status'] == 'created')
+        print(f"Onboarding terminé: {len(rows)} lignes, {len(ready)} prêtes, {created} créées, "
+              f"{self.throttle.backoffs} ralentissements")
+        return results
@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Cache LRU borné avec expiration par entrée.
+
+    - au plus max_size entrées; l'entrée la moins récemment utilisée est évincée
+    - chaque entrée expire après son propre ttl (default_ttl par défaut)
+    - compteurs hits / misses / evictions / expirations pour le suivi
+    """
+
+    def __init__(self, max_size=1000, default_ttl=300):
+        self.max_size = max(1, max_size)
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _lookup(self, key, now):
+        """
+        Valeur non expirée ou None. Doit être appelé sous verrou.
+        """
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            self.expirations += 1
+            return None
+        self._data.move_to_end(key)
+        return item
+
+    def get(self, key, default=None, count=True):
+        """
+        Lire une entrée. count=False permet de sonder le cache sans fausser les compteurs.
+        """
+        with self._lock:
+            item = self._lookup(key, time.monotonic())
+            if count:
+                if item is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            return default if item is None else item[0]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key, time.monotonic()) is not None
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
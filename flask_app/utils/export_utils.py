@@ -1,95 +1,437 @@
 import csv
 import io
+import re
+import tempfile
+import time
+import zipfile
+import zlib
+from xml.sax.saxutils import escape
 from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.pdfgen import canvas
-from flask import make_response
-
-def util_export_group_users_csv(group_name, users):
-    """
-    Export group users to a CSV file.
-    """
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['CN', 'Full Name', 'Title', 'Service'])  # Write header
-    for user in users:
-        writer.writerow([user['CN'], user['fullName'], user['title'], user['service']])
-    
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = f'attachment; filename=group_users_{group_name}.csv'
-    response.headers['Content-type'] = 'text/csv'
-    return response
+from flask import Response, stream_with_context
+
+# Colonnes exportées: (en-tête, clé du dict utilisateur)
+GROUP_EXPORT_COLUMNS = [('CN', 'CN'), ('Full Name', 'fullName'), ('Title', 'title'), ('Service', 'service')]
+ROLE_EXPORT_COLUMNS = [('CN', 'CN'), ('Full Name', 'fullName'), ('Title', 'title'), ('Service', 'ou')]
+SERVICE_EXPORT_COLUMNS = [('CN', 'CN'), ('Full Name', 'fullName'), ('Title', 'title'), ('Email', 'mail')]
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+# Nombre de lignes accumulées avant d'envoyer un morceau au client
+EXPORT_FLUSH_ROWS = 500
+
+# Mise en page des rapports PDF
+PDF_FONT = 'Helvetica'
+PDF_FONT_BOLD = 'Helvetica-Bold'
+PDF_FONT_SIZE = 9
+PDF_ROW_HEIGHT = 14
+PDF_MARGIN = 40
+# Largeur relative des colonnes (CN, Full Name, Title, Service/Email)
+PDF_COLUMN_WEIGHTS = [1, 2, 2, 1.5]
+# Au-delà de cette taille, le PDF en cours de génération passe de la mémoire à un fichier temporaire
+PDF_SPOOL_MAX_SIZE = 5 * 1024 * 1024
+# Aucun caractère Helvetica ne dépasse ~1.02 em: un texte plus court que width / (1.02 * taille)
+# caractères tient forcément dans la colonne et n'a pas besoin d'être mesuré
+_PDF_MAX_CHAR_EM = 1.02
+_PDF_ELLIPSIS = '\u2026'
+
+# Caractères interdits en XML 1.0 (caractères de contrôle hors tabulation / retours à la ligne)
+_XML_INVALID_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def _row_values(user, columns):
+    return [user.get(key, '') for _, key in columns]
+
+
+def _iter_csv(rows, columns):
+    """
+    Générer le CSV par morceaux de EXPORT_FLUSH_ROWS lignes (bytes UTF-8).
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, _ in columns])
+    pending = 1
+    for user in rows:
+        writer.writerow(_row_values(user, columns))
+        pending += 1
+        if pending >= EXPORT_FLUSH_ROWS:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _iter_gzip(chunks):
+    """
+    Compresser un flux de bytes au format gzip, morceau par morceau.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _StreamBuffer:
+    """
+    Fichier en écriture seule, non positionnable, dont le contenu est vidé à chaque lecture.
+
+    zipfile détecte l'absence de tell()/seek() et écrit alors les tailles dans des
+    descripteurs de données: l'archive peut être envoyée au fur et à mesure.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
 
-def util_export_role_users_csv(role_cn, users):
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _xlsx_row(values):
+    cells = ''.join(
+        f'<c t="inlineStr"><is><t xml:space="preserve">'
+        f'{escape(_XML_INVALID_CHARS.sub("", "" if value is None else str(value)))}</t></is></c>'
+        for value in values
+    )
+    return f'<row>{cells}</row>'
+
+
+def _iter_xlsx(rows, columns, sheet_name='Users'):
+    """
+    Générer un classeur XLSX minimal (une feuille, chaînes en ligne) sans le garder en mémoire.
+    """
+    # Excel limite le nom d'une feuille à 31 caractères, sans les caractères []:*?/ ni la barre oblique inverse
+    sheet_name = re.sub(r'[\[\]:*?/\\]', '', _XML_INVALID_CHARS.sub('', sheet_name or ''))[:31]
+    sheet_name = escape(sheet_name, {'"': '&quot;'}) or 'Users'
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _XLSX_ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _XLSX_WORKBOOK.format(sheet_name=sheet_name))
+        archive.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        yield buffer.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                         '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                         '<sheetData>').encode('utf-8'))
+            sheet.write(_xlsx_row([header for header, _ in columns]).encode('utf-8'))
+            pending = []
+            for user in rows:
+                pending.append(_xlsx_row(_row_values(user, columns)))
+                if len(pending) >= EXPORT_FLUSH_ROWS:
+                    sheet.write(''.join(pending).encode('utf-8'))
+                    pending = []
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            sheet.write((''.join(pending) + '</sheetData></worksheet>').encode('utf-8'))
+    yield buffer.drain()
+
+
+def stream_users_export(filename, rows, columns, export_format='csv', compress=False, sheet_name='Users'):
     """
-    Export role users to a CSV file.
+    Réponse Flask en streaming pour l'export d'une liste d'utilisateurs.
+
+    Les lignes sont écrites au fur et à mesure que l'itérable 'rows' les produit
+    (ex.: un générateur alimenté par des recherches LDAP paginées): le téléchargement
+    commence immédiatement et la mémoire utilisée ne dépend pas du nombre de lignes.
+
+    Args:
+        filename (str): Nom du fichier sans extension
+        rows (iterable): dicts utilisateur
+        columns (list): [(en-tête, clé)], ex: GROUP_EXPORT_COLUMNS
+        export_format (str): 'csv' ou 'xlsx'
+        compress (bool): Compresser le CSV en gzip (.csv.gz); sans effet sur XLSX, déjà compressé
+        sheet_name (str): Nom de la feuille XLSX
     """
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['CN', 'Full Name', 'Title', 'Service'])  # Write header
-    for user in users:
-        writer.writerow([user['CN'], user['fullName'], user['title'], user['ou']])
-    
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = f'attachment; filename=role_users_{role_cn}.csv'
-    response.headers['Content-type'] = 'text/csv'
+    if export_format == 'xlsx':
+        body = _iter_xlsx(rows, columns, sheet_name)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        filename = f'{filename}.xlsx'
+    else:
+        body = _iter_csv(rows, columns)
+        mimetype = 'text/csv'
+        filename = f'{filename}.csv'
+        if compress:
+            body = _iter_gzip(body)
+            mimetype = 'application/gzip'
+            filename = f'{filename}.gz'
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    # Empêcher un proxy (nginx) de mettre toute la réponse en tampon
+    response.headers['X-Accel-Buffering'] = 'no'
     return response
 
-def util_export_service_users_csv(service_name, users):
+
+class _PDFTextFitter:
     """
-    Export service users to a CSV file.
+    Tronquer les textes à la largeur d'une colonne (avec '…'), en mémorisant les
+    résultats: les mêmes valeurs (titres, services) reviennent sur des milliers de lignes.
     """
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['CN', 'Full Name', 'Title', 'Email'])  # Write header
-    for user in users:
-        writer.writerow([user['CN'], user['fullName'], user['title'], user['mail']])
-    
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = f'attachment; filename=service_users_{service_name}.csv'
-    response.headers['Content-type'] = 'text/csv'
+
+    def __init__(self, font, size, max_entries=10000):
+        self.font = font
+        self.size = size
+        self.max_entries = max_entries
+        self._cache = {}
+        self._ellipsis_width = stringWidth(_PDF_ELLIPSIS, font, size)
+
+    def fit(self, text, width):
+        text = '' if text is None else str(text)
+        if not text or len(text) * self.size * _PDF_MAX_CHAR_EM <= width:
+            return text
+        key = (text, width)
+        fitted = self._cache.get(key)
+        if fitted is not None:
+            return fitted
+        if stringWidth(text, self.font, self.size) <= width:
+            fitted = text
+        else:
+            # Recherche dichotomique du plus long préfixe qui tient avec les points de suspension
+            low, high = 0, len(text)
+            while low < high:
+                middle = (low + high + 1) // 2
+                if stringWidth(text[:middle], self.font, self.size) + self._ellipsis_width <= width:
+                    low = middle
+                else:
+                    high = middle - 1
+            fitted = text[:low].rstrip() + _PDF_ELLIPSIS
+        if len(self._cache) >= self.max_entries:
+            self._cache.clear()
+        self._cache[key] = fitted
+        return fitted
+
+
+def build_users_pdf(output, title, rows, columns, weights=None):
+    """
+    Écrire un rapport PDF tabulaire (une ligne par utilisateur) dans output.
+
+    - les largeurs de colonnes sont calculées une fois, les textes trop longs sont tronqués
+    - le titre et l'en-tête du tableau sont dessinés une seule fois dans un formulaire
+      (XObject) réutilisé par chaque page
+    - les cellules d'une page sont écrites dans un seul objet texte au lieu d'un
+      drawString par cellule
+
+    Args:
+        output: Fichier ou objet avec write()
+        title (str): Titre répété en haut de chaque page
+        rows (iterable): dicts utilisateur
+        columns (list): [(en-tête, clé)]
+        weights (list, optional): Largeurs relatives des colonnes
+
+    Returns:
+        int: Nombre de lignes écrites
+    """
+    width, height = letter
+    weights = weights or PDF_COLUMN_WEIGHTS[:len(columns)]
+    usable_width = width - 2 * PDF_MARGIN
+    total_weight = float(sum(weights))
+    col_widths = [usable_width * weight / total_weight for weight in weights]
+    col_x = [PDF_MARGIN + sum(col_widths[:index]) for index in range(len(columns))]
+    # Marge intérieure de chaque cellule
+    cells = [(x + 2, col_width - 4, key) for x, col_width, (_, key) in zip(col_x, col_widths, columns)]
+
+    fitter = _PDFTextFitter(PDF_FONT, PDF_FONT_SIZE)
+    pdf = canvas.Canvas(output, pagesize=letter, pageCompression=1)
+    pdf.setTitle(title)
+
+    # Gabarit de page: titre, date et en-tête du tableau
+    header_y = height - PDF_MARGIN - 40
+    pdf.beginForm('page_template')
+    pdf.setFont(PDF_FONT_BOLD, 14)
+    pdf.drawString(PDF_MARGIN, height - PDF_MARGIN - 14,
+                   _PDFTextFitter(PDF_FONT_BOLD, 14).fit(title, usable_width))
+    pdf.setFont(PDF_FONT, 8)
+    pdf.drawRightString(width - PDF_MARGIN, PDF_MARGIN - 20, time.strftime('%Y-%m-%d %H:%M'))
+    pdf.setFont(PDF_FONT_BOLD, PDF_FONT_SIZE)
+    header_fitter = _PDFTextFitter(PDF_FONT_BOLD, PDF_FONT_SIZE)
+    for (x, cell_width, _), (header, _) in zip(cells, columns):
+        pdf.drawString(x, header_y, header_fitter.fit(header, cell_width))
+    pdf.line(PDF_MARGIN, header_y - 4, width - PDF_MARGIN, header_y - 4)
+    pdf.endForm()
+
+    first_row_y = header_y - PDF_ROW_HEIGHT - 2
+    rows_per_page = max(1, int((first_row_y - PDF_MARGIN) // PDF_ROW_HEIGHT) + 1)
+
+    page = 0
+    count = 0
+    text = None
+    on_page = 0
+
+    def finish_page():
+        pdf.drawText(text)
+        pdf.setFont(PDF_FONT, 8)
+        pdf.drawString(PDF_MARGIN, PDF_MARGIN - 20, f'Page {page}')
+        pdf.showPage()
+
+    for user in rows:
+        if text is None or on_page >= rows_per_page:
+            if text is not None:
+                finish_page()
+            page += 1
+            on_page = 0
+            pdf.doForm('page_template')
+            text = pdf.beginText()
+            text.setFont(PDF_FONT, PDF_FONT_SIZE)
+        y = first_row_y - on_page * PDF_ROW_HEIGHT
+        for x, cell_width, key in cells:
+            text.setTextOrigin(x, y)
+            text.textOut(fitter.fit(user.get(key, ''), cell_width))
+        on_page += 1
+        count += 1
+
+    if text is None:
+        # Rapport vide: une page avec l'en-tête seul
+        page = 1
+        pdf.doForm('page_template')
+        text = pdf.beginText()
+    finish_page()
+    pdf.save()
+    return count
+
+
+def _iter_file(fileobj, chunk_size=64 * 1024):
+    """
+    Lire un fichier par morceaux puis le fermer (fin de réponse ou client déconnecté).
+    """
+    try:
+        fileobj.seek(0)
+        while True:
+            data = fileobj.read(chunk_size)
+            if not data:
+                break
+            yield data
+    finally:
+        fileobj.close()
+
+
+def stream_users_pdf(filename, title, rows, columns, weights=None):
+    """
+    Réponse Flask avec un rapport PDF d'utilisateurs (voir build_users_pdf).
+
+    Le document est produit dans un fichier temporaire « spoolé » (en mémoire jusqu'à
+    PDF_SPOOL_MAX_SIZE, sur disque au-delà) puis envoyé par morceaux.
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
+    try:
+        count = build_users_pdf(output, title, rows, columns, weights)
+        size = output.tell()
+    except Exception:
+        output.close()
+        raise
+    print(f"Rapport PDF '{filename}': {count} lignes, {size} octets")
+
+    response = Response(stream_with_context(_iter_file(output)), mimetype='application/pdf')
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}.pdf'
+    response.headers['Content-Length'] = str(size)
     return response
 
+
+def peek_rows(rows):
+    """
+    Lire la première ligne d'un itérable sans la perdre.
+
+    Permet de vérifier qu'un export n'est pas vide avant de commencer la réponse.
+
+    Returns:
+        iterator ou None: un itérateur sur toutes les lignes, ou None si aucune ligne
+    """
+    iterator = iter(rows)
+    for first in iterator:
+        def chained():
+            yield first
+            yield from iterator
+        return chained()
+    return None
+
+
+def util_export_group_users_csv(group_name, users, export_format='csv', compress=False):
+    """
+    Export group users to a CSV (or XLSX) file, streamed as rows arrive.
+    """
+    return stream_users_export(f'group_users_{group_name}', users, GROUP_EXPORT_COLUMNS,
+                               export_format, compress, sheet_name=group_name)
+
+def util_export_role_users_csv(role_cn, users, export_format='csv', compress=False):
+    """
+    Export role users to a CSV (or XLSX) file, streamed as rows arrive.
+    """
+    return stream_users_export(f'role_users_{role_cn}', users, ROLE_EXPORT_COLUMNS,
+                               export_format, compress, sheet_name=role_cn)
+
+def util_export_service_users_csv(service_name, users, export_format='csv', compress=False):
+    """
+    Export service users to a CSV (or XLSX) file, streamed as rows arrive.
+    """
+    return stream_users_export(f'service_users_{service_name}', users, SERVICE_EXPORT_COLUMNS,
+                               export_format, compress, sheet_name=service_name)
+
 def util_export_role_users_pdf(role_cn, users):
     """
     Export role users to a PDF file.
     """
-    buffer = io.BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter  # Page dimensions
-
-    # Add title
-    pdf.setFont("Helvetica-Bold", 16)
-    pdf.drawString(50, height - 50, f"Users in Role: {role_cn}")
-
-    # Add table headers
-    pdf.setFont("Helvetica-Bold", 12)
-    pdf.drawString(50, height - 80, "CN")
-    pdf.drawString(150, height - 80, "Full Name")
-    pdf.drawString(300, height - 80, "Title")
-    pdf.drawString(450, height - 80, "Service")
-
-    # Add table rows
-    pdf.setFont("Helvetica", 10)
-    y = height - 100
-    for user in users:
-        pdf.drawString(50, y, user['CN'])
-        pdf.drawString(150, y, user['fullName'])
-        pdf.drawString(300, y, user['title'])
-        pdf.drawString(450, y, user['ou'])
-        y -= 20
-        if y < 50:  # Handle page overflow
-            pdf.showPage()
-            y = height - 50
-
-    # Save the PDF
-    pdf.save()
+    return stream_users_pdf(f'role_users_{role_cn}', f'Users in Role: {role_cn}', users, ROLE_EXPORT_COLUMNS)
 
-    # Prepare the response
-    buffer.seek(0)
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Disposition'] = f'attachment; filename=role_users_{role_cn}.pdf'
-    response.headers['Content-type'] = 'application/pdf'
-    return response
\ No newline at end of file
+def util_export_group_users_pdf(group_name, users):
+    """
+    Export group users to a PDF file.
+    """
+    return stream_users_pdf(f'group_users_{group_name}', f'Users in Group: {group_name}', users,
+                            GROUP_EXPORT_COLUMNS)
+
+def util_export_service_users_pdf(service_name, users):
+    """
+    Export service users to a PDF file.
+    """
+    return stream_users_pdf(f'service_users_{service_name}', f'Users in Service: {service_name}', users,
+                            SERVICE_EXPORT_COLUMNS)
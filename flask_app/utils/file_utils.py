@@ -1,85 +1,226 @@
-import csv, time
-from ldap3 import  MODIFY_ADD
-from flask_app.models.ldap_model import LDAPModel
-
-def validate_entries(csv_file_path, group_dn_structure):
-    valid_entries = []
-    invalid_entries = []
-
-    # Connect to the eDirectory server
-    ldap_model = LDAPModel()
-    #ldap_model.authenticate(self.bind_dn, self.password)
-    conn = ldap_model.authenticate_admin(ldap_model.bind_dn, ldap_model.password) 
-
-    # Read the CSV file with user CNs and group names
-    with open(csv_file_path, mode='r') as file:
+import csv
+import hashlib
+from flask import current_app, has_app_context
+from flask_app.models.ldap_model import get_ldap_model
+from flask_app.models.ldap_config_manager import LDAPConfigManager
+from flask_app.utils.bulk_import import BulkMembershipImporter
+from flask_app.utils.bulk_onboarding import BulkUserOnboarding, ONBOARDING_COLUMNS
+from flask_app.utils.cache_utils import TTLCache
+
+# Résultats de validation récents, par (empreinte du fichier, structure de groupes, source):
+# l'import qui suit la validation réutilise le résultat sans relire l'annuaire
+validation_cache = TTLCache(max_size=32, default_ttl=900)
+
+
+def _file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _iter_rows(csv_file_path, group_dn_structure):
+    """
+    Lire le CSV ligne par ligne et construire les DNs de l'utilisateur et du groupe.
+    """
+    with open(csv_file_path, mode='r', newline='') as file:
         reader = csv.DictReader(file)
-        
-        # Iterate over each row in the CSV
         for row in reader:
             user_cn = row['cn']
             group_name = row['group_name']
-
             # Construct the DNs for the user and group
             user_dn = f'cn={user_cn},ou=users,ou=sync,o=COPY'  # Adjust to your directory structure
             group_dn = f'cn={group_name},{group_dn_structure}'  # Adjust to your directory structure
-
-            # Check if the user and group exist in LDAP
-            user_exists = conn.search(user_dn, '(objectClass=*)', search_scope='BASE')
-            print(f"Le user exist: {user_exists}")
-            group_exists = conn.search(group_dn, '(objectClass=*)', search_scope='BASE')
-
-            if user_exists and group_exists:
-                valid_entries.append({'user_cn': user_cn, 'group_name': group_name})
+            yield user_cn, group_name, user_dn, group_dn
+
+
+def validate_entries(csv_file_path, group_dn_structure, ldap_source='meta'):
+    """
+    Vérifier que les utilisateurs et groupes du CSV existent.
+
+    Le fichier est lu deux fois en flux: une fois pour collecter les DNs distincts,
+    vérifiés ensuite par lots (filtres OR, voir LDAPBase._resolve_dns), puis une fois
+    pour classer les lignes. Le résultat est gardé en cache pour l'import qui suit,
+    sauf si une lecture a échoué: ses lignes sont signalées 'Lookup error' et non
+    comme inexistantes.
+
+    Returns:
+        tuple: (entrées valides, entrées invalides)
+    """
+    cache_key = (_file_hash(csv_file_path), group_dn_structure, ldap_source)
+    cached = validation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    ldap_model = get_ldap_model(ldap_source)
+    config = LDAPConfigManager.get_config(ldap_source)
+    chunk_size = config.get('validation_chunk_size', 1000)
+
+    # Collecter les DNs distincts
+    user_dns = {}
+    group_dns = {}
+    for _, _, user_dn, group_dn in _iter_rows(csv_file_path, group_dn_structure):
+        user_dns.setdefault(ldap_model._normalize_dn(user_dn), user_dn)
+        group_dns.setdefault(ldap_model._normalize_dn(group_dn), group_dn)
+
+    # Vérifier leur existence par lots
+    failed = set()
+    conn = ldap_model._get_connection()
+    try:
+        existing_users = ldap_model._resolve_dns(conn, list(user_dns.values()), ['cn'], chunk_size=chunk_size,
+                                                 failed=failed)
+        existing_groups = ldap_model._resolve_dns(conn, list(group_dns.values()), ['cn'], chunk_size=chunk_size,
+                                                  failed=failed)
+    finally:
+        # Unbind the connection
+        conn.unbind()
+    print(f"Validation: {len(user_dns)} utilisateurs et {len(group_dns)} groupes distincts, "
+          f"{len(existing_users)} et {len(existing_groups)} trouvés, {len(failed)} lectures en échec")
+
+    failed = {ldap_model._normalize_dn(dn) for dn in failed}
+    valid_entries = []
+    invalid_entries = []
+    for user_cn, group_name, user_dn, group_dn in _iter_rows(csv_file_path, group_dn_structure):
+        user_key = ldap_model._normalize_dn(user_dn)
+        group_key = ldap_model._normalize_dn(group_dn)
+        user_exists = user_key in existing_users
+        group_exists = group_key in existing_groups
+
+        if user_exists and group_exists:
+            valid_entries.append({'user_cn': user_cn, 'group_name': group_name})
+        elif (not user_exists and user_key in failed) or (not group_exists and group_key in failed):
+            invalid_entries.append({'user_cn': user_cn, 'group_name': group_name,
+                                    'error': 'Lookup error'})
+        else:
+            if not user_exists and not group_exists:
+                error = 'User and group do not exist'
+            elif not user_exists:
+                error = 'User does not exist'
             else:
-                invalid_entries.append({'user_cn': user_cn, 'group_name': group_name, 
-                                       'error': 'User or group does not exist'})
-
-    # Unbind the connection
-    conn.unbind()
+                error = 'Group does not exist'
+            invalid_entries.append({'user_cn': user_cn, 'group_name': group_name, 'error': error})
 
+    if not failed:
+        validation_cache.set(cache_key, (valid_entries, invalid_entries))
     return valid_entries, invalid_entries
 
-def apply_changes(valid_entries, group_dn_structure):
+def apply_changes(valid_entries, group_dn_structure, ldap_source='meta', progress_callback=None):
+    """
+    Ajouter les utilisateurs validés dans leurs groupes (voir BulkMembershipImporter).
+
+    Returns:
+        tuple: (succès, échecs, messages d'échec, résultat par ligne)
+    """
+    ldap_model = get_ldap_model(ldap_source)
+    config = LDAPConfigManager.get_config(ldap_source)
+    importer = BulkMembershipImporter(
+        ldap_model,
+        chunk_size=config.get('import_chunk_size', 100),
+        max_workers=config.get('import_workers', 4)
+    )
+
+    rows = []
+    for index, entry in enumerate(valid_entries, start=1):
+        rows.append({
+            'row': index,
+            'user_cn': entry['user_cn'],
+            'group_name': entry['group_name'],
+            # Construct the DNs for the user and group
+            'user_dn': f"cn={entry['user_cn']},ou=users,ou=sync,o=COPY",
+            'group_dn': f"cn={entry['group_name']},{group_dn_structure}"
+        })
+
+    outcomes = importer.run(rows, progress_callback=progress_callback)
+
     success_count = 0
     failure_count = 0
     failures = []
-
-   # Connect to the eDirectory server
-    ldap_model = LDAPModel()
-    #ldap_model.authenticate(self.bind_dn, self.password)
-    conn = ldap_model.authenticate_admin(ldap_model.bind_dn, ldap_model.password) 
-
-    # Iterate over valid entries and apply changes
-    for entry in valid_entries:
-        user_cn = entry['user_cn']
-        group_name = entry['group_name']
-
-        # Construct the DNs for the user and group
-        user_dn = f'cn={user_cn},ou=users,ou=sync,o=COPY'
-        group_dn = f'cn={group_name},{group_dn_structure}'
-
-        # Add user to the group (modify the group's member attribute)
-        group_modify = conn.modify(
-            group_dn, 
-            {'member': [(MODIFY_ADD, [user_dn])]})
-        
-        # Update the user's memberOf attribute (to reflect the new group membership)
-        user_modify = conn.modify(
-            user_dn, 
-            {'groupMembership': [(MODIFY_ADD, [group_dn])]})
-
-        # Check if the operations were successful
-        if group_modify and user_modify:
-            success_count += 1
-        else:
+    for outcome in outcomes:
+        if outcome['status'] == 'failed':
             failure_count += 1
-            failures.append(f"Failed to add {user_cn} to {group_name}. Error: {conn.result['description']}")
-
-        # Wait for 2 seconds before processing the next user
-        time.sleep(2)
-
-    # Unbind the connection
-    conn.unbind()
+            failures.append(f"Row {outcome['row']}: Failed to add {outcome['user_cn']} to {outcome['group_name']}. "
+                            f"Error: {outcome['error']}")
+        else:
+            success_count += 1
 
-    return success_count, failure_count, failures
\ No newline at end of file
+    return success_count, failure_count, failures, outcomes
+
+
+def run_validation_job(params, progress):
+    """
+    Job 'membership_validation' (voir services/job_runner.py).
+    """
+    progress(0, 1)
+    valid_entries, invalid_entries = validate_entries(params['file_path'], params['group_dn_structure'],
+                                                      ldap_source=params.get('ldap_source', 'meta'))
+    progress(1, 1)
+    return {
+        'valid_entries': valid_entries,
+        'invalid_entries': invalid_entries
+    }
+
+
+def run_import_job(params, progress):
+    """
+    Job 'membership_import': nouvelle validation du fichier puis import en masse.
+    """
+    ldap_source = params.get('ldap_source', 'meta')
+    # Validate the CSV entries again (for safety); served from the validation cache if the file is unchanged
+    valid_entries, _ = validate_entries(params['file_path'], params['group_dn_structure'], ldap_source=ldap_source)
+    success_count, failure_count, failures, outcomes = apply_changes(valid_entries, params['group_dn_structure'],
+                                                                     ldap_source=ldap_source,
+                                                                     progress_callback=progress)
+    return {
+        'success_count': success_count,
+        'failure_count': failure_count,
+        'failures': failures,
+        'outcomes': outcomes
+    }
+
+
+def read_onboarding_rows(csv_file_path):
+    """
+    Lire le CSV d'onboarding (colonnes ONBOARDING_COLUMNS, 'mail' accepté pour 'email').
+    """
+    rows = []
+    with open(csv_file_path, mode='r', newline='', encoding='utf-8-sig') as file:
+        reader = csv.DictReader(file)
+        for index, row in enumerate(reader, start=1):
+            row = {(key or '').strip(): (value or '').strip() for key, value in row.items()}
+            if not row.get('email') and row.get('mail'):
+                row['email'] = row['mail']
+            entry = {column: row.get(column, '') for column in ONBOARDING_COLUMNS}
+            entry['row'] = index
+            rows.append(entry)
+    return rows
+
+
+def run_onboarding_job(params, progress):
+    """
+    Job 'user_onboarding': création en masse des utilisateurs d'un CSV (voir BulkUserOnboarding).
+    """
+    ldap_source = params.get('ldap_source', 'meta')
+    config = LDAPConfigManager.get_config(ldap_source)
+    rows = read_onboarding_rows(params['file_path'])
+    progress(0, len(rows))
+    # Templates lus dans le catalogue en mémoire (voir services/template_catalog.py)
+    catalog = getattr(current_app, 'template_catalog', None) if has_app_context() else None
+    template_lookup = (lambda user_type: catalog.get_template_details(ldap_source, user_type)) if catalog else None
+
+    onboarding = BulkUserOnboarding(
+        get_ldap_model(ldap_source),
+        max_workers=config.get('import_workers', 4),
+        chunk_size=config.get('import_chunk_size', 100),
+        template_lookup=template_lookup
+    )
+    outcomes = onboarding.run(rows, dry_run=params.get('dry_run', False), progress_callback=progress)
+    counts = {}
+    for outcome in outcomes:
+        counts[outcome['status']] = counts.get(outcome['status'], 0) + 1
+    progress(len(rows), len(rows))
+    return {
+        'dry_run': bool(params.get('dry_run', False)),
+        'counts': counts,
+        'outcomes': outcomes
+    }